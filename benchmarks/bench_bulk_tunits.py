@@ -0,0 +1,54 @@
+"""
+Bulk TUnit Write Benchmark
+==========================
+
+Compares rows per second of writing TUnits one at a time with ``DBConn.update_tunit`` against writing them in a single
+transaction with ``DBConn.insert_tunits``.
+
+Usage: ``python benchmarks/bench_bulk_tunits.py [--rows N] [--batch N]``
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench_utils import make_database
+
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn
+from trivia_generator.TUnit import TUnit
+
+
+def make_tunits(num_rows: int) -> list:
+    return [TUnit(f'generated sentence number {i}.', i % 1000 + 1, 'url', 0, None, 40.0, -75.0)
+            for i in range(num_rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000, help='rows written one at a time')
+    parser.add_argument('--batch', type=int, default=50000, help='rows written in one bulk call')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_filename = make_database(os.path.join(tmp_dir, 'bench.db'), num_articles=1000)
+        db_conn = DBConn(db_filename)
+
+        t_units = make_tunits(args.rows)
+        start = time.perf_counter()
+        for t_unit in t_units:
+            db_conn.update_tunit(t_unit)
+        single_rate = args.rows / (time.perf_counter() - start)
+
+        t_units = make_tunits(args.batch)
+        start = time.perf_counter()
+        db_conn.insert_tunits(t_units)
+        bulk_rate = args.batch / (time.perf_counter() - start)
+
+        print(f'update_tunit: {single_rate:10.0f} rows/s | insert_tunits: {bulk_rate:10.0f} rows/s | '
+              f'speedup {bulk_rate / single_rate:6.1f}x')
+        close_all_pools()
+
+
+if __name__ == '__main__':
+    main()
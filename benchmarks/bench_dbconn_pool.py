@@ -0,0 +1,93 @@
+"""
+DBConn Pool Benchmark
+=====================
+
+Compares queries per second of ``DBConn`` on pooled connections against opening a connection (and re-reading
+``db.ini``) for every query, as ``DBConn`` used to do.
+
+The query is ``select_user``, which goes to the database every time, rather than one of the lookups ``DBConn`` caches
+in memory. The pool is filled before timing starts, so the first connection's migration is not measured.
+
+Usage: ``python benchmarks/bench_dbconn_pool.py [--duration SECONDS] [--threads N]``
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+from configparser import ConfigParser
+from contextlib import ExitStack
+
+from bench_utils import make_database, measure_rate, top_level_dir
+
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn
+
+CONFIG_FILENAME = os.path.join(top_level_dir, 'database_connection', DBConn.DB_CONFIG_FILE)
+NUM_USERS = 1000
+QUERY = '''
+        SELECT user_id, username, email, wins, losses, num_answered, num_answered_correct
+        FROM user
+        WHERE username = ?;
+        '''
+
+
+def random_username() -> str:
+    return f'user_{random.randrange(NUM_USERS)}'
+
+
+def unpooled_query(db_filename: str):
+    config = ConfigParser()
+    config.read(CONFIG_FILENAME)
+    db = sqlite3.connect(db_filename)
+    db.cursor().execute(QUERY, (random_username(),)).fetchone()
+    db.close()
+
+
+def pooled_query(db_conn: DBConn):
+    db_conn.select_user(random_username())
+
+
+def warm_pool(db_conn: DBConn):
+    """Opens every connection of the pool, holding them all at once so that none is reused."""
+    with ExitStack() as stack:
+        for _ in range(db_conn.pool.max_size):
+            stack.enter_context(db_conn.pool.connection())
+
+
+def measure_threaded_rate(function, num_threads: int, duration: float) -> float:
+    rates = [0.0] * num_threads
+
+    def run(i):
+        rates[i] = measure_rate(function, duration)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--articles', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_filename = make_database(os.path.join(tmp_dir, 'bench.db'), num_articles=args.articles)
+        db_conn = DBConn(db_filename)
+        warm_pool(db_conn)
+        for threads in (1, args.threads):
+            unpooled = measure_threaded_rate(lambda: unpooled_query(db_filename), threads, args.duration)
+            pooled = measure_threaded_rate(lambda: pooled_query(db_conn), threads, args.duration)
+            print(f'{threads:2d} thread(s): unpooled {unpooled:10.0f} q/s | pooled {pooled:10.0f} q/s | '
+                  f'speedup {pooled / unpooled:5.2f}x')
+        close_all_pools()
+
+
+if __name__ == '__main__':
+    main()
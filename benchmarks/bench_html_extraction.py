@@ -0,0 +1,123 @@
+"""
+HTML Extraction Benchmark
+=========================
+
+Compares extracting the paragraphs and coordinates of a Wikipedia page by parsing the whole page with BeautifulSoup
+(as ``_get_article_features`` used to) against ``HTMLExtractor``, which only parses the paragraphs of the article body.
+
+Pages are read from ``--pages``, a folder of saved ``.html`` pages, or else from the scraper's page cache if it has
+any pages; otherwise a synthetic page shaped like a skinned Wikipedia article is used.
+
+Usage: ``python benchmarks/bench_html_extraction.py [--pages FOLDER] [--repeat N]``
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+import bs4
+
+from bench_utils import top_level_dir
+
+from trivia_generator.web_scraper.HTMLExtractor import extract_coordinates, extract_paragraphs, preprocess_text
+
+PAGE_CACHE_FILENAME = os.path.join(top_level_dir, 'trivia_generator', 'web_scraper', 'page_cache', 'pages.db')
+
+
+def synthetic_page(num_paragraphs: int = 40, num_navboxes: int = 10, num_references: int = 300) -> str:
+    paragraph = ('<p>The <b>Liberty Bell</b> is an iconic symbol of American independence, located in '
+                 '<a href="/wiki/Philadelphia">Philadelphia</a>.<sup class="reference"><a href="#cite_note-1">[1]'
+                 '</a></sup> Once placed in the steeple of the Pennsylvania State House (now renamed Independence '
+                 'Hall), the bell today is located across the street.<sup class="noprint">[citation needed]</sup> '
+                 'It was cast in London in 1752 and recast twice in Philadelphia.</p>\n')
+    navbox = ('<div class="navbox"><table>' + ''.join(f'<tr><th>Group {i}</th><td><ul>'
+                                                        + '<li><a href="/wiki/X">Link</a></li>' * 20
+                                                        + '</ul></td></tr>' for i in range(8)) + '</table></div>\n')
+    reference = ('<li id="cite_note-{i}"><span class="reference-text"><cite class="citation web">'
+                 '<a href="https://example.org/{i}">Reference {i}</a>. Retrieved 2020.</cite></span></li>\n')
+    skin = ('<div id="mw-navigation">' + '<div class="portal"><ul>' + '<li><a href="/wiki/Y">Nav</a></li>' * 50
+            + '</ul></div>' * 5 + '</div>\n')
+    return ('<!DOCTYPE html><html><head><title>Liberty Bell - Wikipedia</title>'
+            + '<link rel="stylesheet" href="/style.css">' * 20 + '</head><body>'
+            + skin + '<div id="content"><h1>Liberty Bell</h1>'
+            + '<div id="mw-content-text" class="mw-body-content"><div class="mw-parser-output">'
+            + '<span class="geo-dms"><span class="latitude">39°56′58″N</span> '
+            + '<span class="longitude">75°09′01″W</span></span>'
+            + '<table class="infobox">' + '<tr><th>Key</th><td>Value</td></tr>' * 30 + '</table>'
+            + paragraph * num_paragraphs + navbox * num_navboxes
+            + '<ol class="references">' + ''.join(reference.format(i=i) for i in range(num_references)) + '</ol>'
+            + '</div></div><div class="printfooter">Retrieved from Wikipedia</div>'
+            + '<div id="catlinks"><ul>' + '<li><a href="/wiki/Category:Z">Category</a></li>' * 20 + '</ul></div>'
+            + '</div>' + skin + '</body></html>')
+
+
+def extract_with_full_parse(page_html: str) -> tuple:
+    soup = bs4.BeautifulSoup(page_html, features="html.parser")
+    content = ''
+    for tag in soup.findAll('p'):
+        span_tags = tag.findAll('span')
+        for span in span_tags:
+            if span.has_attr('mwe-math-element'):
+                break
+        else:
+            content += ''.join(tag.strings) + '\n'
+    while '[citation needed]' in content:
+        previous = content
+        content = re.sub(r'\.([^.]*?\.)\[citation needed\]', '.', content)
+        if content == previous:
+            # the old loop never ends here; stop so that the benchmark can finish
+            break
+    content = re.sub(r' ?\[.*?\]', '', content)
+    content = re.sub(r' ?\(.*?\)', '', content)
+    long_span = soup.find('span', {'class': 'longitude'})
+    lat_span = soup.find('span', {'class': 'latitude'})
+    return content, lat_span.text if lat_span else None, long_span.text if long_span else None
+
+
+def extract_with_html_extractor(page_html: str) -> tuple:
+    latitude, longitude = extract_coordinates(page_html)
+    return preprocess_text(extract_paragraphs(page_html)), latitude, longitude
+
+
+def load_pages(folder: str) -> list:
+    if folder is not None:
+        pages = []
+        for filename in sorted(glob.glob(os.path.join(folder, '*.html'))):
+            with open(filename, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+        return pages
+    if os.path.exists(PAGE_CACHE_FILENAME):
+        db = sqlite3.connect(PAGE_CACHE_FILENAME)
+        pages = [zlib.decompress(data).decode('utf-8') for data, in db.execute('SELECT data FROM blob LIMIT 50;')]
+        db.close()
+        if pages:
+            return pages
+    return [synthetic_page()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', help='a folder of saved Wikipedia pages')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    print(f'{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB on average')
+    mismatches = sum(extract_with_full_parse(page) != extract_with_html_extractor(page) for page in pages)
+    timings = dict()
+    for name, extract in [('full parse', extract_with_full_parse), ('HTMLExtractor', extract_with_html_extractor)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for page in pages:
+                extract(page)
+        timings[name] = (time.perf_counter() - start) / (args.repeat * len(pages)) * 1000
+        print(f'{name:14s}: {timings[name]:8.2f} ms/page')
+    print(f'speedup: {timings["full parse"] / timings["HTMLExtractor"]:.1f}x | '
+          f'{mismatches} pages extracted differently')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+HTTP Connection Pool Benchmark
+==============================
+
+Measures page fetches per second with a fresh connection per request (bare ``requests.get``, as the scraper used to
+do) and with the pooled keep-alive ``HTTPClient``.
+
+The pages are served by a local HTTP/1.1 server that sleeps for ``--handshake-ms`` whenever it accepts a new
+connection, standing in for the TCP and TLS handshakes of a real connection to Wikipedia.
+
+Usage: ``python benchmarks/bench_http_pool.py [--requests N] [--threads N] [--handshake-ms MS]``
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from bench_utils import top_level_dir  # noqa: F401 (adds the top level folder to the path)
+
+from trivia_generator.web_scraper.HTTPClient import HTTPClient
+
+PAGE = b'<html><body>' + b'<p>Some trivia.</p>' * 2000 + b'</body></html>'
+
+
+def make_handler(handshake_seconds: float, connections: list):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            connections[0] += 1
+            time.sleep(handshake_seconds)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def measure(fetch, url: str, num_requests: int, num_threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for size in executor.map(lambda _: len(fetch(url).content), range(num_requests)):
+            assert size == len(PAGE)
+    return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--handshake-ms', type=float, default=30.0)
+    args = parser.parse_args()
+
+    connections = [0]
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.handshake_ms / 1000, connections))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/wiki/Trivia'
+
+    client = HTTPClient(pool_maxsize=args.threads)
+    for name, fetch in [('requests.get', requests.get), ('HTTPClient', client.get)]:
+        connections[0] = 0
+        rate = measure(fetch, url, args.requests, args.threads)
+        print(f'{name:12s}: {rate:8.1f} pages/s | {connections[0]:5d} connections opened')
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Request Scheduler Benchmark
+===========================
+
+Measures how many pages per second a burst of scraper threads gets from a rate-limited server, with requests sent
+straight away and retried at once on failure (as the ``while page_html is None`` loops in ``WebScraper`` do), and
+with requests paced by a ``RequestScheduler``.
+
+The local server allows ``--server-rate`` requests per second. Beyond that it answers 429 with a ``Retry-After``,
+and every request counts against the limit, including rejected ones, so clients that ignore the throttling keep the
+server throttled.
+
+Usage: ``python benchmarks/bench_request_scheduler.py [--threads N] [--duration SECONDS] [--server-rate N]``
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from bench_utils import top_level_dir  # noqa: F401 (adds the top level folder to the path)
+
+from trivia_generator.web_scraper.HTTPClient import HTTPClient
+from trivia_generator.web_scraper.RequestScheduler import RequestScheduler, TokenBucket
+
+PAGE = b'<html><body>' + b'<p>Some trivia.</p>' * 500 + b'</body></html>'
+
+
+def make_handler(server_rate: float, served: list):
+    limit = TokenBucket(server_rate, server_rate / 4)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with lock:
+                limit._refill(time.monotonic())
+                limit._tokens -= 1
+                allowed = limit._tokens >= 0
+                if not allowed:
+                    # Hammering while throttled does not buy anything: the debt is capped at one second.
+                    limit._tokens = max(limit._tokens, -server_rate)
+            time.sleep(0.02)
+            if allowed:
+                served[0] += 1
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(PAGE)))
+                self.end_headers()
+                self.wfile.write(PAGE)
+            else:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def run_clients(client: HTTPClient, url: str, num_threads: int, duration: float) -> int:
+    stopped = threading.Event()
+    pages = [0] * num_threads
+
+    def scrape(i: int):
+        while not stopped.is_set():
+            try:
+                client.get(url)
+                pages[i] += 1
+            except requests.RequestException:
+                pass
+
+    threads = [threading.Thread(target=scrape, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stopped.set()
+    for thread in threads:
+        thread.join()
+    return sum(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--server-rate', type=float, default=40.0)
+    parser.add_argument('--client-rate', type=float, default=60.0, help='the scheduler rate, deliberately too high')
+    args = parser.parse_args()
+
+    for name, scheduler in [('unscheduled', None),
+                            ('scheduled', RequestScheduler(rate=args.client_rate, burst=10,
+                                                           max_concurrency=args.threads, backoff_base=0.1))]:
+        served = [0]
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.server_rate, served))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = HTTPClient(pool_maxsize=args.threads, scheduler=scheduler)
+        start = time.monotonic()
+        pages = run_clients(client, f'http://127.0.0.1:{server.server_address[1]}/wiki/Trivia', args.threads,
+                            args.duration)
+        elapsed = time.monotonic() - start
+        client.close()
+        server.shutdown()
+        server.server_close()
+        stats = '' if scheduler is None else f' | {scheduler.stats()["throttled"]} throttled, ' \
+                                             f'final concurrency {scheduler.stats()["concurrency_limit"]:.1f}'
+        print(f'{name:12s}: {pages / elapsed:6.1f} pages/s (server allows {args.server_rate:.0f}){stats}')
+
+
+if __name__ == '__main__':
+    main()
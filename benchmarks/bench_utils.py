@@ -0,0 +1,66 @@
+"""
+Benchmark Utilities
+===================
+
+Helpers shared by the benchmark scripts in this folder.
+"""
+import os
+import random
+import sqlite3
+import sys
+import time
+
+top_level_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(top_level_dir)
+
+SCHEMA_FILENAME = os.path.join(top_level_dir, 'database_connection', 'test_sql', 'test_schema.sql')
+
+
+def make_database(db_filename: str, num_articles: int = 10000, num_categories: int = 1000,
+                  categories_per_article: int = 5, tunits_per_article: int = 3, seed: int = 0):
+    """Creates a database with the test schema filled with synthetic rows.
+
+    :param db_filename: the path of the database file to create. Any existing file is replaced.
+    :returns: the path of the database file.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(db_filename):
+        os.remove(db_filename)
+    db = sqlite3.connect(db_filename)
+    with open(SCHEMA_FILENAME, 'r') as f:
+        db.executescript(f.read())
+    db.executemany('INSERT INTO category (category_id, name, importance) VALUES (?, ?, ?)',
+                   [(i, f'category_{i}', rng.random() * 10) for i in range(1, num_categories + 1)])
+    db.executemany('INSERT INTO article (article_id, title, lat, long) VALUES (?, ?, ?, ?)',
+                   [(i, f'article_{i}', rng.uniform(25, 49), rng.uniform(-124, -67))
+                    for i in range(1, num_articles + 1)])
+    db.executemany('INSERT OR IGNORE INTO article_category (article_id, category_id) VALUES (?, ?)',
+                   [(i, rng.randint(1, num_categories))
+                    for i in range(1, num_articles + 1) for _ in range(categories_per_article)])
+    db.executemany('''INSERT INTO t_unit (article_id, sentence, url, access_timestamp, lat, long, num_likes, num_mehs,
+                          num_dislikes)
+                      SELECT article_id, ?, 'url', 0, lat, long, 0, 0, 0 FROM article WHERE article_id = ?''',
+                   [(f'sentence {j} of article {i}.', i)
+                    for i in range(1, num_articles + 1) for j in range(tunits_per_article)])
+    db.executemany('INSERT INTO location (zip, lat, long) VALUES (?, ?, ?)',
+                   [(f'{i:05d}', rng.uniform(25, 49), rng.uniform(-124, -67)) for i in range(1000)])
+    db.executemany('INSERT INTO user (username, email, password, wins, losses, num_answered, num_answered_correct) '
+                   'VALUES (?, ?, ?, 0, 0, 0, 0)',
+                   [(f'user_{i}', f'user_{i}@email.com', 'pass') for i in range(1000)])
+    db.commit()
+    db.close()
+    return db_filename
+
+
+def measure_rate(function, duration: float = 2.0) -> float:
+    """Calls *function* repeatedly for about *duration* seconds.
+
+    :returns: the number of calls per second.
+    """
+    calls = 0
+    start = time.perf_counter()
+    end = start + duration
+    while time.perf_counter() < end:
+        function()
+        calls += 1
+    return calls / (time.perf_counter() - start)
@@ -0,0 +1,123 @@
+"""
+Mixed Read/Write Benchmark
+==========================
+
+Measures the latency of game-style reads while a bulk load writes to the same database, with the storage settings
+from ``db.ini`` and with the same settings on SQLite's default rollback journal.
+
+A writer thread inserts articles and their categories in large transactions, as ``load_categories.py`` does, while
+reader threads look up the categories of random articles. The rows are generated by SQLite itself, so the writer does
+not compete with the readers for the GIL. The default batch outgrows the page cache from ``db.ini``, as a bulk load
+does: with the rollback journal the writer then locks the readers out until it commits, while in WAL mode they keep
+reading the last committed state.
+
+Each reader is held up about once per transaction, so the lock shows in the worst latency and in the reads stalled
+for longer than ``--stall-ms`` rather than in the percentiles, which are dominated by the GIL.
+
+Usage: ``python benchmarks/bench_wal_mixed.py [--duration SECONDS] [--readers N] [--batch-size ROWS]
+[--stall-ms MS]``
+"""
+import argparse
+import dataclasses
+import os
+import random
+import tempfile
+import threading
+import time
+
+from bench_utils import make_database, top_level_dir
+
+from database_connection.connection_pool import ConnectionPool
+from database_connection.dbconn import DBConn, _read_config
+from database_connection.storage import StorageSettings
+
+READ_QUERY = '''
+             SELECT name
+             FROM article_category
+                 JOIN category ON article_category.category_id = category.category_id
+             WHERE article_id = ?;
+             '''
+INSERT_ARTICLES = '''
+                  WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+                  INSERT INTO article (title)
+                  SELECT 'loaded_' || hex(randomblob(8)) FROM n;
+                  '''
+INSERT_CATEGORIES = '''
+                    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5)
+                    INSERT OR IGNORE INTO article_category (article_id, category_id)
+                    SELECT article_id, abs(random()) % ? + 1 FROM article, n WHERE article_id > ?;
+                    '''
+
+
+def run_writer(pool: ConnectionPool, stopped: threading.Event, batch_size: int, num_categories: int,
+               counts: list):
+    with pool.connection() as db:
+        while not stopped.is_set():
+            db.execute('BEGIN IMMEDIATE;')
+            first_id = db.execute('SELECT MAX(article_id) FROM article;').fetchone()[0]
+            db.execute(INSERT_ARTICLES, (batch_size,))
+            db.execute(INSERT_CATEGORIES, (num_categories, first_id))
+            db.commit()
+            counts[0] += batch_size
+
+
+def run_reader(pool: ConnectionPool, stopped: threading.Event, num_articles: int, latencies: list):
+    rng = random.Random()
+    while not stopped.is_set():
+        start = time.perf_counter()
+        with pool.connection() as db:
+            db.execute(READ_QUERY, (rng.randint(1, num_articles),)).fetchall()
+        latencies.append(time.perf_counter() - start)
+
+
+def measure(db_filename: str, settings: StorageSettings, args) -> tuple:
+    pool = ConnectionPool(db_filename, max_size=args.readers + 1, on_connect=settings.apply)
+    stopped = threading.Event()
+    written = [0]
+    latencies = [[] for _ in range(args.readers)]
+    threads = [threading.Thread(target=run_writer, args=(pool, stopped, args.batch_size, args.categories, written))]
+    threads += [threading.Thread(target=run_reader, args=(pool, stopped, args.articles, latencies[i]))
+                for i in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stopped.set()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    latencies = sorted(latency for reader in latencies for latency in reader)
+    return latencies, written[0]
+
+
+def percentile(latencies: list, p: float) -> float:
+    return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=500000)
+    parser.add_argument('--articles', type=int, default=50000)
+    parser.add_argument('--categories', type=int, default=1000)
+    parser.add_argument('--stall-ms', type=float, default=100.0)
+    args = parser.parse_args()
+
+    settings = StorageSettings.from_config(_read_config(os.path.join(top_level_dir, 'database_connection',
+                                                                     DBConn.DB_CONFIG_FILE)))
+    modes = [('rollback journal', dataclasses.replace(settings, journal_mode='DELETE', synchronous='FULL')),
+             (f'{settings.journal_mode} (db.ini)', settings)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, settings in modes:
+            db_filename = make_database(os.path.join(tmp_dir, 'bench.db'), num_articles=args.articles,
+                                        num_categories=args.categories)
+            latencies, written = measure(db_filename, settings, args)
+            stalls = [latency for latency in latencies if latency * 1000 > args.stall_ms]
+            print(f'{name:16s}: {len(latencies) / args.duration:8.0f} reads/s | latency ms p50 '
+                  f'{percentile(latencies, 0.5):7.3f} p99.9 {percentile(latencies, 0.999):8.3f} max '
+                  f'{latencies[-1] * 1000:8.1f} | {len(stalls):3d} stalls, {sum(stalls):6.2f} s | writer '
+                  f'{written / args.duration:8.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
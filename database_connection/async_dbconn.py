@@ -0,0 +1,93 @@
+"""
+Async Database Connection
+=========================
+
+A non-blocking facade over DBConn for request handlers.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from database_connection.dbconn import DBConn, get_db_conn
+
+
+class AsyncDBConn:
+    """Runs DBConn queries on a dedicated thread pool, so callers can keep working while a query runs.
+
+    Every public DBConn method is available with the same arguments, but returns a ``concurrent.futures.Future``
+    instead of the result::
+
+        user = async_db_conn.select_user(username)        # returns immediately
+        ...                                                # fetch a page, run NLP, ...
+        user = user.result()
+
+    Asyncio code can await ``run`` instead::
+
+        user = await async_db_conn.run('select_user', username)
+
+    :param db_conn: the DBConn to run queries on (default: the process-wide DBConn).
+    :type db_conn: DBConn
+    :param max_workers: the number of query threads (default: the size of the DBConn's connection pool).
+    :type max_workers: int
+    """
+
+    def __init__(self, db_conn: DBConn = None, max_workers: int = None):
+        self.db_conn = get_db_conn() if db_conn is None else db_conn
+        if max_workers is None:
+            max_workers = self.db_conn.pool.max_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dbconn')
+
+    def submit(self, method_name: str, *args, **kwargs) -> Future:
+        """Starts running a DBConn method on the query threads.
+
+        :param method_name: the name of a public DBConn method.
+        :type method_name: str
+        :returns: a future for the method's return value.
+        """
+        if method_name.startswith('_'):
+            raise AttributeError(f'{method_name} is not a public DBConn method')
+        return self.executor.submit(getattr(self.db_conn, method_name), *args, **kwargs)
+
+    async def run(self, method_name: str, *args, **kwargs):
+        """Runs a DBConn method on the query threads without blocking the event loop.
+
+        :param method_name: the name of a public DBConn method.
+        :type method_name: str
+        :returns: the method's return value.
+        """
+        return await asyncio.wrap_future(self.submit(method_name, *args, **kwargs))
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not callable(getattr(DBConn, name, None)):
+            raise AttributeError(name)
+
+        def submit_method(*args, **kwargs) -> Future:
+            return self.submit(name, *args, **kwargs)
+
+        submit_method.__name__ = name
+        submit_method.__doc__ = getattr(DBConn, name).__doc__
+        return submit_method
+
+    def shutdown(self, wait: bool = True):
+        """Stops the query threads once the queries already submitted have run.
+
+        :param wait: whether to block until they have finished.
+        """
+        self.executor.shutdown(wait=wait)
+
+
+async_db_conn = None
+_async_db_conn_lock = threading.Lock()
+
+
+def get_async_db_conn() -> AsyncDBConn:
+    """Gets the process-wide AsyncDBConn over the process-wide DBConn, creating it on first use.
+
+    :returns: the shared AsyncDBConn.
+    :rtype: AsyncDBConn
+    """
+    global async_db_conn
+    with _async_db_conn_lock:
+        if async_db_conn is None:
+            async_db_conn = AsyncDBConn()
+        return async_db_conn
@@ -0,0 +1,107 @@
+"""
+Cache
+=====
+
+A small thread-safe, size-bounded least-recently-used cache, with optional expiry.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Mapping that keeps at most *maxsize* entries, dropping the least recently used one first.
+
+    :param maxsize: the maximum number of entries.
+    :type maxsize: int
+    :param ttl: the number of seconds an entry stays valid after it is cached, or None to keep it until evicted.
+    :type ttl: float
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Gets the value cached for *key*, marking it as recently used.
+
+        :returns: the cached value, or *default* if *key* is not cached.
+        """
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            expires, value = self._entries[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Caches *value* for *key*, evicting the least recently used entry if the cache is full."""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Removes the entry for *key*, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Removes every entry whose key satisfies *predicate*."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Gets the number of lookups that found an entry and that did not, along with the size of the cache.
+
+        :returns: the hits, misses, size and maxsize of the cache.
+        :rtype: {str: int}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+_shared_caches = dict()
+_shared_caches_lock = threading.Lock()
+
+
+def get_shared_cache(key, **kwargs) -> LRUCache:
+    """Gets a process-wide cache, creating it on first use.
+
+    :param key: identifies the cache, e.g. its purpose and the database file it caches.
+    :returns: the cache for that key.
+    """
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = LRUCache(**kwargs)
+            _shared_caches[key] = cache
+        return cache
+
+
+def clear_shared_caches():
+    """Forgets every process-wide cache."""
+    with _shared_caches_lock:
+        _shared_caches.clear()
@@ -0,0 +1,84 @@
+"""
+Category Index
+==============
+
+A trigram full-text index over category names, kept up to date by triggers.
+
+The trigram tokenizer lets ``LIKE '%name%'`` searches use the index while keeping the exact semantics of ``LIKE``.
+"""
+import sqlite3
+from sqlite3 import Connection
+
+CATEGORY_INDEX_SCRIPT = """
+CREATE VIRTUAL TABLE IF NOT EXISTS category_name_index
+USING fts5(name, content='category', content_rowid='category_id', tokenize='trigram');
+
+INSERT INTO category_name_index(category_name_index) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS category_name_insert AFTER INSERT ON category
+BEGIN
+    INSERT INTO category_name_index(rowid, name) VALUES (new.category_id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS category_name_update AFTER UPDATE OF category_id, name ON category
+BEGIN
+    INSERT INTO category_name_index(category_name_index, rowid, name) VALUES ('delete', old.category_id, old.name);
+    INSERT INTO category_name_index(rowid, name) VALUES (new.category_id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS category_name_delete AFTER DELETE ON category
+BEGIN
+    INSERT INTO category_name_index(category_name_index, rowid, name) VALUES ('delete', old.category_id, old.name);
+END;
+"""
+
+# Used when the SQLite library was built without FTS5 or predates the trigram tokenizer (3.34).
+FALLBACK_SEARCH_QUERY = 'SELECT category_id FROM category WHERE name LIKE ?;'
+SEARCH_QUERY = 'SELECT rowid FROM category_name_index WHERE name LIKE ?;'
+
+
+def ensure_category_index(db: Connection):
+    """Creates and fills the category name index of a database, if it does not have one yet.
+
+    Does nothing if this SQLite library cannot build the index.
+
+    :param db: a connection to the database.
+    """
+    row = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'category_name_index';").fetchone()
+    if row is not None:
+        return
+    try:
+        db.executescript(CATEGORY_INDEX_SCRIPT)
+    except sqlite3.OperationalError:
+        db.rollback()
+    db.commit()
+
+
+def search_category_ids(db: Connection, name: str) -> list:
+    """Finds the ids of the categories whose name contains *name*, as ``LIKE '%name%'`` would.
+
+    :param db: a connection to the database.
+    :param name: the text to search for.
+    :returns: the matching category ids, in ascending order.
+    :rtype: [int]
+    """
+    pattern = '%' + name + '%'
+    try:
+        rows = db.execute(SEARCH_QUERY, (pattern,)).fetchall()
+    except sqlite3.OperationalError:
+        rows = db.execute(FALLBACK_SEARCH_QUERY, (pattern,)).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def drop_category_index(db: Connection):
+    """Drops the category name index and its triggers, e.g. before a bulk load. ``ensure_category_index`` rebuilds
+    it in a single pass afterwards.
+
+    :param db: a connection to the database.
+    """
+    db.executescript("""
+        DROP TRIGGER IF EXISTS category_name_insert;
+        DROP TRIGGER IF EXISTS category_name_update;
+        DROP TRIGGER IF EXISTS category_name_delete;
+        DROP TABLE IF EXISTS category_name_index;
+        """)
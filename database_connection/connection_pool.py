@@ -0,0 +1,199 @@
+"""
+Connection Pool
+===============
+
+A bounded, thread-aware pool of long-lived SQLite connections.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import partial
+from queue import LifoQueue, Empty, Full
+
+
+class ConnectionPool:
+    """Pool of SQLite connections shared by every thread of the process.
+
+    Connections are opened lazily up to *max_size* and handed out one thread at a time. A thread that already holds a
+    connection gets the same one back when it asks again, so nested ``DBConn`` calls never need a second connection.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :param max_size: the maximum number of open connections.
+    :type max_size: int
+    :param cached_statements: the size of each connection's prepared-statement cache.
+    :type cached_statements: int
+    :param timeout: the number of seconds to wait for a free connection before giving up.
+    :type timeout: float
+    :param on_connect: an optional function called with every newly opened connection.
+    :type on_connect: Callable[[sqlite3.Connection], None]
+    :param on_first_connect: an optional function called once, with the first connection the pool opens, after
+        *on_connect* and before any connection is handed out, e.g. to migrate the database schema.
+    :type on_first_connect: Callable[[sqlite3.Connection], None]
+    :param factory: the connection class to open.
+    :type factory: type
+    """
+
+    def __init__(self, db_filename: str, max_size: int = 8, cached_statements: int = 256, timeout: float = 30.0,
+                 on_connect=None, factory=sqlite3.Connection, on_first_connect=None):
+        self.db_filename = db_filename
+        self.max_size = max(1, max_size)
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self.on_first_connect = on_first_connect
+        self.factory = factory
+        self._idle = LifoQueue(maxsize=self.max_size)
+        self._num_open = 0
+        self._lock = threading.Lock()
+        self._first_connect_lock = threading.Lock()
+        self._first_connect_done = on_first_connect is None
+        self._local = threading.local()
+        self._connections = []
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        """Opens a new connection to the pool's database file. Runs outside the pool lock, so that a slow
+        *on_first_connect* only holds up the threads that are opening connections."""
+        db = sqlite3.connect(self.db_filename, timeout=self.timeout, check_same_thread=False,
+                             cached_statements=self.cached_statements, factory=self.factory)
+        try:
+            if self.on_connect is not None:
+                self.on_connect(db)
+            if not self._first_connect_done:
+                with self._first_connect_lock:
+                    if not self._first_connect_done:
+                        self.on_first_connect(db)
+                        self._first_connect_done = True
+        except BaseException:
+            db.close()
+            raise
+        return db
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Takes an idle connection, opening one if the pool is not yet full.
+
+        :raises OperationalError: if no connection becomes free within the pool timeout.
+        :raises ProgrammingError: if the pool has been closed.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError('connection pool is closed')
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError('connection pool is closed')
+            can_open = self._num_open < self.max_size
+            if can_open:
+                # Claim the slot now and open the connection once the lock is released.
+                self._num_open += 1
+        if can_open:
+            try:
+                db = self._open()
+            except BaseException:
+                with self._lock:
+                    self._num_open -= 1
+                raise
+            with self._lock:
+                self._connections.append(db)
+            return db
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except Empty:
+            raise sqlite3.OperationalError('timed out waiting for a database connection')
+
+    def _release(self, db: sqlite3.Connection):
+        """Returns a connection to the pool, closing it if the pool has been closed."""
+        if self._closed:
+            db.close()
+            return
+        try:
+            self._idle.put_nowait(db)
+        except Full:
+            db.close()
+
+    @contextmanager
+    def connection(self) -> sqlite3.Connection:
+        """Borrows a connection for the duration of a ``with`` block.
+
+        Any open transaction is rolled back if the block raises, so a connection always goes back to the pool clean.
+        """
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            yield db
+            return
+
+        db = self._acquire()
+        self._local.db = db
+        try:
+            yield db
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            self._local.db = None
+            self._release(db)
+
+    def close(self):
+        """Closes every connection owned by the pool. Connections still borrowed are closed when they are returned,
+        and the pool hands out no more connections."""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except Empty:
+                break
+        for db in connections:
+            db.close()
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def _same_setting(current, requested) -> bool:
+    """Compares two pool settings, treating partial functions with the same function and arguments as equal."""
+    if isinstance(current, partial) and isinstance(requested, partial):
+        return current.func == requested.func and current.args == requested.args \
+            and current.keywords == requested.keywords
+    return current == requested
+
+
+def get_pool(db_filename: str, **kwargs) -> ConnectionPool:
+    """Gets the process-wide pool for a database file, creating it on first use.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :param kwargs: the settings of the pool, passed on to ``ConnectionPool``.
+    :raises ValueError: if the pool for that file already exists with different settings.
+    :returns: the connection pool for that file.
+    """
+    pool = _pools.get(db_filename)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_filename)
+            if pool is None:
+                pool = ConnectionPool(db_filename, **kwargs)
+                _pools[db_filename] = pool
+                return pool
+    for name, requested in kwargs.items():
+        if name == 'max_size':
+            requested = max(1, requested)
+        if not _same_setting(getattr(pool, name), requested):
+            raise ValueError(f'the connection pool for {db_filename} already exists with a different {name}')
+    return pool
+
+
+def close_all_pools():
+    """Closes and forgets every pool, e.g. before a database file is deleted or replaced."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
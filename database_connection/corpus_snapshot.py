@@ -0,0 +1,248 @@
+"""
+Corpus Snapshot
+===============
+
+A read-only, memory-mapped copy of the TUnit corpus for game workers.
+
+``export_corpus_snapshot`` writes every TUnit into a single file: the numeric columns as fixed-width arrays, and the
+sentences and urls as UTF-8 blobs indexed by offset arrays. ``CorpusSnapshot`` maps that file and reads TUnits straight
+out of the mapping, so every server process on a machine shares one page-cached copy of the corpus instead of holding
+its own query results.
+
+Usage: ``python -m database_connection.corpus_snapshot [--db FILE] [--out tunits.snapshot]``
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from database_connection.dbconn import DBConn
+from database_connection.spatial_index import EARTH_RADIUS_MILES
+from trivia_generator.TUnit import TUnit
+
+MAGIC = b'ITTUNIT2'
+# magic, number of TUnits, size of the sentence blob, size of the url blob
+HEADER_FORMAT = '<8sQQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# The permissions of a snapshot file, before the umask is applied.
+SNAPSHOT_MODE = 0o644
+
+# The numeric columns, in file order. Missing integers are stored as -1 and missing reals as NaN.
+NUMERIC_COLUMNS = [
+    ('t_unit_id', '<i8'),
+    ('article_id', '<i8'),
+    ('access_timestamp', '<i8'),
+    ('lat', '<f8'),
+    ('long', '<f8'),
+    ('num_likes', '<i8'),
+    ('num_mehs', '<i8'),
+    ('num_dislikes', '<i8'),
+]
+
+EXPORT_QUERY = """
+               SELECT t_unit_Id, article_id, access_timestamp, lat, long, num_likes, num_mehs, num_dislikes,
+                   sentence, url
+               FROM t_unit
+               ORDER BY t_unit_Id;
+               """
+FETCH_SIZE = 10000
+
+
+def export_corpus_snapshot(db_filename: str, snapshot_filename: str) -> int:
+    """Writes every TUnit of a database to a snapshot file.
+
+    The file is written next to its destination and then renamed over it, so processes that have the previous
+    snapshot mapped keep reading it undisturbed. If the export fails, the partly written file is removed.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :param snapshot_filename: the path of the snapshot file to write.
+    :type snapshot_filename: str
+    :raises DatabaseError:
+    :returns: the number of TUnits written.
+    :rtype: int
+    """
+    columns = [array('q' if dtype.endswith('i8') else 'd') for _, dtype in NUMERIC_COLUMNS]
+    sentence_offsets = array('q', [0])
+    url_offsets = array('q', [0])
+    db = sqlite3.connect(db_filename)
+    try:
+        with tempfile.TemporaryFile() as sentences, tempfile.TemporaryFile() as urls:
+            cursor = db.execute(EXPORT_QUERY)
+            rows = cursor.fetchmany(FETCH_SIZE)
+            while rows:
+                for row in rows:
+                    for column, value in zip(columns, row):
+                        if column.typecode == 'q':
+                            column.append(-1 if value is None else int(value))
+                        else:
+                            column.append(float('nan') if value is None else value)
+                    sentence = row[8].encode('utf-8')
+                    url = (row[9] or '').encode('utf-8')
+                    sentences.write(sentence)
+                    urls.write(url)
+                    sentence_offsets.append(sentence_offsets[-1] + len(sentence))
+                    url_offsets.append(url_offsets[-1] + len(url))
+                rows = cursor.fetchmany(FETCH_SIZE)
+
+            directory = os.path.dirname(os.path.abspath(snapshot_filename))
+            f = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+            try:
+                with f:
+                    f.write(struct.pack(HEADER_FORMAT, MAGIC, len(sentence_offsets) - 1, sentence_offsets[-1],
+                                        url_offsets[-1]))
+                    for column, (_, dtype) in zip(columns, NUMERIC_COLUMNS):
+                        np.asarray(column, dtype=dtype).tofile(f)
+                    np.asarray(sentence_offsets, dtype='<i8').tofile(f)
+                    np.asarray(url_offsets, dtype='<i8').tofile(f)
+                    for blob in (sentences, urls):
+                        blob.seek(0)
+                        shutil.copyfileobj(blob, f)
+                # NamedTemporaryFile creates the file readable by its owner only, but every server process maps it.
+                os.chmod(f.name, SNAPSHOT_MODE & ~_umask())
+                os.replace(f.name, snapshot_filename)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+    finally:
+        db.close()
+    return len(sentence_offsets) - 1
+
+
+class CorpusSnapshot:
+    """Zero-copy reader of a TUnit snapshot file.
+
+    The numeric columns are exposed as read-only NumPy arrays backed by the mapping (e.g. ``snapshot.lat``), so they
+    can be filtered with vectorized operations without reading the whole file into memory. TUnits are materialized
+    one at a time, only when asked for.
+
+    :param filename: the path of a file written by ``export_corpus_snapshot``.
+    :type filename: str
+    :raises ValueError: if the file is not a TUnit snapshot.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        if len(self._buffer) < HEADER_SIZE:
+            raise ValueError(f'{filename} is not a TUnit snapshot')
+        magic, count, sentences_size, urls_size = struct.unpack_from(HEADER_FORMAT, self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{filename} is not a TUnit snapshot')
+        self._count = count
+        offset = HEADER_SIZE
+        for name, dtype in NUMERIC_COLUMNS:
+            setattr(self, name, np.frombuffer(self._buffer, dtype=dtype, count=count, offset=offset))
+            offset += 8 * count
+        self._sentence_offsets = np.frombuffer(self._buffer, dtype='<i8', count=count + 1, offset=offset)
+        offset += 8 * (count + 1)
+        self._url_offsets = np.frombuffer(self._buffer, dtype='<i8', count=count + 1, offset=offset)
+        offset += 8 * (count + 1)
+        self._sentences = self._buffer[offset:offset + sentences_size]
+        offset += sentences_size
+        self._urls = self._buffer[offset:offset + urls_size]
+
+    def __len__(self):
+        return self._count
+
+    def sentence(self, i: int) -> str:
+        """Gets the sentence of the TUnit at position *i*.
+
+        :param i: the position of the TUnit in the snapshot, in t_unit_Id order.
+        :returns: the sentence.
+        """
+        return self._sentences[self._sentence_offsets[i]:self._sentence_offsets[i + 1]].tobytes().decode('utf-8')
+
+    def tunit(self, i: int) -> TUnit:
+        """Gets the TUnit at position *i*.
+
+        :param i: the position of the TUnit in the snapshot, in t_unit_Id order.
+        :returns: the TUnit.
+        :rtype: TUnit
+        """
+        url = self._urls[self._url_offsets[i]:self._url_offsets[i + 1]].tobytes().decode('utf-8')
+        return TUnit(self.sentence(i), _optional_int(self.article_id[i]), url or None,
+                     _optional_int(self.access_timestamp[i]), int(self.t_unit_id[i]), _optional_float(self.lat[i]),
+                     _optional_float(self.long[i]), int(self.num_likes[i]), int(self.num_mehs[i]),
+                     int(self.num_dislikes[i]))
+
+    def find(self, t_unit_id: int) -> Optional[TUnit]:
+        """Gets a TUnit by its t_unit_Id.
+
+        :param t_unit_id: the id of the TUnit.
+        :returns: the TUnit, or None if it is not in the snapshot.
+        """
+        i = int(np.searchsorted(self.t_unit_id, t_unit_id))
+        if i < self._count and self.t_unit_id[i] == t_unit_id:
+            return self.tunit(i)
+        return None
+
+    def indices_within(self, lat: float, long: float, radius: float) -> np.ndarray:
+        """Finds the TUnits located within *radius* miles of a point.
+
+        :param lat: the latitude of the point, in decimal degrees.
+        :param long: the longitude of the point, in decimal degrees.
+        :param radius: the radius, in miles.
+        :returns: the positions of the TUnits, in t_unit_Id order.
+        """
+        lats = np.radians(self.lat)
+        longs = np.radians(self.long)
+        query_lat, query_long = np.radians(lat), np.radians(long)
+        a = np.sin((query_lat - lats) / 2) ** 2 \
+            + np.cos(lats) * np.cos(query_lat) * np.sin((query_long - longs) / 2) ** 2
+        distances = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+        # NaN coordinates compare False, so TUnits without a location are never selected
+        return np.flatnonzero(distances < radius)
+
+    def sample(self, k: int, indices: np.ndarray = None, rng: np.random.Generator = None) -> list:
+        """Draws up to *k* distinct TUnits uniformly at random.
+
+        :param k: the number of TUnits to draw.
+        :param indices: the positions to draw from, e.g. from ``indices_within`` (default: every TUnit).
+        :param rng: the random number generator to use (default: a fresh one).
+        :returns: the drawn TUnits.
+        :rtype: [TUnit]
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        population = self._count if indices is None else len(indices)
+        chosen = rng.choice(population, size=min(k, population), replace=False)
+        if indices is not None:
+            chosen = indices[chosen]
+        return [self.tunit(int(i)) for i in chosen]
+
+    def close(self):
+        """Drops this reader's references to the mapping, which is unmapped once no array view is left."""
+        for name, _ in NUMERIC_COLUMNS:
+            setattr(self, name, None)
+        self._sentence_offsets = self._url_offsets = self._sentences = self._urls = self._buffer = None
+        self._count = 0
+
+
+def _optional_int(value) -> Optional[int]:
+    return None if value < 0 else int(value)
+
+
+def _optional_float(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=None, help='the database file to export (default: the one in db.ini)')
+    parser.add_argument('--out', default='tunits.snapshot', help='the snapshot file to write')
+    args = parser.parse_args()
+    db_filename = DBConn(os.path.abspath(args.db) if args.db is not None else None).db_filename
+    print(f'Wrote {export_corpus_snapshot(db_filename, args.out)} TUnits to {args.out}')
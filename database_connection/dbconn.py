@@ -2,10 +2,13 @@
 Database Connection
 ===================
 """
+import json
+import threading
 from dataclasses import dataclass
-from math import cos, sin, asin, radians, sqrt
-from random import random
-from sqlite3 import connect
+from functools import lru_cache, partial
+from math import cos, sin, asin, radians, sqrt, ceil
+from random import randint, sample
+from sqlite3 import Connection
 from os import path
 from typing import Optional
 from configparser import ConfigParser
@@ -15,6 +18,23 @@ from flask_login import UserMixin
 from trivia_generator.TUnit import TUnit
 from trivia_generator.web_scraper import Article
 
+from database_connection.cache import get_shared_cache
+from database_connection.category_index import search_category_ids
+from database_connection.connection_pool import ConnectionPool, get_pool
+from database_connection.instrumentation import InstrumentedConnection, enable_instrumentation, instrument_class
+from database_connection.sampler import get_importance_sampler
+from database_connection.migrations import migrate
+from database_connection.spatial_index import bounding_box
+from database_connection.storage import StorageSettings, start_checkpointer
+
+
+@lru_cache(maxsize=None)
+def _read_config(config_filepath: str) -> ConfigParser:
+    """Reads a database config file once per process."""
+    config = ConfigParser()
+    config.read(config_filepath)
+    return config
+
 
 @dataclass
 class DBUser(UserMixin):
@@ -30,6 +50,7 @@ class DBUser(UserMixin):
         return self.__dict__ == other.__dict__
 
 
+@instrument_class
 @dataclass
 class DBConn:
     """
@@ -37,17 +58,52 @@ class DBConn:
     """
 
     DB_CONFIG_FILE: str = "db.ini"
+    RANDOM_ROW_ATTEMPTS: int = 8
+    TUNIT_PAGE_SIZE: int = 500
     db_filename: str = None
     max_importance: float = None
     search_radius: float = None
+    max_search_radius: float = None
+    category_cache_size: int = None
+    article_category_cache_size: int = None
+    location_cache_size: int = None
+    location_cache_ttl: float = None
+    storage: StorageSettings = None
+    pool: ConnectionPool = None
 
     def __init__(self, filename=None, search_radius=None):
         local_path = path.dirname(path.abspath(__file__))
-        config_filepath = path.join(local_path, DBConn.DB_CONFIG_FILE)
-        config = ConfigParser()
-        config.read(config_filepath)
-        self.db_filename = local_path + '/' + (config['DATABASE']['DatabaseFile'] if filename is None else filename)
+        config = _read_config(path.join(local_path, DBConn.DB_CONFIG_FILE))
+        self.db_filename = path.join(local_path, config['DATABASE']['DatabaseFile'] if filename is None else filename)
         self.search_radius = float(config['DATABASE']['SearchRadius']) if search_radius is None else search_radius
+        self.max_search_radius = config.getfloat('DATABASE', 'MaxSearchRadius', fallback=1600.0)
+        self.category_cache_size = config.getint('DATABASE', 'CategoryCacheSize', fallback=1024)
+        self.article_category_cache_size = config.getint('DATABASE', 'ArticleCategoryCacheSize', fallback=4096)
+        self.location_cache_size = config.getint('DATABASE', 'LocationCacheSize', fallback=4096)
+        self.location_cache_ttl = config.getfloat('DATABASE', 'LocationCacheTTL', fallback=3600.0)
+        self.storage = StorageSettings.from_config(config)
+        self.pool = get_pool(self.db_filename,
+                             max_size=config.getint('DATABASE', 'PoolSize', fallback=8),
+                             cached_statements=config.getint('DATABASE', 'CachedStatements', fallback=256),
+                             on_connect=partial(DBConn._prepare_connection, storage=self.storage),
+                             on_first_connect=migrate,
+                             factory=InstrumentedConnection)
+        if config.getboolean('INSTRUMENTATION', 'Enabled', fallback=False):
+            enable_instrumentation(config.getfloat('INSTRUMENTATION', 'SlowQueryMs', fallback=100.0))
+        if self.storage.journal_mode == 'WAL' and self.storage.checkpoint_interval > 0:
+            start_checkpointer(self.db_filename, self.storage.checkpoint_interval)
+
+    @staticmethod
+    def _prepare_connection(db: Connection, storage: StorageSettings = None):
+        """Applies the storage settings to a newly opened connection and registers the SQL functions used by the
+        queries. The pool brings the database schema up to date with ``migrate`` once, on its first connection."""
+        if storage is not None:
+            storage.apply(db)
+        db.create_function('DISTANCE', 4, DBConn._distance, deterministic=True)
+
+    def _connection(self):
+        """Borrows a pooled connection to the database for the duration of a ``with`` block."""
+        return self.pool.connection()
 
     @staticmethod
     def _distance(lat: float, long: float, query_lat: float, query_long: float):
@@ -64,29 +120,158 @@ class DBConn:
         r = 3956
         return c * r
 
-    def _select_lat_long(self, zip_code: str) -> tuple:
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT lat, long
-                FROM location
-                WHERE zip = ?
+    @staticmethod
+    def _select_random_rows(db: Connection, table: str, columns: str, k: int) -> list:
+        """Selects up to *k* distinct rows of a table uniformly at random.
+
+        Candidate rowids are drawn uniformly between the table's smallest and largest rowid and fetched with a
+        single ``IN`` query per round. Rowids that fall in gaps are simply redrawn, which keeps the draw uniform over
+        the rows that exist while never scanning or sorting the table.
+
+        :param db: a connection to the database.
+        :param table: the name of the table, which must have a rowid.
+        :param columns: the columns to select.
+        :param k: the number of rows to select.
+        :returns: the selected rows, in random order.
+        """
+        # Separate subqueries so that SQLite can answer each from one end of the rowid b-tree.
+        low, high = db.execute(f'SELECT (SELECT MIN(rowid) FROM {table}), (SELECT MAX(rowid) FROM {table});').fetchone()
+        if low is None or k <= 0:
+            return []
+        span = high - low + 1
+        if k >= span:
+            return sample(db.execute(f'SELECT {columns} FROM {table};').fetchall(), min(k, span))
+
+        rows = dict()
+        hit_rate = 1.0
+        for attempt in range(DBConn.RANDOM_ROW_ATTEMPTS):
+            needed = k - len(rows)
+            num_candidates = min(span - len(rows), ceil(needed / hit_rate * 1.2) + 1)
+            candidates = set()
+            while len(candidates) < num_candidates:
+                rowid = randint(low, high)
+                if rowid not in rows:
+                    candidates.add(rowid)
+            query = f'SELECT rowid, {columns} FROM {table} WHERE rowid IN ({",".join("?" * len(candidates))});'
+            found = db.execute(query, list(candidates)).fetchall()
+            hit_rate = max(len(found) / len(candidates), 0.01)
+            for row in sample(found, min(needed, len(found))):
+                rows[row[0]] = row[1:]
+            if len(rows) == k:
+                return list(rows.values())
+
+        # The table is too sparse for rowid sampling; fall back to a full scan for the remainder.
+        query = f'SELECT rowid, {columns} FROM {table} ORDER BY RANDOM() LIMIT ?;'
+        for row in db.execute(query, (k + len(rows),)):
+            if len(rows) == k:
+                break
+            rows.setdefault(row[0], row[1:])
+        return list(rows.values())
+
+    @staticmethod
+    def _sample_condition(sample_rate: Optional[float]) -> tuple:
+        """Builds a WHERE condition that keeps each row independently with probability *sample_rate*.
+
+        :returns: the condition, starting with ``AND``, and its parameters; both empty if *sample_rate* is None.
+        """
+        if sample_rate is None:
+            return '', ()
+        return 'AND ABS(RANDOM() % 1000000) < ?', (int(sample_rate * 1000000),)
+
+    @staticmethod
+    def _select_within_radius(db: Connection, table: str, key: str, columns: str, lat: float, long: float,
+                              radius: float, after: int = None, limit: int = -1, sample_rate: float = None) -> list:
+        """Selects the rows of a table located within *radius* miles of a point.
+
+        The table's spatial index narrows the search to a bounding box, and the exact distance is only computed for
+        the rows inside it. *columns* must be qualified with the table alias ``t``.
+
+        :param after: only select rows whose *key* is greater than this, to page through the results.
+        :param limit: the maximum number of rows to select, or -1 for no limit.
+        :param sample_rate: the probability of selecting each row, or None to select every row.
+        :returns: the selected columns of each row followed by its distance in miles, ordered by *key*.
+        """
+        if lat is None or long is None:
+            return []
+        min_lat, max_lat, min_long, max_long = bounding_box(lat, long, radius)
+        sample_condition, sample_parameters = DBConn._sample_condition(sample_rate)
+        query = f"""
+                SELECT {columns}, DISTANCE(t.lat, t.long, ?, ?) d
+                FROM {table}_location_index i
+                    JOIN {table} t ON t.{key} = i.{key}
+                WHERE i.max_lat >= ? AND i.min_lat <= ? AND i.max_long >= ? AND i.min_long <= ?
+                    AND d < ? AND d >= 0 AND t.{key} > ? {sample_condition}
+                ORDER BY t.{key}
+                LIMIT ?;
                 """
-        cursor.execute(query, (zip_code,))
-        lat_long = cursor.fetchone()
-        db.close()
-        return lat_long if lat_long is not None else (None, None)
+        parameters = (lat, long, min_lat, max_lat, min_long, max_long, radius, -1 if after is None else after,
+                      *sample_parameters, limit)
+        return db.execute(query, parameters).fetchall()
+
+    def _zip_location_cache(self):
+        return get_shared_cache(('zip_locations', self.db_filename), maxsize=self.location_cache_size,
+                                ttl=self.location_cache_ttl)
+
+    def _nearby_article_cache(self):
+        return get_shared_cache(('nearby_articles', self.db_filename), maxsize=self.location_cache_size,
+                                ttl=self.location_cache_ttl)
+
+    def _select_lat_long(self, zip_code: str) -> tuple:
+        cache = self._zip_location_cache()
+        lat_long = cache.get(zip_code)
+        if lat_long is not None:
+            return lat_long
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT lat, long
+                    FROM location
+                    WHERE zip = ?
+                    """
+            cursor.execute(query, (zip_code,))
+            lat_long = cursor.fetchone()
+        lat_long = tuple(lat_long) if lat_long is not None else (None, None)
+        cache.put(zip_code, lat_long)
+        return lat_long
+
+    def _select_nearby_articles(self, db: Connection, zip_code: str, radius: float) -> tuple:
+        """Gets the id, title and distance of every article within *radius* miles of a zip code, from a cache of
+        previous searches.
+
+        :returns: the articles, ordered by article id.
+        """
+        cache = self._nearby_article_cache()
+        rows = cache.get((zip_code, radius))
+        if rows is None:
+            lat, long = self._select_lat_long(zip_code)
+            rows = tuple(DBConn._select_within_radius(db, 'article', 'article_id', 't.article_id, t.title', lat,
+                                                      long, radius))
+            cache.put((zip_code, radius), rows)
+        return rows
+
+    def invalidate_location_cache(self, zip_code: str = None):
+        """Forgets cached zip code coordinates and nearby-article lists, e.g. after article locations were changed
+        outside of DBConn.
+
+        :param zip_code: the zip code to forget, or None to forget every zip code.
+        :type zip_code: str
+        """
+        if zip_code is None:
+            self._zip_location_cache().clear()
+            self._nearby_article_cache().clear()
+        else:
+            self._zip_location_cache().invalidate(zip_code)
+            self._nearby_article_cache().invalidate_where(lambda key: key[0] == zip_code)
 
     def select_max_importance(self) -> float:
         """Gets the max importance score of the category with the maximum importance score, if not yet recorded.
         """
         if self.max_importance is None:
-            db = connect(self.db_filename)
-            cursor = db.cursor()
-            cursor.execute('SELECT MAX(importance) FROM category;')
-            row = cursor.fetchone()
-            self.max_importance = row[0]
-            db.close()
+            with self._connection() as db:
+                cursor = db.cursor()
+                cursor.execute('SELECT MAX(importance) FROM category;')
+                row = cursor.fetchone()
+                self.max_importance = row[0]
         return self.max_importance
 
     def select_random_article(self) -> tuple:
@@ -95,107 +280,158 @@ class DBConn:
         returns: the article id and title of the random article.
         rtype: (int, str)
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        cursor.execute('SELECT article_id, title FROM article ORDER BY random() LIMIT 1;')
-        article_id, title = cursor.fetchone()
-        db.close()
+        article_id, title = self.select_random_articles(1)[0]
         return article_id, title
 
-    def select_weighted_random_article(self) -> tuple:
-        """Selects a random article from the database weighted by its importance score.
+    def select_random_articles(self, k: int) -> list:
+        """Selects *k* distinct articles from the database uniformly at random.
 
-        returns: the article id and title of the random article.
-        rtype: (int, str)
+        :param k: the number of articles to select.
+        :type k: int
+        :raises DatabaseError:
+        :returns: the article ids and titles, or fewer than *k* if the database has fewer articles.
+        :rtype: [(int, str)]
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
+        with self._connection() as db:
+            return DBConn._select_random_rows(db, 'article', 'article_id, title', k)
 
-        min_select_importance = random() * self.select_max_importance()
+    def select_weighted_random_article(self) -> tuple:
+        """Selects a random article from the database weighted by its importance score.
 
-        query = """
-                SELECT article.article_id, article.title, SUM(importance) AS article_importance
-                FROM article_category
-                    JOIN article ON article.article_id = article_category.article_id
-                    JOIN category ON category.category_id = article_category.category_id
-                GROUP BY article.article_id
-                HAVING SUM(importance) > ?
-                ORDER BY RANDOM()
-                LIMIT 1;
-                """
+        The draw is made from an in-memory sampler of article importances, built on first use.
 
-        cursor.execute(query, [min_select_importance])
-        article_id, title, importance = cursor.fetchone()
-        db.close()
+        returns: the article id, title and importance of the random article, or None if no article has a category.
+        rtype: (int, str, float)
+        """
+        with self._connection() as db:
+            drawn = get_importance_sampler(self.db_filename).draw_article(db)
+            if drawn is None:
+                return None
+            article_id, importance = drawn
+            cursor = db.cursor()
+            cursor.execute('SELECT title FROM article WHERE article_id = ?;', (article_id,))
+            title = cursor.fetchone()[0]
         return article_id, title, importance
 
     def select_random_category(self) -> tuple:
         """Selects a random category from the database weighted by its importance score.
 
+        The draw is made from an in-memory sampler of category importances, built on first use.
+
         returns: the category id, name, and importance of the category.
         """
-
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        min_select_importance = random() * self.select_max_importance()
-
-        # Get a random category whose importace score is above min_select_importance
-        query = """
-                SELECT category_id, name, importance
-                FROM category
-                WHERE importance >= ?
-                ORDER BY RANDOM()
-                LIMIT 1;"""
-        cursor.execute(query, [min_select_importance])
-        row = cursor.fetchone()
-        db.close()
+        with self._connection() as db:
+            category_id = get_importance_sampler(self.db_filename).draw_category(db)
+            cursor = db.cursor()
+            cursor.execute('SELECT category_id, name, importance FROM category WHERE category_id = ?;', (category_id,))
+            row = cursor.fetchone()
         return row
 
+    def _article_category_cache(self):
+        return get_shared_cache(('article_categories', self.db_filename), maxsize=self.article_category_cache_size)
+
     def select_article_categories(self, article_id: int) -> list:
         """Selects the categories associated with the article with the given article id.
 
+        Results are kept in a cache of the most recently used articles, see ``article_category_cache_stats``.
+
         :param article_id: The ID of the article.
         :type article_id: int
         :raises: DatabaseError
         :returns: the list of strings representing the names of the categories.
         :rtype: [str]
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT name
-                FROM article_category
-                    JOIN category ON article_category.category_id = category.category_id
-                WHERE article_id = ?;
-                """
-        cursor.execute(query, (article_id,))
-        rows = cursor.fetchall()
-        db.close()
-        return [row[0] for row in rows]
+        cache = self._article_category_cache()
+        categories = cache.get(article_id)
+        if categories is None:
+            with self._connection() as db:
+                cursor = db.cursor()
+                query = """
+                        SELECT name
+                        FROM article_category
+                            JOIN category ON article_category.category_id = category.category_id
+                        WHERE article_id = ?;
+                        """
+                cursor.execute(query, (article_id,))
+                categories = tuple(row[0] for row in cursor.fetchall())
+            cache.put(article_id, categories)
+        return list(categories)
+
+    def article_category_cache_stats(self) -> dict:
+        """Gets the hit and miss counts of the cache in front of ``select_article_categories``.
+
+        :returns: the hits, misses, size and maxsize of the cache.
+        :rtype: {str: int}
+        """
+        return self._article_category_cache().stats()
+
+    def _category_id_cache(self):
+        return get_shared_cache(('category_ids', self.db_filename), maxsize=self.category_cache_size)
+
+    def _select_category_ids(self, db: Connection, category: str) -> str:
+        """Gets the ids of the categories whose name contains *category*, from a cache of previous searches.
+
+        :returns: the category ids as a JSON array, ready to be expanded with ``json_each``.
+        """
+        cache = self._category_id_cache()
+        category_ids = cache.get(category)
+        if category_ids is None:
+            category_ids = json.dumps(search_category_ids(db, category))
+            cache.put(category, category_ids)
+        return category_ids
 
     def select_category_articles(self, category: str) -> list:
-        """Selects the categories associated with the article with the given article id.
+        """Selects the articles associated with the categories whose name contains the given text.
 
         :param category: category name.
-        :type category: int
+        :type category: str
         :raises: DatabaseError
         :returns: the list of article_ids associated with that category.
         :rtype: [(int, str)]
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT DISTINCT a.article_id, a.title
-                FROM article_category ac
-                    JOIN category c ON ac.category_id = c.category_id
-                    JOIN article  a ON ac.article_id = a.article_id
-                WHERE c.name LIKE ?;
-                """
-        cursor.execute(query, ('%' + category + '%',))
-        rows = cursor.fetchall()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT a.article_id, a.title
+                    FROM article a
+                    WHERE a.article_id IN (
+                        SELECT article_id
+                        FROM article_category
+                        WHERE category_id IN (SELECT value FROM json_each(?))
+                    )
+                    ORDER BY a.article_id;
+                    """
+            cursor.execute(query, (self._select_category_ids(db, category),))
+            rows = cursor.fetchall()
         return rows
 
+    def select_random_category_article(self, category: str) -> Optional[tuple]:
+        """Selects one article at random among those associated with the categories whose name contains the given
+        text, without retrieving the others.
+
+        :param category: category name.
+        :type category: str
+        :raises: DatabaseError
+        :returns: the article id and title, or None if no article matches.
+        :rtype: (int, str) or None
+        """
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT a.article_id, a.title
+                    FROM article a
+                    WHERE a.article_id IN (
+                        SELECT article_id
+                        FROM article_category
+                        WHERE category_id IN (SELECT value FROM json_each(?))
+                    )
+                    ORDER BY RANDOM()
+                    LIMIT 1;
+                    """
+            cursor.execute(query, (self._select_category_ids(db, category),))
+            row = cursor.fetchone()
+        return row
+
     def insert_user(self, user: DBUser, password: str) -> int:
         """
         Inserts a user into the database
@@ -208,23 +444,22 @@ class DBConn:
         :return: database user_id
         :rtype: int
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-        INSERT INTO user (username, email, password, wins, losses, num_answered, num_answered_correct)
-        VALUES (?,?,?,?,?,?,?)
-        """
-        cursor.execute(query, (
-            user.username,
-            user.email,
-            password,
-            user.wins,
-            user.losses,
-            user.num_answered,
-            user.num_answered_correct))
-        db.commit()
-        user_id = cursor.lastrowid
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+            INSERT INTO user (username, email, password, wins, losses, num_answered, num_answered_correct)
+            VALUES (?,?,?,?,?,?,?)
+            """
+            cursor.execute(query, (
+                user.username,
+                user.email,
+                password,
+                user.wins,
+                user.losses,
+                user.num_answered,
+                user.num_answered_correct))
+            db.commit()
+            user_id = cursor.lastrowid
         return user_id
 
     def update_user(self, user: DBUser) -> int:
@@ -236,30 +471,29 @@ class DBConn:
         :return: database user_id or -1 if user not found
         :rtype: int
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                UPDATE user
-                SET username = ?, email = ?, wins = ?, losses = ?, num_answered = ?, num_answered_correct = ?
-                WHERE username = ?
-                """
-        cursor.execute(query, (
-            user.username,
-            user.email,
-            user.wins,
-            user.losses,
-            user.num_answered,
-            user.num_answered_correct,
-            user.username
-        ))
-        db.commit()
-        query = """
-                SELECT user_id
-                FROM user
-                WHERE username = ?
-                """
-        user_id = cursor.execute(query, (user.username,)).fetchone()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    UPDATE user
+                    SET username = ?, email = ?, wins = ?, losses = ?, num_answered = ?, num_answered_correct = ?
+                    WHERE username = ?
+                    """
+            cursor.execute(query, (
+                user.username,
+                user.email,
+                user.wins,
+                user.losses,
+                user.num_answered,
+                user.num_answered_correct,
+                user.username
+            ))
+            db.commit()
+            query = """
+                    SELECT user_id
+                    FROM user
+                    WHERE username = ?
+                    """
+            user_id = cursor.execute(query, (user.username,)).fetchone()
         if user_id is None:
             return -1
         else:
@@ -272,17 +506,16 @@ class DBConn:
         :param username: user's username
         :type username: str
         :raises: sqlite3.DatabaseError
-        :return: password entry
-        """
-        db = connect(self.db_filename)
-        query = '''
-        SELECT password
-        FROM user
-        WHERE username = ?
-        '''
-        password = db.cursor().execute(query, (username,)).fetchone()[0]
-        db.close()
-        return password
+        :return: password entry, or None if there is no such user
+        """
+        with self._connection() as db:
+            query = '''
+            SELECT password
+            FROM user
+            WHERE username = ?
+            '''
+            password = db.cursor().execute(query, (username,)).fetchone()
+        return None if password is None else password[0]
 
     def update_password(self, username: str, password: str) -> int:
         """ Updates a user in the database.
@@ -295,21 +528,47 @@ class DBConn:
         :return: database user_id or -1 if user not found
         :rtype: int
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                UPDATE user
-                SET password = ?
-                WHERE username = ?
-                """
-        cursor.execute(query, (password, username))
-        db.commit()
-        user_id = cursor.lastrowid
-        db.close()
-        if user_id == 0:
-            return -1
-        else:
-            return user_id
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    UPDATE user
+                    SET password = ?
+                    WHERE username = ?
+                    """
+            cursor.execute(query, (password, username))
+            db.commit()
+            # lastrowid is not reset by an UPDATE on a reused connection, so check rowcount instead.
+            if cursor.rowcount == 0:
+                return -1
+            user_id = cursor.execute('SELECT user_id FROM user WHERE username = ?', (username,)).fetchone()
+        return user_id[0]
+
+    def increment_user_statistics(self, deltas: dict) -> int:
+        """Adds to the statistics of many users in a single transaction.
+
+        The statistics are incremented in place rather than overwritten, so games that finish at the same time do not
+        lose each other's results.
+
+        :param deltas: a mapping from username to the (wins, losses, num_answered, num_answered_correct) to be added
+        :type deltas: {str: (int, int, int, int)}
+        :raises DatabaseError:
+        :returns: the number of users updated
+        :rtype: int
+        """
+        if not deltas:
+            return 0
+        with self._connection() as db:
+            query = """
+                    UPDATE user
+                    SET wins = COALESCE(wins, 0) + ?,
+                        losses = COALESCE(losses, 0) + ?,
+                        num_answered = COALESCE(num_answered, 0) + ?,
+                        num_answered_correct = COALESCE(num_answered_correct, 0) + ?
+                    WHERE username = ?;
+                    """
+            cursor = db.executemany(query, [(*delta, username) for username, delta in deltas.items()])
+            db.commit()
+        return cursor.rowcount
 
     def select_user(self, username: str) -> Optional[DBUser]:
         """Gets a user from the database by username.
@@ -320,16 +579,15 @@ class DBConn:
         :returns: an object representing a player or None
         :rtype: DBUser or None
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT user_id, username, email, wins, losses, num_answered, num_answered_correct
-                FROM user
-                WHERE username = ?;
-                """
-        cursor.execute(query, (username,))
-        user = cursor.fetchone()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT user_id, username, email, wins, losses, num_answered, num_answered_correct
+                    FROM user
+                    WHERE username = ?;
+                    """
+            cursor.execute(query, (username,))
+            user = cursor.fetchone()
         if user is not None:
             return DBUser(*user)
         else:
@@ -342,15 +600,14 @@ class DBConn:
         :type user: DBUser
         :raises DatabaseError:
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                DELETE FROM user
-                WHERE username = ?
-                """
-        cursor.execute(query, (user.username,))
-        db.commit()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    DELETE FROM user
+                    WHERE username = ?
+                    """
+            cursor.execute(query, (user.username,))
+            db.commit()
 
     def update_tunit(self, t_unit: TUnit) -> int:
         """Updates a TUnit in the database.
@@ -361,21 +618,87 @@ class DBConn:
         :returns: t_unit_Id or -1 of not found
         :rtype: int
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                REPLACE INTO t_unit (t_unit_Id, sentence, article_id, url, access_timestamp, lat, long, num_likes,
-                    num_mehs, num_dislikes)
-                VALUES (?,?,?,?,?,?,?,?,?,?);
-                """
-        cursor.execute(query,
-                       (t_unit.t_unit_id, t_unit.sentence, t_unit.article_id, t_unit.url, t_unit.access_timestamp,
-                        t_unit.latitude, t_unit.longitude, t_unit.num_likes, t_unit.num_mehs, t_unit.num_dislikes))
-        db.commit()
-        t_unit.t_unit_id = cursor.lastrowid
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    REPLACE INTO t_unit (t_unit_Id, sentence, article_id, url, access_timestamp, lat, long, num_likes,
+                        num_mehs, num_dislikes)
+                    VALUES (?,?,?,?,?,?,?,?,?,?);
+                    """
+            cursor.execute(query,
+                           (t_unit.t_unit_id, t_unit.sentence, t_unit.article_id, t_unit.url, t_unit.access_timestamp,
+                            t_unit.latitude, t_unit.longitude, t_unit.num_likes, t_unit.num_mehs, t_unit.num_dislikes))
+            db.commit()
+            t_unit.t_unit_id = cursor.lastrowid
         return t_unit.t_unit_id
 
+    def insert_tunits(self, t_units: list) -> list:
+        """Inserts or replaces many TUnits in the database in a single transaction.
+
+        TUnits with a t_unit_id replace the stored row with that id, and the others are inserted with a new id.
+
+        :param t_units: the TUnit objects to be written to the database
+        :type t_units: [TUnit]
+        :raises DatabaseError:
+        :returns: the t_unit_Id of each TUnit, in the same order, which is also set on the TUnit objects
+        :rtype: [int]
+        """
+        columns = 'sentence, article_id, url, access_timestamp, lat, long, num_likes, num_mehs, num_dislikes'
+        new_t_units = [t_unit for t_unit in t_units if t_unit.t_unit_id is None]
+        old_t_units = [t_unit for t_unit in t_units if t_unit.t_unit_id is not None]
+        with self._connection() as db:
+            db.execute('BEGIN IMMEDIATE;')
+            db.executemany(f'REPLACE INTO t_unit (t_unit_Id, {columns}) VALUES (?,?,?,?,?,?,?,?,?,?);',
+                           [(t_unit.t_unit_id,) + DBConn._tunit_values(t_unit) for t_unit in old_t_units])
+            t_unit_ids = DBConn._insert_many(db, f'INSERT INTO t_unit ({columns}) VALUES (?,?,?,?,?,?,?,?,?);',
+                                             [DBConn._tunit_values(t_unit) for t_unit in new_t_units])
+            db.commit()
+        for t_unit, t_unit_id in zip(new_t_units, t_unit_ids):
+            t_unit.t_unit_id = t_unit_id
+        return [t_unit.t_unit_id for t_unit in t_units]
+
+    @staticmethod
+    def _tunit_values(t_unit: TUnit) -> tuple:
+        return (t_unit.sentence, t_unit.article_id, t_unit.url, t_unit.access_timestamp, t_unit.latitude,
+                t_unit.longitude, t_unit.num_likes, t_unit.num_mehs, t_unit.num_dislikes)
+
+    @staticmethod
+    def _insert_many(db: Connection, query: str, rows: list) -> list:
+        """Runs an INSERT for every row with ``executemany`` and works out the rowids that were assigned.
+
+        Must run inside a write transaction on a table whose rowids are assigned by SQLite. A transaction holds the
+        database write lock, so the new rowids are consecutive and end at ``last_insert_rowid()``.
+
+        :returns: the rowid of each inserted row, in order.
+        """
+        if not rows:
+            return []
+        db.executemany(query, rows)
+        last_id = db.execute('SELECT last_insert_rowid();').fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def increment_tunit_ranks(self, deltas: dict):
+        """Adds to the like, meh and dislike counts of many TUnits in a single transaction.
+
+        The counts are incremented in place rather than overwritten, so concurrent writers do not lose each
+        other's votes.
+
+        :param deltas: a mapping from t_unit_Id to the (likes, mehs, dislikes) to be added
+        :type deltas: {int: (int, int, int)}
+        :raises DatabaseError:
+        """
+        with self._connection() as db:
+            query = """
+                    UPDATE t_unit
+                    SET num_likes = COALESCE(num_likes, 0) + ?,
+                        num_mehs = COALESCE(num_mehs, 0) + ?,
+                        num_dislikes = COALESCE(num_dislikes, 0) + ?
+                    WHERE t_unit_Id = ?;
+                    """
+            db.executemany(query, [(likes, mehs, dislikes, t_unit_id)
+                                   for t_unit_id, (likes, mehs, dislikes) in deltas.items()])
+            db.commit()
+
     def select_tunit_random(self) -> TUnit:
         """Gets a TUnit from the database by random.
 
@@ -383,18 +706,21 @@ class DBConn:
         :returns: an object representing a TUnit
         :rtype: TUnit
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
-                    num_dislikes
-                FROM t_unit
-                ORDER BY RANDOM() LIMIT 1;
-                """
-        cursor.execute(query)
-        tunit = TUnit(*cursor.fetchone())
-        db.close()
-        return tunit
+        return self.select_tunits_random(1)[0]
+
+    def select_tunits_random(self, k: int) -> list:
+        """Gets *k* distinct TUnits from the database uniformly at random, with a single query in most cases.
+
+        :param k: the number of TUnits to get.
+        :type k: int
+        :raises DatabaseError:
+        :returns: a list of TUnit objects, with fewer than *k* if the database has fewer TUnits
+        :rtype: [TUnit]
+        """
+        columns = 'sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs, num_dislikes'
+        with self._connection() as db:
+            rows = DBConn._select_random_rows(db, 't_unit', columns, k)
+        return [TUnit(*row) for row in rows]
 
     def select_tunit_category(self, category: str) -> list:
         """Gets a list of TUnits from the database by category.
@@ -405,20 +731,114 @@ class DBConn:
         :returns: a list of TUnit objects
         :rtype: [TUnit] or empty list if category not found
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                SELECT DISTINCT sentence, tu.article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
+                        num_dislikes
+                    FROM t_unit
+                    WHERE article_id IN (
+                        SELECT article_id
+                        FROM article_category
+                        WHERE category_id IN (SELECT value FROM json_each(?))
+                    )
+                    ORDER BY t_unit_Id;
+                    """
+            cursor.execute(query, (self._select_category_ids(db, category),))
+            t_unit_list = [TUnit(*t_unit_tuple) for t_unit_tuple in cursor.fetchall()]
+        return t_unit_list
+
+    def _iter_tunit_pages(self, select_page, limit: Optional[int], page_size: Optional[int]):
+        """Yields TUnits from a keyset-paginated query, borrowing a connection only while each page is read.
+
+        :param select_page: a function of a connection, the t_unit_Id of the last TUnit so far (or None) and the
+            maximum number of rows, that selects the next page of TUnit rows in t_unit_Id order.
+        :param limit: the maximum number of TUnits to yield, or None for no limit.
+        :param page_size: the number of rows read per query (default: TUNIT_PAGE_SIZE).
+        """
+        if page_size is None:
+            page_size = self.TUNIT_PAGE_SIZE
+        after = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            count = page_size if remaining is None else min(page_size, remaining)
+            with self._connection() as db:
+                rows = select_page(db, after, count)
+            for row in rows:
+                yield TUnit(*row[:10])
+            if len(rows) < count:
+                return
+            after = rows[-1][4]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def iter_tunit_category(self, category: str, limit: int = None, sample_rate: float = None,
+                            page_size: int = None):
+        """Lazily gets the TUnits of a category, reading them from the database a page at a time.
+
+        Unlike ``select_tunit_category``, memory use does not grow with the size of the category.
+
+        :param category: the category used to to find TUnits
+        :type category: str
+        :param limit: the maximum number of TUnits to get, or None for every TUnit
+        :type limit: int
+        :param sample_rate: the probability of getting each TUnit, or None to get every TUnit
+        :type sample_rate: float
+        :param page_size: the number of TUnits read per query (default: TUNIT_PAGE_SIZE)
+        :type page_size: int
+        :raises DatabaseError:
+        :returns: a generator of TUnit objects, in t_unit_Id order
+        :rtype: Iterator[TUnit]
+        """
+        sample_condition, sample_parameters = DBConn._sample_condition(sample_rate)
+        query = f"""
+                SELECT sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
                     num_dislikes
-                FROM t_unit tu
-                JOIN article_category ac on tu.article_id = ac.article_id
-                JOIN category c on ac.category_id = c.category_id
-                WHERE c.name LIKE ?
+                FROM t_unit
+                WHERE article_id IN (
+                    SELECT article_id
+                    FROM article_category
+                    WHERE category_id IN (SELECT value FROM json_each(?))
+                )
+                    AND t_unit_Id > ? {sample_condition}
+                ORDER BY t_unit_Id
+                LIMIT ?;
                 """
-        cursor.execute(query, ('%' + category + '%',))
-        t_unit_list = [TUnit(*t_unit_tuple) for t_unit_tuple in cursor.fetchall()]
-        db.close()
-        return t_unit_list
+
+        def select_page(db: Connection, after: Optional[int], count: int) -> list:
+            parameters = (self._select_category_ids(db, category), -1 if after is None else after,
+                          *sample_parameters, count)
+            return db.execute(query, parameters).fetchall()
+
+        return self._iter_tunit_pages(select_page, limit, page_size)
+
+    def iter_tunit_location(self, zip_code: str, limit: int = None, sample_rate: float = None,
+                            page_size: int = None):
+        """Lazily gets the TUnits near a location, reading them from the database a page at a time.
+
+        Unlike ``select_tunit_location``, memory use does not grow with the number of TUnits nearby.
+
+        :param zip_code: the zip code of the location
+        :type zip_code: str
+        :param limit: the maximum number of TUnits to get, or None for every TUnit
+        :type limit: int
+        :param sample_rate: the probability of getting each TUnit, or None to get every TUnit
+        :type sample_rate: float
+        :param page_size: the number of TUnits read per query (default: TUNIT_PAGE_SIZE)
+        :type page_size: int
+        :raises DatabaseError:
+        :returns: a generator of TUnit objects, in t_unit_Id order
+        :rtype: Iterator[TUnit]
+        """
+        lat, long = self._select_lat_long(zip_code)
+        columns = '''t.sentence, t.article_id, t.url, t.access_timestamp, t.t_unit_Id, t.lat, t.long, t.num_likes,
+                   t.num_mehs, t.num_dislikes'''
+
+        def select_page(db: Connection, after: Optional[int], count: int) -> list:
+            return DBConn._select_within_radius(db, 't_unit', 't_unit_Id', columns, lat, long, self.search_radius,
+                                                after=after, limit=count, sample_rate=sample_rate)
+
+        return self._iter_tunit_pages(select_page, limit, page_size)
 
     def select_tunit_location(self, zip_code: str) -> list:
         """Gets a list of TUnits from the database by location.
@@ -428,23 +848,11 @@ class DBConn:
         :rtype: [TUnit] or empty list if not found
         """
         lat, long = self._select_lat_long(zip_code)
-        db = connect(self.db_filename)
-        db.create_function('DISTANCE', 4, DBConn._distance)
-        cursor = db.cursor()
-        query = '''
-                SELECT sentence, article_id, url, access_timestamp, tu.t_unit_Id, lat, long, num_likes, num_mehs,
-                    num_dislikes
-                FROM t_unit tu
-                JOIN (
-                    SELECT t_unit_Id, DISTANCE(lat, long, ?, ?) d
-                    FROM t_unit
-                    WHERE d < ? AND d >= 0
-                ) l ON tu.t_unit_Id = l.t_unit_Id
-                '''
-        cursor.execute(query, (lat, long, self.search_radius))
-        t_unit_list = [TUnit(*t_unit_tuple) for t_unit_tuple in cursor.fetchall()]
-        db.close()
-        return t_unit_list
+        columns = '''t.sentence, t.article_id, t.url, t.access_timestamp, t.t_unit_Id, t.lat, t.long, t.num_likes,
+                   t.num_mehs, t.num_dislikes'''
+        with self._connection() as db:
+            rows = DBConn._select_within_radius(db, 't_unit', 't_unit_Id', columns, lat, long, self.search_radius)
+        return [TUnit(*row[:-1]) for row in rows]
 
     def delete_tunit(self, t_unit: TUnit):
         """Deletes a TUnit from the database.
@@ -453,15 +861,14 @@ class DBConn:
         :type t_unit: TUnit
         :raises DatabaseError:
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                DELETE FROM t_unit
-                WHERE t_unit_Id = ?
-                """
-        cursor.execute(query, (t_unit.t_unit_id,))
-        db.commit()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    DELETE FROM t_unit
+                    WHERE t_unit_Id = ?
+                    """
+            cursor.execute(query, (t_unit.t_unit_id,))
+            db.commit()
 
     def insert_category(self, category: str, importance: float) -> int:
         """Adds a category to the database.
@@ -474,18 +881,44 @@ class DBConn:
         :returns: the category id
         :rtype: int
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                INSERT INTO category (name, importance) 
-                VALUES (?,?)        
-                """
-        cursor.execute(query, (category, importance))
-        db.commit()
-        category_id = cursor.lastrowid
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    INSERT INTO category (name, importance) 
+                    VALUES (?,?)        
+                    """
+            cursor.execute(query, (category, importance))
+            db.commit()
+            category_id = cursor.lastrowid
+            get_importance_sampler(self.db_filename).refresh_categories(db, [category_id], [])
+        self._category_id_cache().clear()
+        self._article_category_cache().clear()
+        self.max_importance = None
         return category_id
 
+    def update_category_importance(self, category: str, importance: float):
+        """Changes the importance score of a category.
+
+        :param category: the name of the category to be updated
+        :type category: str
+        :param importance: the new relevance of the category
+        :type importance: float
+        :raises DatabaseError:
+        """
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    UPDATE category
+                    SET importance = ?
+                    WHERE name = ?
+                    """
+            cursor.execute(query, (importance, category))
+            db.commit()
+            category_ids = [row[0] for row in cursor.execute('SELECT category_id FROM category WHERE name = ?;',
+                                                             (category,))]
+            get_importance_sampler(self.db_filename).refresh_categories(db, category_ids)
+        self.max_importance = None
+
     def delete_category(self, category: str):
         """Deletes a category from the database.
 
@@ -493,38 +926,115 @@ class DBConn:
         :type category: str
         :raises DatabaseError:
         """
-        db = connect(self.db_filename)
-        cursor = db.cursor()
-        query = """
-                DELETE FROM category
-                WHERE category.name = ?
-                """
-        cursor.execute(query, (category,))
-        db.commit()
-        db.close()
+        with self._connection() as db:
+            cursor = db.cursor()
+            query = """
+                    SELECT category.category_id, article_id
+                    FROM category
+                        LEFT JOIN article_category ON article_category.category_id = category.category_id
+                    WHERE category.name = ?
+                    """
+            rows = cursor.execute(query, (category,)).fetchall()
+            query = """
+                    DELETE FROM category
+                    WHERE category.name = ?
+                    """
+            cursor.execute(query, (category,))
+            db.commit()
+            category_ids = list({row[0] for row in rows})
+            article_ids = list({row[1] for row in rows if row[1] is not None})
+            get_importance_sampler(self.db_filename).refresh_categories(db, category_ids, article_ids)
+        self._category_id_cache().clear()
+        self._article_category_cache().clear()
+        self.max_importance = None
+
+    def insert_articles(self, articles: list) -> list:
+        """Inserts many articles into the database in a single transaction.
+
+        :param articles: a title, latitude and longitude for each article; the coordinates may be None
+        :type articles: [(str, float, float)]
+        :raises DatabaseError:
+        :returns: the article id of each article, in the same order
+        :rtype: [int]
+        """
+        with self._connection() as db:
+            db.execute('BEGIN IMMEDIATE;')
+            article_ids = DBConn._insert_many(db, 'INSERT INTO article (title, lat, long) VALUES (?,?,?);',
+                                              [tuple(article) for article in articles])
+            db.commit()
+        if any(article[1] is not None for article in articles):
+            self._nearby_article_cache().clear()
+        return article_ids
+
+    def insert_article_categories(self, article_categories: list):
+        """Links many articles to categories in a single transaction. Links that already exist are left alone.
+
+        :param article_categories: an article id and category id for each link
+        :type article_categories: [(int, int)]
+        :raises DatabaseError:
+        """
+        with self._connection() as db:
+            db.execute('BEGIN IMMEDIATE;')
+            db.executemany('INSERT OR IGNORE INTO article_category (article_id, category_id) VALUES (?,?);',
+                           [tuple(link) for link in article_categories])
+            db.commit()
+            article_ids = list({link[0] for link in article_categories})
+            get_importance_sampler(self.db_filename).refresh_articles(db, article_ids)
+        cache = self._article_category_cache()
+        for article_id in article_ids:
+            cache.invalidate(article_id)
 
     def select_articles_location(self, zip_code: str) -> list:
         """ Retrieves Articles from the database based on a location
 
-
         :raises DatabaseError:
         :returns: a list of tuples representing an article id and title
         :rtype: [(int, str)]
         """
-        lat, long = self._select_lat_long(zip_code)
-        db = connect(self.db_filename)
-        db.create_function('DISTANCE', 4, DBConn._distance)
-        cursor = db.cursor()
-        query = """
-                SELECT a.article_id, a.title
-                FROM article a
-                JOIN (
-                    SELECT article_id, DISTANCE(lat, long, ?, ?) d
-                    FROM article
-                    WHERE d < ? AND d >= 0
-                ) l ON a.article_id = l.article_id
-                """
-        cursor.execute(query, (lat, long, self.search_radius))
-        article_list = cursor.fetchall()
-        db.close()
-        return article_list
+        with self._connection() as db:
+            rows = self._select_nearby_articles(db, zip_code, self.search_radius)
+        return [row[:-1] for row in rows]
+
+    def select_nearest_articles(self, zip_code: str, k: int, max_radius: float = None) -> list:
+        """Retrieves the *k* articles closest to a location.
+
+        The search starts at the configured search radius and doubles it until *k* articles are found or
+        *max_radius* is reached.
+
+        :param zip_code: the zip code of the location.
+        :type zip_code: str
+        :param k: the number of articles to retrieve.
+        :type k: int
+        :param max_radius: the largest radius to search, in miles (default: MaxSearchRadius from the config).
+        :type max_radius: float
+        :raises DatabaseError:
+        :returns: a list of tuples representing an article id, title and distance in miles, closest first
+        :rtype: [(int, str, float)]
+        """
+        if max_radius is None:
+            max_radius = self.max_search_radius
+        radius = self.search_radius
+        with self._connection() as db:
+            while True:
+                rows = self._select_nearby_articles(db, zip_code, radius)
+                if len(rows) >= k or radius >= max_radius:
+                    break
+                radius = min(radius * 2, max_radius)
+        return sorted(rows, key=lambda row: row[-1])[:k]
+
+
+db_conn = None
+_db_conn_lock = threading.Lock()
+
+
+def get_db_conn() -> DBConn:
+    """Gets the process-wide DBConn for the configured database, creating it on first use.
+
+    :returns: the shared DBConn.
+    :rtype: DBConn
+    """
+    global db_conn
+    with _db_conn_lock:
+        if db_conn is None:
+            db_conn = DBConn()
+        return db_conn
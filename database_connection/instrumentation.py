@@ -0,0 +1,249 @@
+"""
+Instrumentation
+===============
+
+Opt-in statistics for DBConn: call counts, latency histograms and rows returned for every public method, a log of
+slow calls along with the statements they ran, and the query plan of every statement the first time it runs.
+
+The arguments of slow calls are summarized by their types and lengths, never their values, since they include
+password hashes, usernames and emails.
+
+Instrumentation is off unless ``Enabled`` is set in the ``[INSTRUMENTATION]`` section of ``db.ini`` or
+``enable_instrumentation`` is called. While it is off, an instrumented method costs one extra attribute lookup.
+"""
+import functools
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds. The last bucket holds everything slower.
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class MethodStats:
+    """Statistics of the calls to one DBConn method."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, rows: int, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def report(self) -> dict:
+        labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'max_ms': self.max_ms,
+            'rows': self.rows,
+            'histogram': dict(zip(labels, self.histogram)),
+        }
+
+
+class Instrumentation:
+    """Collects the statistics of the DBConn methods and statements run by this process.
+
+    :param slow_query_ms: calls that take longer than this many milliseconds are logged.
+    :type slow_query_ms: float
+    :param slow_log_size: the number of slow calls kept for ``report``.
+    :type slow_log_size: int
+    :param max_plans: the number of distinct statements whose query plans are kept. Statements with a variable
+        number of parameters, like ``IN (...)`` lists, each count as a new statement.
+    :type max_plans: int
+    """
+
+    def __init__(self, slow_query_ms: float = 100.0, slow_log_size: int = 100, max_plans: int = 1000):
+        self.enabled = False
+        self.slow_query_ms = slow_query_ms
+        self.max_plans = max_plans
+        self.methods = dict()
+        self.plans = dict()
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record_call(self, method_name: str, args: tuple, elapsed_ms: float, result, failed: bool,
+                    statements: list):
+        """Records one call of a DBConn method, logging it if it was slow."""
+        # A list holds one row per item; anything else, including a tuple, is a single row.
+        rows = 0 if result is None else len(result) if isinstance(result, list) else 1
+        with self._lock:
+            stats = self.methods.get(method_name)
+            if stats is None:
+                stats = MethodStats()
+                self.methods[method_name] = stats
+            stats.record(elapsed_ms, rows, failed)
+            if elapsed_ms > self.slow_query_ms:
+                self.slow_log.append({'method': method_name, 'args': _describe_args(args), 'elapsed_ms': elapsed_ms,
+                                      'timestamp': time.time(), 'statements': statements})
+        if elapsed_ms > self.slow_query_ms:
+            logger.warning('slow DBConn call %s%s took %.1f ms', method_name, _describe_args(args), elapsed_ms)
+
+    def record_statement(self, db: sqlite3.Connection, sql: str, parameters, elapsed_ms: float):
+        """Records a statement run by the current DBConn call and captures its query plan if it is new."""
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None:
+            statements.append({'sql': ' '.join(sql.split()), 'elapsed_ms': elapsed_ms})
+        if sql not in self.plans and len(self.plans) < self.max_plans:
+            try:
+                # the base class execute, so that the plan query is not itself recorded
+                plan = [row[-1] for row in sqlite3.Connection.execute(db, f'EXPLAIN QUERY PLAN {sql}', parameters)]
+            except sqlite3.Error:
+                plan = []
+            with self._lock:
+                if len(self.plans) < self.max_plans:
+                    self.plans.setdefault(sql, plan)
+
+    def report(self) -> dict:
+        """Gets every statistic collected so far.
+
+        :returns: the statistics of each method, the query plan of each statement and the most recent slow calls.
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'slow_query_ms': self.slow_query_ms,
+                'methods': {name: stats.report() for name, stats in sorted(self.methods.items())},
+                'plans': {' '.join(sql.split()): plan for sql, plan in self.plans.items()},
+                'slow_log': list(self.slow_log),
+            }
+
+    def reset(self):
+        """Forgets every statistic collected so far."""
+        with self._lock:
+            self.methods.clear()
+            self.plans.clear()
+            self.slow_log.clear()
+
+
+def _describe_args(args: tuple) -> str:
+    """Summarizes the arguments of a call by their types and lengths, e.g. ``(str[4], int)``, leaving out their
+    values."""
+    descriptions = []
+    for arg in args:
+        try:
+            descriptions.append(f'{type(arg).__name__}[{len(arg)}]')
+        except TypeError:
+            descriptions.append(type(arg).__name__)
+    return f'({", ".join(descriptions)})'
+
+
+instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """Gets the process-wide instrumentation.
+
+    :returns: the shared Instrumentation.
+    :rtype: Instrumentation
+    """
+    return instrumentation
+
+
+def enable_instrumentation(slow_query_ms: float = None):
+    """Starts collecting statistics of DBConn methods.
+
+    :param slow_query_ms: calls that take longer than this many milliseconds are logged (default: unchanged).
+    :type slow_query_ms: float
+    """
+    if slow_query_ms is not None:
+        instrumentation.slow_query_ms = slow_query_ms
+    instrumentation.enabled = True
+
+
+def disable_instrumentation():
+    """Stops collecting statistics of DBConn methods. Statistics collected so far are kept."""
+    instrumentation.enabled = False
+
+
+def instrumented(method):
+    """Decorates a DBConn method so that its calls are recorded while instrumentation is enabled."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled or getattr(instrumentation._local, 'statements', None) is not None:
+            # Nested calls are counted as part of the outermost call.
+            return method(*args, **kwargs)
+        instrumentation._local.statements = statements = []
+        start = time.perf_counter()
+        failed = True
+        result = None
+        try:
+            result = method(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            instrumentation._local.statements = None
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            instrumentation.record_call(method.__name__, args[1:], elapsed_ms, result, failed, statements)
+
+    return wrapper
+
+
+def instrument_class(cls):
+    """Class decorator that instruments every public method of a class.
+
+    The ``iter_*`` methods are left alone: they return generators whose queries run after the call returns. The
+    statements they run are still timed and have their query plans captured.
+    """
+    for name, value in list(vars(cls).items()):
+        if not name.startswith('_') and callable(value) and not isinstance(value, type) \
+                and not name.startswith('iter_'):
+            setattr(cls, name, instrumented(value))
+    return cls
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times its statements while instrumentation is enabled."""
+
+    def execute(self, sql, parameters=()):
+        if not instrumentation.enabled:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        instrumentation.record_statement(self.connection, sql, parameters, (time.perf_counter() - start) * 1000)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        if not instrumentation.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        instrumentation.record_statement(self.connection, sql, seq_of_parameters[0] if seq_of_parameters else (),
+                                         (time.perf_counter() - start) * 1000)
+        return cursor
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors time their statements while instrumentation is enabled.
+
+    Pass it as the ``factory`` of ``sqlite3.connect``.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
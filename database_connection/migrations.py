@@ -0,0 +1,132 @@
+"""
+Migrations
+==========
+
+Versioned upgrades of the trivia database schema.
+
+The schema version of a database is kept in ``PRAGMA user_version``. ``migrate`` applies every migration newer than
+that version, each in its own transaction along with the version bump, so an interrupted upgrade resumes from the last
+migration that completed. Migrations only ever add to the schema; the rows already in a database are left alone.
+"""
+import sqlite3
+from sqlite3 import Connection
+
+from database_connection.category_index import CATEGORY_INDEX_SCRIPT
+from database_connection.spatial_index import INDEXED_TABLES, SPATIAL_INDEX_TEMPLATE
+
+# (name, table, column) of the secondary indexes used by the DBConn queries.
+SECONDARY_INDEXES = [
+    ('article_category_category_id_index', 'article_category', 'category_id'),
+    ('t_unit_article_id_index', 't_unit', 'article_id'),
+    ('location_zip_index', 'location', 'zip'),
+    ('user_username_index', 'user', 'username'),
+    # category_name_index is taken by the trigram index, which cannot serve exact matches on the name
+    ('category_name_lookup_index', 'category', 'name'),
+]
+
+
+def _execute_script(db: Connection, script: str):
+    """Runs each statement of a script inside the current transaction.
+
+    Unlike ``executescript``, this does not commit first, so a migration and its version bump stay atomic.
+    """
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            db.execute(statement)
+            statement = ''
+
+
+def _has_table(db: Connection, name: str) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (name,)).fetchone() is not None
+
+
+def _is_indexed(db: Connection, table: str, column: str) -> bool:
+    """Checks whether some index of a table, including the implicit ones of UNIQUE and PRIMARY KEY constraints,
+    starts with *column*."""
+    for index in db.execute(f'PRAGMA index_list("{table}");').fetchall():
+        first_column = db.execute(f'PRAGMA index_info("{index[1]}");').fetchone()
+        if first_column is not None and first_column[2] == column:
+            return True
+    return False
+
+
+def _add_spatial_index(db: Connection):
+    for table, key in INDEXED_TABLES:
+        if _has_table(db, table) and not _has_table(db, f'{table}_location_index'):
+            _execute_script(db, SPATIAL_INDEX_TEMPLATE.format(table=table, key=key))
+
+
+def _add_category_index(db: Connection):
+    if not _has_table(db, 'category') or _has_table(db, 'category_name_index'):
+        return
+    db.execute('SAVEPOINT category_index;')
+    try:
+        _execute_script(db, CATEGORY_INDEX_SCRIPT)
+    except sqlite3.OperationalError:
+        # This SQLite library cannot build the index; category searches fall back to LIKE.
+        db.execute('ROLLBACK TO category_index;')
+    db.execute('RELEASE category_index;')
+
+
+def _add_secondary_indexes(db: Connection):
+    for name, table, column in SECONDARY_INDEXES:
+        if _has_table(db, table) and not _is_indexed(db, table, column):
+            db.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}");')
+
+
+def _add_article_title_index(db: Connection):
+    if _has_table(db, 'article') and not _is_indexed(db, 'article', 'title'):
+        db.execute('CREATE INDEX IF NOT EXISTS "article_title_index" ON "article" ("title");')
+
+
+# Each migration upgrades a database from the version before it to its position in this list (starting at 1).
+# Append new migrations to the end; never change or reorder the ones that have shipped.
+MIGRATIONS = [
+    ('spatial index', _add_spatial_index),
+    ('category name index', _add_category_index),
+    ('secondary indexes', _add_secondary_indexes),
+    ('article title index', _add_article_title_index),
+]
+
+
+def schema_version(db: Connection) -> int:
+    """Gets the schema version of a database.
+
+    :param db: a connection to the database.
+    :returns: the number of migrations applied to the database.
+    :rtype: int
+    """
+    return db.execute('PRAGMA user_version;').fetchone()[0]
+
+
+def migrate(db: Connection, target_version: int = None) -> int:
+    """Applies the migrations a database has not had yet.
+
+    Safe to call from several connections at once: each migration re-checks the version after taking the write lock.
+
+    :param db: a connection to the database.
+    :param target_version: the version to upgrade to (default: the latest).
+    :type target_version: int
+    :raises DatabaseError:
+    :returns: the schema version of the database afterwards.
+    :rtype: int
+    """
+    if target_version is None:
+        target_version = len(MIGRATIONS)
+    version = schema_version(db)
+    while version < target_version:
+        db.execute('BEGIN IMMEDIATE;')
+        try:
+            version = schema_version(db)
+            if version < target_version:
+                name, upgrade = MIGRATIONS[version]
+                upgrade(db)
+                version += 1
+                db.execute(f'PRAGMA user_version = {version};')
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+    return version
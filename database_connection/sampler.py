@@ -0,0 +1,234 @@
+"""
+Sampler
+=======
+
+In-memory importance-weighted sampling of articles and categories.
+
+Weights are kept in compact NumPy arrays along with their running sum, so a weighted draw is a binary search over
+the cumulative weights instead of an aggregate query over ``article_category``.
+"""
+import threading
+from random import random
+from sqlite3 import Connection
+from typing import Optional
+
+import numpy as np
+
+# SQLite limits the number of bound parameters per statement, so id lists are queried in chunks of this size.
+CHUNK_SIZE = 500
+
+
+def _chunks(ids: list) -> list:
+    return [ids[i:i + CHUNK_SIZE] for i in range(0, len(ids), CHUNK_SIZE)]
+
+
+class WeightedSampler:
+    """Draws keys at random with probability proportional to their weight.
+
+    Negative weights count as zero. When every weight is zero, keys are drawn uniformly. The cumulative weights are
+    rebuilt lazily on the first draw after an update, so a burst of updates costs a single O(n) rebuild.
+
+    :param keys: the integer keys that can be drawn.
+    :type keys: Iterable[int]
+    :param weights: the weight of each key.
+    :type weights: Iterable[float]
+    """
+
+    def __init__(self, keys=(), weights=()):
+        self._lock = threading.Lock()
+        self._keys = np.asarray(list(keys), dtype=np.int64)
+        self._weights = np.clip(np.asarray(list(weights), dtype=np.float64), 0, None)
+        self._index = {int(key): i for i, key in enumerate(self._keys)}
+        self._cumulative = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def weight(self, key: int) -> float:
+        """Gets the weight of a key.
+
+        :returns: the weight of the key, or 0 if the key is not in the sampler.
+        """
+        with self._lock:
+            i = self._index.get(key)
+            return 0.0 if i is None else float(self._weights[i])
+
+    def update(self, weights: dict):
+        """Sets the weights of several keys at once, adding the keys that are not yet in the sampler.
+
+        :param weights: a mapping from key to its new weight. A weight of None removes the key.
+        :type weights: {int: float}
+        """
+        with self._lock:
+            new_keys = []
+            new_weights = []
+            for key, weight in weights.items():
+                i = self._index.get(key)
+                if weight is None:
+                    if i is not None:
+                        # The slot is dropped when the cumulative weights are next rebuilt.
+                        self._keys[i] = -1
+                        self._weights[i] = 0
+                        del self._index[key]
+                elif i is None:
+                    new_keys.append(key)
+                    new_weights.append(max(weight, 0))
+                else:
+                    self._weights[i] = max(weight, 0)
+            if new_keys:
+                start = len(self._keys)
+                self._keys = np.concatenate([self._keys, np.asarray(new_keys, dtype=np.int64)])
+                self._weights = np.concatenate([self._weights, np.asarray(new_weights, dtype=np.float64)])
+                self._index.update({key: start + i for i, key in enumerate(new_keys)})
+            self._cumulative = None
+
+    def _rebuild(self):
+        live = self._keys >= 0
+        if not live.all():
+            self._keys = self._keys[live]
+            self._weights = self._weights[live]
+            self._index = {int(key): i for i, key in enumerate(self._keys)}
+        self._cumulative = np.cumsum(self._weights)
+
+    def draw(self) -> Optional[int]:
+        """Draws a key at random, weighted by the key weights.
+
+        :returns: the drawn key, or None if the sampler is empty.
+        """
+        with self._lock:
+            if self._cumulative is None:
+                self._rebuild()
+            if len(self._keys) == 0:
+                return None
+            total = self._cumulative[-1]
+            if total <= 0:
+                return int(self._keys[int(random() * len(self._keys))])
+            i = int(np.searchsorted(self._cumulative, random() * total, side='right'))
+            return int(self._keys[min(i, len(self._keys) - 1)])
+
+
+class ImportanceSampler:
+    """Weighted samplers of the articles and categories of one database.
+
+    A category is weighted by its importance and an article by the summed importance of its categories. Both samplers
+    are built from the database on first use and can then be refreshed for just the rows that changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.articles = None
+        self.categories = None
+
+    def _build(self, db: Connection):
+        with self._lock:
+            if self.articles is not None:
+                return
+            rows = db.execute('SELECT category_id, importance FROM category;').fetchall()
+            categories = WeightedSampler([row[0] for row in rows], [row[1] or 0 for row in rows])
+            query = """
+                    SELECT article_category.article_id, SUM(importance)
+                    FROM article_category
+                        JOIN article ON article.article_id = article_category.article_id
+                        JOIN category ON category.category_id = article_category.category_id
+                    GROUP BY article_category.article_id;
+                    """
+            rows = db.execute(query).fetchall()
+            self.categories = categories
+            self.articles = WeightedSampler([row[0] for row in rows], [row[1] or 0 for row in rows])
+
+    def draw_article(self, db: Connection) -> tuple:
+        """Draws an article id weighted by the article's importance.
+
+        :param db: a connection to the database, used to build the sampler on first use.
+        :returns: the article id and its importance, or None if no article has a category.
+        :rtype: (int, float)
+        """
+        self._build(db)
+        article_id = self.articles.draw()
+        if article_id is None:
+            return None
+        return article_id, self.articles.weight(article_id)
+
+    def draw_category(self, db: Connection) -> Optional[int]:
+        """Draws a category id weighted by the category's importance.
+
+        :param db: a connection to the database, used to build the sampler on first use.
+        :returns: the category id, or None if there are no categories.
+        """
+        self._build(db)
+        return self.categories.draw()
+
+    def refresh_articles(self, db: Connection, article_ids: list):
+        """Recomputes the importance of the given articles from the database.
+
+        :param db: a connection to the database.
+        :param article_ids: the ids of the articles whose categories changed.
+        :type article_ids: [int]
+        """
+        if self.articles is None:
+            return
+        weights = {article_id: None for article_id in article_ids}
+        for chunk in _chunks(list(weights)):
+            query = f"""
+                    SELECT article_category.article_id, SUM(importance)
+                    FROM article_category
+                        JOIN article ON article.article_id = article_category.article_id
+                        JOIN category ON category.category_id = article_category.category_id
+                    WHERE article_category.article_id IN ({','.join('?' * len(chunk))})
+                    GROUP BY article_category.article_id;
+                    """
+            weights.update({row[0]: row[1] or 0 for row in db.execute(query, chunk)})
+        self.articles.update(weights)
+
+    def refresh_categories(self, db: Connection, category_ids: list, article_ids: list = None):
+        """Recomputes the importance of the given categories and of every article that belongs to them.
+
+        :param db: a connection to the database.
+        :param category_ids: the ids of the categories that were added, removed or re-weighted.
+        :type category_ids: [int]
+        :param article_ids: the ids of the affected articles, if already known (e.g. collected before a delete).
+        :type article_ids: [int]
+        """
+        if self.categories is None:
+            return
+        weights = {category_id: None for category_id in category_ids}
+        affected = set(article_ids or [])
+        for chunk in _chunks(list(weights)):
+            placeholders = ','.join('?' * len(chunk))
+            rows = db.execute(f'SELECT category_id, importance FROM category WHERE category_id IN ({placeholders});',
+                              chunk)
+            weights.update({row[0]: row[1] or 0 for row in rows})
+            if article_ids is None:
+                rows = db.execute(f'SELECT article_id FROM article_category WHERE category_id IN ({placeholders});',
+                                  chunk)
+                affected.update(row[0] for row in rows)
+        self.categories.update(weights)
+        self.refresh_articles(db, list(affected))
+
+
+_samplers = dict()
+_samplers_lock = threading.Lock()
+
+
+def get_importance_sampler(db_filename: str) -> ImportanceSampler:
+    """Gets the process-wide importance sampler for a database file.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :returns: the importance sampler for that file.
+    """
+    with _samplers_lock:
+        sampler = _samplers.get(db_filename)
+        if sampler is None:
+            sampler = ImportanceSampler()
+            _samplers[db_filename] = sampler
+        return sampler
+
+
+def clear_importance_samplers():
+    """Forgets every sampler, so they are rebuilt from the database on next use."""
+    with _samplers_lock:
+        _samplers.clear()
@@ -0,0 +1,64 @@
+"""
+Spatial Index
+=============
+
+R*Tree indexes over the coordinates of articles and TUnits, kept up to date by triggers.
+"""
+from math import asin, cos, degrees, radians, sin
+
+EARTH_RADIUS_MILES = 3956
+
+# Each indexed table gets an R*Tree of zero-area boxes and triggers that mirror every insert, update and delete.
+# ``INSERT OR REPLACE`` is used because REPLACE statements on the base table do not fire delete triggers.
+SPATIAL_INDEX_TEMPLATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_location_index USING rtree({key}, min_lat, max_lat, min_long, max_long);
+
+INSERT OR REPLACE INTO {table}_location_index
+SELECT {key}, lat, lat, long, long
+FROM {table}
+WHERE lat IS NOT NULL AND long IS NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS {table}_location_insert AFTER INSERT ON {table}
+WHEN new.lat IS NOT NULL AND new.long IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO {table}_location_index VALUES (new.{key}, new.lat, new.lat, new.long, new.long);
+END;
+
+CREATE TRIGGER IF NOT EXISTS {table}_location_update AFTER UPDATE OF {key}, lat, long ON {table}
+BEGIN
+    DELETE FROM {table}_location_index WHERE {key} = old.{key};
+    INSERT OR REPLACE INTO {table}_location_index
+    SELECT new.{key}, new.lat, new.lat, new.long, new.long
+    WHERE new.lat IS NOT NULL AND new.long IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS {table}_location_delete AFTER DELETE ON {table}
+BEGIN
+    DELETE FROM {table}_location_index WHERE {key} = old.{key};
+END;
+"""
+
+INDEXED_TABLES = [('article', 'article_id'), ('t_unit', 't_unit_Id')]
+
+
+def bounding_box(lat: float, long: float, radius: float) -> tuple:
+    """Gets a latitude/longitude box that contains every point within *radius* miles of a point.
+
+    :param lat: the latitude of the center, in decimal degrees.
+    :param long: the longitude of the center, in decimal degrees.
+    :param radius: the radius, in miles.
+    :returns: the minimum latitude, maximum latitude, minimum longitude and maximum longitude of the box.
+    :rtype: (float, float, float, float)
+    """
+    angle = radius / EARTH_RADIUS_MILES
+    d_lat = degrees(angle)
+    min_lat, max_lat = lat - d_lat, lat + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole, so it spans every longitude.
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+    d_long = degrees(asin(sin(angle) / cos(radians(lat))))
+    min_long, max_long = long - d_long, long + d_long
+    if min_long < -180 or max_long > 180:
+        # Searches across the antimeridian fall back to every longitude rather than two boxes.
+        return min_lat, max_lat, -180, 180
+    return min_lat, max_lat, min_long, max_long
@@ -0,0 +1,169 @@
+"""
+Storage
+=======
+
+SQLite storage settings (journal mode, memory mapping, page cache and sync level) and periodic WAL checkpoints.
+
+In WAL mode readers see the last committed state of the database while a writer is busy, so game handlers are not
+held up by the dev ranker or a bulk load. Committed pages are appended to a ``-wal`` file that is copied back into the
+database by checkpoints.
+"""
+import logging
+import sqlite3
+import threading
+from configparser import ConfigParser
+from dataclasses import dataclass
+from os import path
+from typing import Optional
+from urllib.request import pathname2url
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+@dataclass
+class StorageSettings:
+    """
+    Class representing the ``[STORAGE]`` section of ``db.ini``.
+
+    The journal mode is stored in the database file, so it and the sync level that goes with it are left as they are
+    unless configured.
+    """
+
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    mmap_size: int = 268435456
+    cache_size: int = -65536
+    wal_autocheckpoint: int = 1000
+    checkpoint_interval: float = 60.0
+
+    @staticmethod
+    def from_config(config: ConfigParser):
+        """Reads the storage settings from a config, using the defaults for missing options.
+
+        :raises ValueError: if the journal mode or synchronous level is not one SQLite knows.
+        :returns: the storage settings.
+        :rtype: StorageSettings
+        """
+        settings = StorageSettings()
+        if config.has_section('STORAGE'):
+            section = config['STORAGE']
+            if 'JournalMode' in section:
+                settings.journal_mode = section['JournalMode'].upper()
+            if 'Synchronous' in section:
+                settings.synchronous = section['Synchronous'].upper()
+            settings.mmap_size = section.getint('MmapSize', settings.mmap_size)
+            settings.cache_size = section.getint('CacheSize', settings.cache_size)
+            settings.wal_autocheckpoint = section.getint('WalAutocheckpoint', settings.wal_autocheckpoint)
+            settings.checkpoint_interval = section.getfloat('CheckpointInterval', settings.checkpoint_interval)
+        if settings.journal_mode is not None and settings.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f'unknown journal mode {settings.journal_mode}')
+        if settings.synchronous is not None and settings.synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f'unknown synchronous level {settings.synchronous}')
+        return settings
+
+    def apply(self, db: sqlite3.Connection):
+        """Applies the settings to a newly opened connection.
+
+        The journal mode is stored in the database file, so switching to WAL once affects every later connection,
+        including ones opened outside of DBConn. The other settings only last as long as the connection.
+
+        :param db: a connection to the database.
+        """
+        if self.journal_mode is not None:
+            db.execute(f'PRAGMA journal_mode = {self.journal_mode};')
+        if self.synchronous is not None:
+            db.execute(f'PRAGMA synchronous = {self.synchronous};')
+        db.execute(f'PRAGMA mmap_size = {int(self.mmap_size)};')
+        db.execute(f'PRAGMA cache_size = {int(self.cache_size)};')
+        db.execute(f'PRAGMA wal_autocheckpoint = {int(self.wal_autocheckpoint)};')
+
+
+class Checkpointer:
+    """Runs a passive WAL checkpoint on a database every *interval* seconds from a background thread.
+
+    SQLite already checkpoints when the WAL grows past ``wal_autocheckpoint`` pages, but only from the connection that
+    happens to commit at that point, and never while a reader is using the WAL. Checkpointing on a timer keeps the WAL
+    short during quiet periods, which keeps reads fast.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :param interval: the number of seconds between checkpoints.
+    :type interval: float
+    """
+
+    def __init__(self, db_filename: str, interval: float = 60.0):
+        self.db_filename = db_filename
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def checkpoint(self, mode: str = 'PASSIVE') -> tuple:
+        """Copies as much of the WAL back into the database as possible without waiting for readers or writers.
+
+        :param mode: the checkpoint mode: PASSIVE, FULL, RESTART or TRUNCATE.
+        :returns: whether the checkpoint was blocked, the number of pages in the WAL and the number checkpointed.
+        :rtype: (int, int, int)
+        """
+        # mode=rw keeps a checkpoint from creating the database file if it has been deleted
+        db = sqlite3.connect(f'file:{pathname2url(self.db_filename)}?mode=rw', uri=True)
+        try:
+            return db.execute(f'PRAGMA wal_checkpoint({mode});').fetchone()
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if not path.exists(self.db_filename):
+                break
+            try:
+                self.checkpoint()
+            except sqlite3.Error:
+                logger.exception('could not checkpoint %s', self.db_filename)
+
+    def start(self):
+        """Starts checkpointing in the background."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background checkpoints."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_checkpointers = dict()
+_checkpointers_lock = threading.Lock()
+
+
+def start_checkpointer(db_filename: str, interval: float) -> Checkpointer:
+    """Starts the process-wide checkpointer of a database file, if it is not running yet.
+
+    :param db_filename: the path of the SQLite database file.
+    :type db_filename: str
+    :param interval: the number of seconds between checkpoints.
+    :type interval: float
+    :returns: the checkpointer for that file.
+    """
+    with _checkpointers_lock:
+        checkpointer = _checkpointers.get(db_filename)
+        if checkpointer is None:
+            checkpointer = Checkpointer(db_filename, interval)
+            checkpointer.start()
+            _checkpointers[db_filename] = checkpointer
+        return checkpointer
+
+
+def stop_all_checkpointers():
+    """Stops and forgets every checkpointer, e.g. before a database file is deleted or replaced."""
+    with _checkpointers_lock:
+        checkpointers = list(_checkpointers.values())
+        _checkpointers.clear()
+    for checkpointer in checkpointers:
+        checkpointer.stop()
@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+import unittest
+from concurrent.futures import Future
+from os import remove, path
+
+import __init__
+from database_connection.async_dbconn import AsyncDBConn
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn, DBUser
+
+
+class TestAsyncDBConn(unittest.TestCase):
+    DB_FILENAME = 'test_async.db'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+    DATA_FILENAME = 'test_sql/test_data.sql'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Runs before the first test
+        """
+        if path.exists(cls.DB_FILENAME):
+            remove(cls.DB_FILENAME)
+        test_db = sqlite3.connect(cls.DB_FILENAME)
+        for filename in [cls.SCHEMA_FILENAME, cls.DATA_FILENAME]:
+            with open(filename, 'r') as f:
+                test_db.cursor().executescript(f.read())
+        test_db.commit()
+        test_db.close()
+        cls.async_db_conn = AsyncDBConn(DBConn(cls.DB_FILENAME))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Runs after the last test
+        """
+        cls.async_db_conn.shutdown()
+        close_all_pools()
+        remove(cls.DB_FILENAME)
+
+    def test_method_returns_future(self):
+        future = self.async_db_conn.select_user('Jill')
+        self.assertIsInstance(future, Future)
+        self.assertEqual(DBUser(1, 'Jill', 'jill@email.com', 5, 5, 10, 5), future.result())
+
+    def test_concurrent_queries(self):
+        futures = [self.async_db_conn.select_article_categories(article_id) for article_id in range(1, 4)]
+        exp_categories = [['category_a', 'category_b', 'category_c'], ['category_a'], ['category_b']]
+        self.assertEqual(exp_categories, [future.result() for future in futures])
+
+    def test_run(self):
+        act_password = asyncio.run(self.async_db_conn.run('select_password', 'Jack'))
+        self.assertEqual('pass2', act_password)
+
+    def test_exception_is_raised_by_result(self):
+        future = self.async_db_conn.insert_user(DBUser(username='Jill', email='jill@email.com'), 'pass')
+        with self.assertRaises(sqlite3.IntegrityError):
+            future.result()
+
+    def test_private_methods_are_not_exposed(self):
+        with self.assertRaises(AttributeError):
+            self.async_db_conn._select_lat_long('00601')
+        with self.assertRaises(AttributeError):
+            self.async_db_conn.submit('_select_lat_long', '00601')
+
+
+if __name__ == '__main__':
+    unittest.main()
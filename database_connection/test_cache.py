@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+
+import __init__
+from database_connection.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(2, len(cache))
+
+    def test_entries_expire(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch('database_connection.cache.time.monotonic', return_value=100.0):
+            cache.put('a', 1)
+        with mock.patch('database_connection.cache.time.monotonic', return_value=109.0):
+            self.assertEqual(1, cache.get('a'))
+        with mock.patch('database_connection.cache.time.monotonic', return_value=110.0):
+            self.assertEqual('gone', cache.get('a', 'gone'))
+        self.assertEqual(0, len(cache))
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=4)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        cache.get('a')
+        self.assertEqual({'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 4}, cache.stats())
+
+    def test_invalidate(self):
+        cache = LRUCache()
+        cache.put(('00601', 50), 1)
+        cache.put(('00601', 100), 2)
+        cache.put(('00602', 50), 3)
+        cache.invalidate_where(lambda key: key[0] == '00601')
+        self.assertEqual([None, None, 3], [cache.get(key) for key in [('00601', 50), ('00601', 100), ('00602', 50)]])
+        cache.invalidate(('00602', 50))
+        self.assertEqual(0, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
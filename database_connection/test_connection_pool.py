@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+import unittest
+from os import remove, path
+
+import __init__
+from database_connection.connection_pool import ConnectionPool, close_all_pools, get_pool
+
+
+class TestConnectionPool(unittest.TestCase):
+    DB_FILENAME = 'test_pool.db'
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        self.pool = ConnectionPool(TestConnectionPool.DB_FILENAME, max_size=2, timeout=0.1)
+
+    def tearDown(self) -> None:
+        """
+        Runs after each test method
+        """
+        self.pool.close()
+        if path.exists(TestConnectionPool.DB_FILENAME):
+            remove(TestConnectionPool.DB_FILENAME)
+
+    def test_connection_is_reused(self):
+        with self.pool.connection() as db:
+            first = db
+        with self.pool.connection() as db:
+            self.assertIs(first, db)
+
+    def test_nested_connection_is_shared_by_thread(self):
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                self.assertIs(outer, inner)
+
+    def test_pool_is_bounded(self):
+        held = threading.Semaphore(0)
+        done = threading.Event()
+
+        def hold_connection():
+            with self.pool.connection():
+                held.release()
+                done.wait()
+
+        threads = [threading.Thread(target=hold_connection) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            held.acquire()
+        with self.assertRaises(sqlite3.OperationalError):
+            with self.pool.connection():
+                pass
+        done.set()
+        for thread in threads:
+            thread.join()
+
+    def test_rollback_on_error(self):
+        with self.pool.connection() as db:
+            db.execute('CREATE TABLE t (x INTEGER)')
+            db.commit()
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as db:
+                db.execute('INSERT INTO t VALUES (1)')
+                raise ValueError()
+        with self.pool.connection() as db:
+            self.assertEqual(0, db.execute('SELECT COUNT(*) FROM t').fetchone()[0])
+
+    def test_first_connect_runs_once_outside_the_pool_lock(self):
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_first_connect(db):
+            calls.append(db)
+            started.set()
+            release.wait(5)
+
+        pool = ConnectionPool(TestConnectionPool.DB_FILENAME, max_size=2, timeout=5,
+                              on_first_connect=slow_first_connect)
+        def use_connection():
+            with pool.connection():
+                pass
+
+        thread = threading.Thread(target=use_connection)
+        thread.start()
+        started.wait(5)
+        # the pool lock is free while the first connection is being set up
+        self.assertTrue(pool._lock.acquire(timeout=1))
+        pool._lock.release()
+        release.set()
+        thread.join()
+        with pool.connection():
+            pass
+        self.assertEqual(1, len(calls))
+        pool.close()
+
+    def test_failed_first_connect_is_retried(self):
+        calls = []
+
+        def failing_first_connect(db):
+            calls.append(db)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+
+        pool = ConnectionPool(TestConnectionPool.DB_FILENAME, max_size=1, on_first_connect=failing_first_connect)
+        with self.assertRaises(sqlite3.OperationalError):
+            with pool.connection():
+                pass
+        with pool.connection():
+            pass
+        self.assertEqual(2, len(calls))
+        pool.close()
+
+    def test_closed_pool_hands_out_no_connections(self):
+        with self.pool.connection():
+            pass
+        self.pool.close()
+        self.assertTrue(self.pool._idle.empty())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            with self.pool.connection():
+                pass
+
+    def test_get_pool_rejects_different_settings(self):
+        try:
+            pool = get_pool(TestConnectionPool.DB_FILENAME, max_size=2, on_connect=print)
+            self.assertIs(pool, get_pool(TestConnectionPool.DB_FILENAME, max_size=2, on_connect=print))
+            self.assertIs(pool, get_pool(TestConnectionPool.DB_FILENAME))
+            with self.assertRaises(ValueError):
+                get_pool(TestConnectionPool.DB_FILENAME, max_size=4)
+            with self.assertRaises(ValueError):
+                get_pool(TestConnectionPool.DB_FILENAME, max_size=2, on_connect=repr)
+        finally:
+            close_all_pools()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sqlite3
+import tempfile
+import unittest
+from os import listdir, remove, path, stat
+from unittest import mock
+
+import numpy as np
+
+import __init__
+from database_connection.connection_pool import close_all_pools
+from database_connection.corpus_snapshot import CorpusSnapshot, export_corpus_snapshot
+from database_connection.dbconn import DBConn
+from trivia_generator.TUnit import TUnit
+
+
+class TestCorpusSnapshot(unittest.TestCase):
+    DB_FILENAME = 'test_snapshot.db'
+    SNAPSHOT_FILENAME = 'test_snapshot.snapshot'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+    DATA_FILENAME = 'test_sql/test_data.sql'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Runs before the first test
+        """
+        if path.exists(cls.DB_FILENAME):
+            remove(cls.DB_FILENAME)
+        test_db = sqlite3.connect(cls.DB_FILENAME)
+        for filename in [cls.SCHEMA_FILENAME, cls.DATA_FILENAME]:
+            with open(filename, 'r') as f:
+                test_db.cursor().executescript(f.read())
+        test_db.commit()
+        test_db.close()
+        cls.db_conn = DBConn(cls.DB_FILENAME, 15.0)
+        cls.db_conn.insert_tunits([TUnit('Ünïcödé sentence ☃', None, None, None, None, None, None, 0, 0, 0),
+                                   TUnit('sentence_e', 5, 'url_e', 1234, None, 18.2, -66.8, 3, 2, 1)])
+        export_corpus_snapshot(cls.DB_FILENAME, cls.SNAPSHOT_FILENAME)
+        cls.snapshot = CorpusSnapshot(cls.SNAPSHOT_FILENAME)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Runs after the last test
+        """
+        cls.snapshot.close()
+        close_all_pools()
+        remove(cls.DB_FILENAME)
+        remove(cls.SNAPSHOT_FILENAME)
+
+    def select_all_tunits(self) -> list:
+        conn = sqlite3.connect(self.DB_FILENAME)
+        query = """
+                SELECT sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
+                    num_dislikes
+                FROM t_unit
+                ORDER BY t_unit_Id;
+                """
+        rows = conn.cursor().execute(query).fetchall()
+        conn.close()
+        return [TUnit(*row) for row in rows]
+
+    def test_tunits_round_trip(self):
+        exp_t_unit_list = self.select_all_tunits()
+        self.assertEqual(len(exp_t_unit_list), len(self.snapshot))
+        self.assertEqual(exp_t_unit_list, [self.snapshot.tunit(i) for i in range(len(self.snapshot))])
+        self.assertEqual(exp_t_unit_list[-2].sentence, self.snapshot.sentence(len(self.snapshot) - 2))
+        # timestamps are integers, as in the database, not merely equal to them
+        self.assertEqual([type(t_unit.access_timestamp) for t_unit in exp_t_unit_list],
+                         [type(self.snapshot.tunit(i).access_timestamp) for i in range(len(self.snapshot))])
+
+    def test_snapshot_is_readable_by_other_users(self):
+        self.assertEqual(0o044, stat(self.SNAPSHOT_FILENAME).st_mode & 0o044)
+
+    def test_columns_are_memory_mapped(self):
+        self.assertFalse(self.snapshot.t_unit_id.flags.writeable)
+        self.assertIsInstance(self.snapshot.lat.base, np.memmap)
+
+    def test_find(self):
+        exp_t_unit = self.select_all_tunits()[-1]
+        self.assertEqual(exp_t_unit, self.snapshot.find(exp_t_unit.t_unit_id))
+        self.assertIsNone(self.snapshot.find(exp_t_unit.t_unit_id + 1))
+
+    def test_indices_within(self):
+        exp_ids = [t_unit.t_unit_id for t_unit in self.db_conn.select_tunit_location('00601')]
+        act_ids = [int(self.snapshot.t_unit_id[i]) for i in self.snapshot.indices_within(18.18, -66.75, 15.0)]
+        self.assertEqual(exp_ids, act_ids)
+
+    def test_sample(self):
+        rng = np.random.default_rng(0)
+        sample = self.snapshot.sample(3, rng=rng)
+        self.assertEqual(3, len({t_unit.t_unit_id for t_unit in sample}))
+        self.assertEqual(len(self.snapshot), len(self.snapshot.sample(100, rng=rng)))
+        indices = self.snapshot.indices_within(18.18, -66.75, 15.0)
+        self.assertEqual({int(self.snapshot.t_unit_id[i]) for i in indices},
+                         {t_unit.t_unit_id for t_unit in self.snapshot.sample(10, indices=indices, rng=rng)})
+
+    def test_empty_corpus(self):
+        empty_db = sqlite3.connect('test_snapshot_empty.db')
+        with open(self.SCHEMA_FILENAME, 'r') as f:
+            empty_db.cursor().executescript(f.read())
+        empty_db.close()
+        try:
+            self.assertEqual(0, export_corpus_snapshot('test_snapshot_empty.db', 'test_snapshot_empty.snapshot'))
+            snapshot = CorpusSnapshot('test_snapshot_empty.snapshot')
+            self.assertEqual(0, len(snapshot))
+            self.assertEqual([], snapshot.sample(5))
+            snapshot.close()
+        finally:
+            remove('test_snapshot_empty.db')
+            remove('test_snapshot_empty.snapshot')
+
+    def test_failed_export_removes_partial_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch('database_connection.corpus_snapshot.shutil.copyfileobj', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    export_corpus_snapshot(self.DB_FILENAME, path.join(tmp_dir, 'tunits.snapshot'))
+            self.assertEqual([], listdir(tmp_dir))
+
+    def test_not_a_snapshot(self):
+        with self.assertRaises(ValueError):
+            CorpusSnapshot(self.DB_FILENAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,10 @@ from os import remove, path
 from scipy.stats import chisquare
 
 import __init__
+from database_connection.cache import clear_shared_caches
+from database_connection.connection_pool import close_all_pools
 from database_connection.dbconn import DBConn, DBUser
+from database_connection.sampler import clear_importance_samplers
 from trivia_generator.TUnit import TUnit
 
 
@@ -33,8 +36,8 @@ class TestDBConn(unittest.TestCase):
         """
         Runs after the last test
         """
+        close_all_pools()
         remove(cls.DB_FILENAME)
-        pass
 
     def setUp(self) -> None:
         """
@@ -50,6 +53,8 @@ class TestDBConn(unittest.TestCase):
         """
         Runs after each test method
         """
+        clear_importance_samplers()
+        clear_shared_caches()
         test_db = sqlite3.connect(TestDBConn.DB_FILENAME)
         with open(TestDBConn.REMOVE_DATA_FILENAME, 'r') as f:
             test_db.cursor().executescript(f.read())
@@ -71,12 +76,72 @@ class TestDBConn(unittest.TestCase):
         exp_max_chisq = 21.67
         self.assertLess(act_chisq, exp_max_chisq)
 
+    def test_select_random_articles(self):
+        act_articles = DBConn(TestDBConn.DB_FILENAME).select_random_articles(5)
+        self.assertEqual(5, len(act_articles))
+        self.assertEqual(5, len(set(act_articles)))
+        for article_id, title in act_articles:
+            self.assertEqual(article_id, ord(title) - 96)
+        act_articles = DBConn(TestDBConn.DB_FILENAME).select_random_articles(20)
+        self.assertEqual(set((i, chr(i + 96)) for i in range(1, 11)), set(act_articles))
+
+    def test_select_random_article_with_gaps(self):
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        conn.cursor().execute('DELETE FROM article WHERE article_id BETWEEN 2 AND 9')
+        conn.commit()
+        conn.close()
+        observations = {1: 0, 10: 0}
+        for j in range(2000):
+            article_id, title = DBConn(TestDBConn.DB_FILENAME).select_random_article()
+            observations[article_id] += 1
+        act_chisq, p = chisquare(list(observations.values()))
+        # NOTE: critical value for 1 degree of freedom and a P value of 0.001
+        self.assertLess(act_chisq, 10.83)
+
+    def test_select_weighted_random_article(self):
+        observations = {1: 0, 2: 0}
+        for j in range(10000):
+            article_id, title, importance = DBConn(TestDBConn.DB_FILENAME).select_weighted_random_article()
+            self.assertEqual(article_id, ord(title) - 96)
+            observations[article_id] += 1
+        # Article 1 has an importance of 1.5 and article 2 of 1. Article 3 only has a category of importance 0.
+        act_chisq, p = chisquare([observations[1], observations[2]], [6000, 4000])
+        # NOTE: critical value for 1 degree of freedom and a P value of 0.001
+        self.assertLess(act_chisq, 10.83)
+
+    def test_select_weighted_random_article_after_delete_category(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        db_conn.select_weighted_random_article()
+        db_conn.delete_category('category_a')
+        for j in range(100):
+            self.assertEqual((1, 'a', 0.5), db_conn.select_weighted_random_article())
+
+    def test_select_random_category_after_update_category_importance(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        db_conn.select_random_category()
+        db_conn.update_category_importance('category_a', 0)
+        db_conn.insert_category('category_d', 2.0)
+        for j in range(100):
+            self.assertIn(db_conn.select_random_category()[1], ['category_c', 'category_d'])
+
     def test_select_article_categories(self):
         article_id = 1
         exp_categories = ['category_a', 'category_b', 'category_c']
         act_categories = DBConn(TestDBConn.DB_FILENAME).select_article_categories(article_id)
         self.assertEqual(exp_categories, act_categories)
 
+    def test_select_article_categories_is_cached(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        self.assertEqual(['category_a'], db_conn.select_article_categories(2))
+        self.assertEqual(['category_a'], db_conn.select_article_categories(2))
+        stats = db_conn.article_category_cache_stats()
+        self.assertEqual((1, 1, 1), (stats['hits'], stats['misses'], stats['size']))
+        db_conn.insert_article_categories([(2, 2)])
+        self.assertEqual(['category_a', 'category_b'], sorted(db_conn.select_article_categories(2)))
+        db_conn.delete_category('category_a')
+        self.assertEqual(['category_b'], db_conn.select_article_categories(2))
+        self.assertEqual(1, db_conn.article_category_cache_stats()['hits'])
+
     def test_select_category_articles(self):
         exp_articles = [(1, 'a'), (3, 'c')]
         act_articles = DBConn(TestDBConn.DB_FILENAME).select_category_articles('y_b')
@@ -85,6 +150,26 @@ class TestDBConn(unittest.TestCase):
         act_articles = DBConn(TestDBConn.DB_FILENAME).select_category_articles('tegor')
         self.assertEqual(exp_articles, act_articles)
 
+    def test_select_random_category_article(self):
+        observations = {1: 0, 3: 0}
+        for j in range(1000):
+            article_id, title = DBConn(TestDBConn.DB_FILENAME).select_random_category_article('y_b')
+            self.assertEqual(article_id, ord(title) - 96)
+            observations[article_id] += 1
+        self.assertGreater(observations[1], 0)
+        self.assertGreater(observations[3], 0)
+        self.assertIsNone(DBConn(TestDBConn.DB_FILENAME).select_random_category_article('does not exist'))
+
+    def test_select_category_articles_after_insert_category(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        self.assertEqual([], db_conn.select_category_articles('new_cat'))
+        category_id = db_conn.insert_category('new_category', 1)
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        conn.cursor().execute('INSERT INTO article_category VALUES (5, ?)', (category_id,))
+        conn.commit()
+        conn.close()
+        self.assertEqual([(5, 'e')], db_conn.select_category_articles('NEW_CAT'))
+
     def test_insert_user(self):
         exp_user = DBUser(username='Jim', email='jim@email.com')
         exp_password = 'pass'
@@ -134,11 +219,22 @@ class TestDBConn(unittest.TestCase):
         act_user_id = DBConn(TestDBConn.DB_FILENAME).update_user(user)
         self.assertEqual(exp_user_id, act_user_id)
 
+    def test_increment_user_statistics(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        self.assertEqual(2, db_conn.increment_user_statistics({'Jill': (1, 0, 10, 7), 'Jack': (0, 1, 10, 3),
+                                                               'bum': (1, 0, 10, 10)}))
+        self.assertEqual(DBUser(1, 'Jill', 'jill@email.com', 6, 5, 20, 12), db_conn.select_user('Jill'))
+        self.assertEqual(DBUser(2, 'Jack', 'jack@email.com', 7, 8, 24, 10), db_conn.select_user('Jack'))
+        self.assertEqual(0, db_conn.increment_user_statistics({}))
+
     def test_select_password(self):
         exp_password = 'pass1'
         act_password = DBConn(TestDBConn.DB_FILENAME).select_password('Jill')
         self.assertEqual(exp_password, act_password)
 
+    def test_select_password_unknown_user(self):
+        self.assertIsNone(DBConn(TestDBConn.DB_FILENAME).select_password('gaeigjeklgj'))
+
     def test_update_password(self):
         exp_username = 'Jill'
         exp_password = 'test'
@@ -150,9 +246,14 @@ class TestDBConn(unittest.TestCase):
         '''
         conn = sqlite3.connect(TestDBConn.DB_FILENAME)
         act_username, act_password = conn.cursor().execute(query, (exp_username,)).fetchone()
+        conn.close()
         self.assertEqual(exp_username, act_username)
         self.assertEqual(exp_password, act_password)
 
+    def test_update_password_returns_user_id(self):
+        self.assertEqual(1, DBConn(TestDBConn.DB_FILENAME).update_password('Jill', 'test'))
+        self.assertEqual(-1, DBConn(TestDBConn.DB_FILENAME).update_password('bum', 'test'))
+
     def test_select_user_exists(self):
         exp_user = DBUser(1, 'Jill', 'jill@email.com', 5, 5, 10, 5)
         act_user = DBConn(TestDBConn.DB_FILENAME).select_user('Jill')
@@ -172,6 +273,7 @@ class TestDBConn(unittest.TestCase):
         '''
         conn = sqlite3.connect(TestDBConn.DB_FILENAME)
         act_user = conn.cursor().execute(query, (user.username,)).fetchone()
+        conn.close()
         self.assertIsNone(act_user)
 
     def test_update_tunit_exists(self):
@@ -208,6 +310,48 @@ class TestDBConn(unittest.TestCase):
         act_t_unit = TUnit(*row)
         self.assertEqual(exp_t_unit, act_t_unit)
 
+    def test_increment_tunit_ranks(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        t_unit = TUnit('sentence_r', 1, 'url', 1234, None, 10, 10, 1, 2, 3)
+        t_unit_id = db_conn.update_tunit(t_unit)
+        db_conn.increment_tunit_ranks({t_unit_id: (2, 0, 1)})
+        db_conn.increment_tunit_ranks({t_unit_id: (1, 1, 0)})
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        row = conn.cursor().execute('SELECT num_likes, num_mehs, num_dislikes FROM t_unit WHERE t_unit_Id = ?;',
+                                    (t_unit_id,)).fetchone()
+        conn.close()
+        self.assertEqual((4, 3, 4), row)
+        db_conn.increment_tunit_ranks({})
+
+    def test_insert_tunits(self):
+        exp_t_unit_list = [TUnit('sentence_x', 1, 'url', 1234, None, 10, 10, 0, 0, 0),
+                           TUnit('sentence_a', 1, 'url', 1234, 1, 18.1, -66.7, 5, 0, 0),
+                           TUnit('sentence_y', 2, 'url', 1234, None, None, None, 0, 0, 0)]
+        t_unit_ids = DBConn(TestDBConn.DB_FILENAME).insert_tunits(exp_t_unit_list)
+        self.assertEqual([t_unit_ids[0], 1, t_unit_ids[0] + 1], t_unit_ids)
+        self.assertEqual(t_unit_ids, [t_unit.t_unit_id for t_unit in exp_t_unit_list])
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        query = """
+                SELECT sentence, article_id, url, access_timestamp, t_unit_Id, lat, long, num_likes, num_mehs,
+                    num_dislikes
+                FROM t_unit
+                WHERE t_unit_Id = ?;
+                """
+        act_t_unit_list = [TUnit(*conn.cursor().execute(query, (t_unit_id,)).fetchone()) for t_unit_id in t_unit_ids]
+        conn.close()
+        self.assertEqual(exp_t_unit_list, act_t_unit_list)
+        self.assertEqual([], DBConn(TestDBConn.DB_FILENAME).insert_tunits([]))
+
+    def test_insert_articles_and_categories(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        k_id, l_id = db_conn.insert_articles([('k', None, None), ('l', 18.2, -66.8)])
+        self.assertEqual(k_id + 1, l_id)
+        db_conn.insert_article_categories([(k_id, 2), (l_id, 2), (1, 2)])
+        exp_articles = [(1, 'a'), (3, 'c'), (k_id, 'k'), (l_id, 'l')]
+        self.assertEqual(exp_articles, db_conn.select_category_articles('y_b'))
+        self.assertEqual([(1, 'a'), (l_id, 'l')], DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS)
+                         .select_articles_location('00601'))
+
     def test_select_tunit_random(self):
         exp_t_unit_list = [TUnit('sentence_a', 1, 'url', 1234, 1, 18.1, -66.7, 0, 0, 0),
                            TUnit('sentence_b', 2, 'url', 1234, 2, 30.0, 30.25, 1, 1, 1),
@@ -216,6 +360,12 @@ class TestDBConn(unittest.TestCase):
         act_t_unit = DBConn(TestDBConn.DB_FILENAME).select_tunit_random()
         self.assertIn(act_t_unit, exp_t_unit_list)
 
+    def test_select_tunits_random(self):
+        act_t_unit_list = DBConn(TestDBConn.DB_FILENAME).select_tunits_random(3)
+        self.assertEqual(3, len(act_t_unit_list))
+        self.assertEqual(3, len({t_unit.t_unit_id for t_unit in act_t_unit_list}))
+        self.assertEqual([], DBConn(TestDBConn.DB_FILENAME).select_tunits_random(0))
+
     def test_select_tunit_category_exists(self):
         exp_t_unit_list = [TUnit('sentence_a', 1, 'url', 1234, 1, 18.1, -66.7, 0, 0, 0),
                            TUnit('sentence_b', 2, 'url', 1234, 2, 30.0, 30.25, 1, 1, 1)]
@@ -232,6 +382,40 @@ class TestDBConn(unittest.TestCase):
         act_t_unit_list = DBConn(TestDBConn.DB_FILENAME).select_tunit_category('does not exist')
         self.assertEqual(exp_t_unit_list, act_t_unit_list)
 
+    def test_iter_tunit_category(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        exp_t_unit_list = db_conn.select_tunit_category('category_a')
+        self.assertEqual(exp_t_unit_list, list(db_conn.iter_tunit_category('category_a', page_size=1)))
+        self.assertEqual(exp_t_unit_list[:1], list(db_conn.iter_tunit_category('category_a', limit=1)))
+        self.assertEqual([], list(db_conn.iter_tunit_category('category_a', sample_rate=0)))
+        self.assertEqual(exp_t_unit_list, list(db_conn.iter_tunit_category('category_a', sample_rate=1)))
+        self.assertEqual([], list(db_conn.iter_tunit_category('bum')))
+
+    def test_iter_tunit_category_pages(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME)
+        category_id = db_conn.insert_category('category_z', 1)
+        t_units = [TUnit(f'sentence_{i}', 1, 'url', 1234, None, None, None, 0, 0, 0) for i in range(25)]
+        db_conn.insert_tunits(t_units)
+        db_conn.insert_article_categories([(1, category_id)])
+        act_t_unit_list = list(db_conn.iter_tunit_category('category_z', page_size=4))
+        self.assertEqual(db_conn.select_tunit_category('category_z'), act_t_unit_list)
+        self.assertLessEqual(set(t.t_unit_id for t in t_units), set(t.t_unit_id for t in act_t_unit_list))
+        self.assertEqual(act_t_unit_list[:10], list(db_conn.iter_tunit_category('category_z', limit=10, page_size=4)))
+        sampled = list(db_conn.iter_tunit_category('category_z', sample_rate=0.5, page_size=4))
+        self.assertLessEqual(set(t.t_unit_id for t in sampled), set(t.t_unit_id for t in act_t_unit_list))
+        self.assertEqual(sorted(sampled, key=lambda t: t.t_unit_id), sampled)
+
+    def test_iter_tunit_location(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS)
+        t_unit = TUnit('sentence_e', 5, 'url', 1234, None, 18.2, -66.8, 0, 0, 0)
+        db_conn.update_tunit(t_unit)
+        exp_t_unit_list = db_conn.select_tunit_location('00601')
+        self.assertEqual(2, len(exp_t_unit_list))
+        self.assertEqual(exp_t_unit_list, list(db_conn.iter_tunit_location('00601', page_size=1)))
+        self.assertEqual(exp_t_unit_list[:1], list(db_conn.iter_tunit_location('00601', limit=1, page_size=1)))
+        self.assertEqual([], list(db_conn.iter_tunit_location('00601', sample_rate=0)))
+        self.assertEqual([], list(db_conn.iter_tunit_location('25974')))
+
     def test_select_tunit_location_exists(self):
         exp_t_unit_list = [TUnit('sentence_a', 1, 'url', 1234, 1, 18.1, -66.7, 0, 0, 0)]
         act_t_unit_list = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS).select_tunit_location('00601')
@@ -252,6 +436,7 @@ class TestDBConn(unittest.TestCase):
                 '''
         conn = sqlite3.connect(TestDBConn.DB_FILENAME)
         row = conn.cursor().execute(query, (1,)).fetchone()
+        conn.close()
         self.assertIsNone(row)
 
     def test_insert_category(self):
@@ -263,6 +448,7 @@ class TestDBConn(unittest.TestCase):
         WHERE name = ?'''
         conn = sqlite3.connect(TestDBConn.DB_FILENAME)
         act_category = conn.cursor().execute(query, (exp_category[0],)).fetchone()
+        conn.close()
         self.assertEqual(exp_category, act_category)
 
     def test_delete_category(self):
@@ -274,6 +460,7 @@ class TestDBConn(unittest.TestCase):
         WHERE name = ?'''
         conn = sqlite3.connect(TestDBConn.DB_FILENAME)
         act_category = conn.cursor().execute(query, (category,)).fetchone()
+        conn.close()
         self.assertIsNone(act_category)
 
     def test_select_articles_location(self):
@@ -281,6 +468,48 @@ class TestDBConn(unittest.TestCase):
         act_articles = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS).select_articles_location('00601')
         self.assertEqual(exp_articles, act_articles)
 
+    def test_select_articles_location_after_update(self):
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        conn.cursor().execute('UPDATE article SET lat = 18.2, long = -66.8 WHERE article_id = 5')
+        conn.cursor().execute('UPDATE article SET lat = NULL, long = NULL WHERE article_id = 1')
+        conn.commit()
+        conn.close()
+        exp_articles = [(5, 'e')]
+        act_articles = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS).select_articles_location('00601')
+        self.assertEqual(exp_articles, act_articles)
+
+    def test_select_tunit_location_after_update_tunit(self):
+        t_unit = TUnit('sentence_e', 5, 'url', 1234, None, 18.2, -66.8, 0, 0, 0)
+        DBConn(TestDBConn.DB_FILENAME).update_tunit(t_unit)
+        act_t_unit_list = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS).select_tunit_location('00601')
+        self.assertEqual([1, t_unit.t_unit_id], [t.t_unit_id for t in act_t_unit_list])
+
+    def test_select_nearest_articles(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS)
+        act_articles = db_conn.select_nearest_articles('00601', 2)
+        self.assertEqual([(1, 'a')], [row[:2] for row in act_articles])
+        act_articles = db_conn.select_nearest_articles('00601', 2, max_radius=20000)
+        self.assertEqual([(1, 'a'), (2, 'b')], [row[:2] for row in act_articles])
+        self.assertLess(act_articles[0][2], act_articles[1][2])
+        self.assertEqual([], db_conn.select_nearest_articles('25974', 2))
+
+    def test_select_articles_location_is_cached(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS)
+        self.assertEqual([(1, 'a')], db_conn.select_articles_location('00601'))
+        conn = sqlite3.connect(TestDBConn.DB_FILENAME)
+        conn.cursor().execute('UPDATE article SET lat = 18.2, long = -66.8 WHERE article_id = 5')
+        conn.commit()
+        conn.close()
+        self.assertEqual([(1, 'a')], db_conn.select_articles_location('00601'))
+        db_conn.invalidate_location_cache('00601')
+        self.assertEqual([(1, 'a'), (5, 'e')], db_conn.select_articles_location('00601'))
+
+    def test_insert_articles_invalidates_location_cache(self):
+        db_conn = DBConn(TestDBConn.DB_FILENAME, TestDBConn.SEARCH_RADIUS)
+        self.assertEqual([(1, 'a')], db_conn.select_articles_location('00601'))
+        article_id, = db_conn.insert_articles([('m', 18.2, -66.8)])
+        self.assertEqual([(1, 'a'), (article_id, 'm')], db_conn.select_articles_location('00601'))
+
     def test_select_articles_location_does_not_exist(self):
         exp_articles = []
         act_articles = DBConn(TestDBConn.DB_FILENAME).select_articles_location('25974')
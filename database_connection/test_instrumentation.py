@@ -0,0 +1,117 @@
+import sqlite3
+import unittest
+from os import remove, path
+
+import __init__
+from database_connection.cache import clear_shared_caches
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn, DBUser
+from database_connection.instrumentation import disable_instrumentation, enable_instrumentation, get_instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    DB_FILENAME = 'test_instrumentation.db'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+    DATA_FILENAME = 'test_sql/test_data.sql'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Runs before the first test
+        """
+        if path.exists(cls.DB_FILENAME):
+            remove(cls.DB_FILENAME)
+        test_db = sqlite3.connect(cls.DB_FILENAME)
+        for filename in [cls.SCHEMA_FILENAME, cls.DATA_FILENAME]:
+            with open(filename, 'r') as f:
+                test_db.cursor().executescript(f.read())
+        test_db.commit()
+        test_db.close()
+        cls.db_conn = DBConn(cls.DB_FILENAME)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Runs after the last test
+        """
+        close_all_pools()
+        remove(cls.DB_FILENAME)
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        get_instrumentation().reset()
+        enable_instrumentation(slow_query_ms=100)
+
+    def tearDown(self) -> None:
+        """
+        Runs after each test method
+        """
+        disable_instrumentation()
+        get_instrumentation().reset()
+        clear_shared_caches()
+
+    def test_method_stats(self):
+        self.db_conn.select_user('Jill')
+        self.db_conn.select_user('bum')
+        self.db_conn.select_article_categories(1)
+        stats = get_instrumentation().report()['methods']
+        self.assertEqual(['select_article_categories', 'select_user'], list(stats))
+        self.assertEqual(2, stats['select_user']['calls'])
+        self.assertEqual(1, stats['select_user']['rows'])
+        self.assertEqual(3, stats['select_article_categories']['rows'])
+        self.assertEqual(2, sum(stats['select_user']['histogram'].values()))
+
+    def test_errors_are_counted(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db_conn.insert_user(DBUser(username='Jill', email='jill@email.com'), 'pass')
+        self.assertEqual(1, get_instrumentation().report()['methods']['insert_user']['errors'])
+
+    def test_query_plan_is_captured(self):
+        self.db_conn.select_article_categories(1)
+        plans = get_instrumentation().report()['plans']
+        self.assertEqual(1, len(plans))
+        plan, = plans.values()
+        self.assertTrue(any(step.startswith('SEARCH') for step in plan))
+
+    def test_slow_log(self):
+        enable_instrumentation(slow_query_ms=0)
+        with self.assertLogs('database_connection.instrumentation', level='WARNING'):
+            self.db_conn.select_user('Jill')
+        slow_call, = get_instrumentation().report()['slow_log']
+        self.assertEqual('select_user', slow_call['method'])
+        self.assertEqual('(str[4])', slow_call['args'])
+        self.assertEqual(1, len(slow_call['statements']))
+        self.assertIn('FROM user', slow_call['statements'][0]['sql'])
+
+    def test_slow_log_leaves_out_argument_values(self):
+        enable_instrumentation(slow_query_ms=0)
+        with self.assertLogs('database_connection.instrumentation', level='WARNING') as logs:
+            self.db_conn.select_password('Jill')
+        self.assertNotIn('Jill', logs.output[0])
+        self.assertNotIn('Jill', repr(get_instrumentation().report()['slow_log']))
+
+    def test_single_row_result_counts_as_one_row(self):
+        get_instrumentation().record_call('select_weighted_random_article', (), 1.0, (1, 'Title', 0.5), False, [])
+        self.assertEqual(1, get_instrumentation().report()['methods']['select_weighted_random_article']['rows'])
+
+    def test_plans_are_capped(self):
+        instrumentation = get_instrumentation()
+        max_plans = instrumentation.max_plans
+        instrumentation.max_plans = 1
+        try:
+            self.db_conn.select_article_categories(1)
+            self.db_conn.select_user('Jill')
+            self.assertEqual(1, len(instrumentation.report()['plans']))
+        finally:
+            instrumentation.max_plans = max_plans
+
+    def test_disabled(self):
+        disable_instrumentation()
+        self.db_conn.select_user('Jill')
+        self.assertEqual({}, get_instrumentation().report()['methods'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import sqlite3
+import unittest
+from os import remove, path
+
+import __init__
+from database_connection.migrations import MIGRATIONS, _add_spatial_index, migrate, schema_version
+
+
+class TestMigrations(unittest.TestCase):
+    DB_FILENAME = 'test_migrations.db'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+    DATA_FILENAME = 'test_sql/test_data.sql'
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        self.db = sqlite3.connect(self.DB_FILENAME)
+        for filename in [self.SCHEMA_FILENAME, self.DATA_FILENAME]:
+            with open(filename, 'r') as f:
+                self.db.cursor().executescript(f.read())
+        self.db.commit()
+
+    def tearDown(self) -> None:
+        """
+        Runs after each test method
+        """
+        self.db.close()
+        if path.exists(self.DB_FILENAME):
+            remove(self.DB_FILENAME)
+
+    def index_names(self) -> set:
+        return {row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+
+    def test_migrate(self):
+        self.assertEqual(0, schema_version(self.db))
+        self.assertEqual(len(MIGRATIONS), migrate(self.db))
+        self.assertEqual(len(MIGRATIONS), schema_version(self.db))
+        self.assertTrue({'article_category_category_id_index', 't_unit_article_id_index', 'location_zip_index',
+                         'category_name_lookup_index'}.issubset(self.index_names()))
+        plan = self.db.execute('EXPLAIN QUERY PLAN SELECT article_id FROM article_category WHERE category_id = 1;')
+        self.assertIn('article_category_category_id_index', ' '.join(row[-1] for row in plan))
+
+    def test_migrate_article_title_index(self):
+        self.assertEqual(3, migrate(self.db, 3))
+        self.assertNotIn('article_title_index', self.index_names())
+        migrate(self.db)
+        plan = self.db.execute("EXPLAIN QUERY PLAN SELECT article_id FROM article WHERE title = 'Temple University';")
+        self.assertIn('article_title_index', ' '.join(row[-1] for row in plan))
+
+    def test_existing_indexes_are_not_duplicated(self):
+        migrate(self.db)
+        # user.username is UNIQUE in the test schema, so it already has an index
+        self.assertNotIn('user_username_index', self.index_names())
+
+    def test_migrate_leaves_rows_unchanged(self):
+        tables = ['user', 'category', 'article', 'article_category', 't_unit', 'location']
+        exp_rows = [self.db.execute(f'SELECT * FROM "{table}" ORDER BY rowid;').fetchall() for table in tables]
+        migrate(self.db)
+        act_rows = [self.db.execute(f'SELECT * FROM "{table}" ORDER BY rowid;').fetchall() for table in tables]
+        self.assertEqual(exp_rows, act_rows)
+
+    def test_migrate_is_incremental(self):
+        self.assertEqual(1, migrate(self.db, 1))
+        self.assertIn('article_location_index', {row[0] for row in self.db.execute('SELECT name FROM sqlite_master;')})
+        self.assertNotIn('t_unit_article_id_index', self.index_names())
+        indexes = self.index_names()
+        self.assertEqual(len(MIGRATIONS), migrate(self.db))
+        self.assertEqual(len(MIGRATIONS), migrate(self.db))
+        self.assertTrue(indexes < self.index_names())
+
+    def test_migrate_empty_database(self):
+        empty_db = sqlite3.connect(':memory:')
+        self.assertEqual(len(MIGRATIONS), migrate(empty_db))
+        empty_db.close()
+
+    def test_migrate_database_with_spatial_index(self):
+        # as left by the spatial index being built before migrations were versioned
+        _add_spatial_index(self.db)
+        self.db.commit()
+        self.assertEqual(len(MIGRATIONS), migrate(self.db))
+        lat_longs = self.db.execute('SELECT COUNT(*) FROM article_location_index;').fetchone()[0]
+        self.assertEqual(self.db.execute('SELECT COUNT(*) FROM article WHERE lat IS NOT NULL;').fetchone()[0],
+                         lat_longs)
+
+
+if __name__ == '__main__':
+    unittest.main()
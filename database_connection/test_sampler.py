@@ -0,0 +1,71 @@
+import sqlite3
+import unittest
+
+from scipy.stats import chisquare
+
+import __init__
+from database_connection.sampler import ImportanceSampler, WeightedSampler
+
+
+class TestWeightedSampler(unittest.TestCase):
+
+    def test_draw_is_weighted(self):
+        sampler = WeightedSampler([10, 20, 30], [1, 2, 0])
+        observations = {10: 0, 20: 0}
+        for j in range(9000):
+            observations[sampler.draw()] += 1
+        act_chisq, p = chisquare([observations[10], observations[20]], [3000, 6000])
+        # NOTE: critical value for 1 degree of freedom and a P value of 0.001
+        self.assertLess(act_chisq, 10.83)
+
+    def test_draw_empty(self):
+        self.assertIsNone(WeightedSampler().draw())
+
+    def test_draw_all_zero_weights_is_uniform(self):
+        sampler = WeightedSampler([1, 2], [0, -1])
+        self.assertEqual({1, 2}, {sampler.draw() for j in range(1000)})
+
+    def test_update(self):
+        sampler = WeightedSampler([1, 2], [1, 1])
+        sampler.update({1: None, 2: 0, 3: 5})
+        self.assertNotIn(1, sampler)
+        self.assertEqual(2, len(sampler))
+        self.assertEqual(5, sampler.weight(3))
+        self.assertEqual({3}, {sampler.draw() for j in range(100)})
+
+
+class TestImportanceSampler(unittest.TestCase):
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        self.db = sqlite3.connect(':memory:')
+        with open(self.SCHEMA_FILENAME, 'r') as f:
+            self.db.executescript(f.read())
+        self.db.execute("INSERT INTO category (category_id, name, importance) VALUES (1, 'c', 1.0);")
+        self.db.execute("INSERT INTO article (article_id, title) VALUES (1, 'a');")
+        # article 2 was deleted but its category row was left behind
+        self.db.executemany('INSERT INTO article_category (article_id, category_id) VALUES (?, 1);', [(1,), (2,)])
+
+    def tearDown(self) -> None:
+        """
+        Runs after each test method
+        """
+        self.db.close()
+
+    def test_orphan_article_category_is_not_drawn(self):
+        sampler = ImportanceSampler()
+        self.assertEqual({(1, 1.0)}, {sampler.draw_article(self.db) for j in range(100)})
+
+    def test_refresh_skips_orphan_article_category(self):
+        sampler = ImportanceSampler()
+        sampler.draw_article(self.db)
+        sampler.refresh_articles(self.db, [1, 2])
+        self.assertNotIn(2, sampler.articles)
+        self.assertEqual(1, len(sampler.articles))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import sqlite3
+import time
+import unittest
+from configparser import ConfigParser
+from os import remove, path
+
+import __init__
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn
+from database_connection.storage import Checkpointer, StorageSettings
+
+
+class TestStorage(unittest.TestCase):
+    DB_FILENAME = 'test_storage.db'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        test_db = sqlite3.connect(self.DB_FILENAME)
+        with open(self.SCHEMA_FILENAME, 'r') as f:
+            test_db.cursor().executescript(f.read())
+        test_db.commit()
+        test_db.close()
+
+    def tearDown(self) -> None:
+        """
+        Runs after each test method
+        """
+        close_all_pools()
+        if path.exists(self.DB_FILENAME):
+            remove(self.DB_FILENAME)
+
+    def test_from_config(self):
+        config = ConfigParser()
+        config.read_string('[STORAGE]\nJournalMode = delete\nMmapSize = 0\n')
+        settings = StorageSettings.from_config(config)
+        self.assertEqual('DELETE', settings.journal_mode)
+        self.assertEqual(0, settings.mmap_size)
+        self.assertEqual(StorageSettings().synchronous, settings.synchronous)
+        self.assertEqual(StorageSettings(), StorageSettings.from_config(ConfigParser()))
+
+    def test_journal_mode_is_kept_unless_configured(self):
+        settings = StorageSettings.from_config(ConfigParser())
+        self.assertIsNone(settings.journal_mode)
+        db = sqlite3.connect(self.DB_FILENAME)
+        try:
+            settings.apply(db)
+            self.assertEqual('delete', db.execute('PRAGMA journal_mode;').fetchone()[0])
+            self.assertEqual(2, db.execute('PRAGMA synchronous;').fetchone()[0])
+        finally:
+            db.close()
+
+    def test_from_config_invalid(self):
+        config = ConfigParser()
+        config.read_string('[STORAGE]\nSynchronous = sometimes\n')
+        with self.assertRaises(ValueError):
+            StorageSettings.from_config(config)
+
+    def test_dbconn_applies_settings(self):
+        with DBConn(self.DB_FILENAME).pool.connection() as db:
+            self.assertEqual('wal', db.execute('PRAGMA journal_mode;').fetchone()[0])
+            self.assertEqual(1, db.execute('PRAGMA synchronous;').fetchone()[0])
+            self.assertEqual(StorageSettings().cache_size, db.execute('PRAGMA cache_size;').fetchone()[0])
+
+    def test_checkpoint(self):
+        db_conn = DBConn(self.DB_FILENAME)
+        db_conn.insert_articles([(f'article_{i}', None, None) for i in range(100)])
+        busy, wal_pages, checkpointed_pages = Checkpointer(db_conn.db_filename).checkpoint('TRUNCATE')
+        self.assertEqual(0, busy)
+        self.assertEqual(0, wal_pages)
+        self.assertEqual(0, checkpointed_pages)
+        self.assertEqual(0, path.getsize(db_conn.db_filename + '-wal'))
+
+    def test_checkpoint_does_not_create_database(self):
+        remove(self.DB_FILENAME)
+        with self.assertRaises(sqlite3.OperationalError):
+            Checkpointer(self.DB_FILENAME).checkpoint()
+        self.assertFalse(path.exists(self.DB_FILENAME))
+
+    def test_checkpoint_failure_is_logged(self):
+        with open(self.DB_FILENAME, 'w') as f:
+            f.write('not a database' * 100)
+        checkpointer = Checkpointer(self.DB_FILENAME, interval=0.01)
+        with self.assertLogs('database_connection.storage', level='ERROR') as logs:
+            checkpointer.start()
+            time.sleep(0.1)
+            checkpointer.stop()
+        self.assertIn('could not checkpoint', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
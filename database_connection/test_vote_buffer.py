@@ -0,0 +1,126 @@
+import sqlite3
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import remove, path
+from unittest import mock
+
+import __init__
+from database_connection.connection_pool import close_all_pools
+from database_connection.dbconn import DBConn
+from database_connection.vote_buffer import RankVoteBuffer
+from trivia_generator.TUnit import TUnit
+
+
+class TestRankVoteBuffer(unittest.TestCase):
+    DB_FILENAME = 'test_vote_buffer.db'
+    SCHEMA_FILENAME = 'test_sql/test_schema.sql'
+    DATA_FILENAME = 'test_sql/test_data.sql'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Runs before the first test
+        """
+        if path.exists(cls.DB_FILENAME):
+            remove(cls.DB_FILENAME)
+        test_db = sqlite3.connect(cls.DB_FILENAME)
+        for filename in [cls.SCHEMA_FILENAME, cls.DATA_FILENAME]:
+            with open(filename, 'r') as f:
+                test_db.cursor().executescript(f.read())
+        test_db.commit()
+        test_db.close()
+        cls.db_conn = DBConn(cls.DB_FILENAME)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Runs after the last test
+        """
+        close_all_pools()
+        remove(cls.DB_FILENAME)
+
+    def select_ranks(self, t_unit_id: int) -> tuple:
+        conn = sqlite3.connect(self.DB_FILENAME)
+        row = conn.cursor().execute('SELECT num_likes, num_mehs, num_dislikes FROM t_unit WHERE t_unit_Id = ?;',
+                                    (t_unit_id,)).fetchone()
+        conn.close()
+        return row
+
+    def test_votes_are_written_on_flush(self):
+        t_unit = TUnit('sentence_v', 1, 'url', 1234, None, 10, 10, 0, 0, 0)
+        buffer = RankVoteBuffer(self.db_conn)
+        self.assertTrue(buffer.add_vote(t_unit, 'like'))
+        self.assertTrue(buffer.add_vote(t_unit, 'like'))
+        self.assertTrue(buffer.add_vote(t_unit, 'dislike'))
+        self.assertFalse(buffer.add_vote(t_unit, 'love'))
+        # the new TUnit is inserted at the flush, not when it is voted on
+        self.assertIsNone(t_unit.t_unit_id)
+        self.assertEqual(1, buffer.flush())
+        self.assertEqual((2, 0, 1), self.select_ranks(t_unit.t_unit_id))
+        buffer.add_vote(t_unit, 'meh')
+        self.assertEqual({t_unit.t_unit_id: (0, 1, 0)}, buffer.pending())
+        self.assertEqual(1, buffer.flush())
+        self.assertEqual((2, 1, 1), self.select_ranks(t_unit.t_unit_id))
+        self.assertEqual({}, buffer.pending())
+        self.assertEqual(0, buffer.flush())
+
+    def test_add_vote_does_not_write(self):
+        buffer = RankVoteBuffer(self.db_conn)
+        with mock.patch.object(self.db_conn, 'update_tunit') as update_tunit, \
+                mock.patch.object(self.db_conn, 'insert_tunits') as insert_tunits:
+            buffer.add_vote(TUnit('sentence_z', 1, 'url', 1234, None, 10, 10, 0, 0, 0), 'like')
+        update_tunit.assert_not_called()
+        insert_tunits.assert_not_called()
+
+    def test_concurrent_votes_are_not_lost(self):
+        t_unit = TUnit('sentence_w', 1, 'url', 1234, None, 10, 10, 0, 0, 0)
+        buffer = RankVoteBuffer(self.db_conn)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: buffer.add_vote(t_unit, ('like', 'meh', 'dislike')[i % 3]), range(300)))
+        buffer.flush()
+        self.assertEqual((100, 100, 100), self.select_ranks(t_unit.t_unit_id))
+
+    def test_failed_flush_keeps_votes(self):
+        t_unit = TUnit('sentence_x', 1, 'url', 1234, None, 10, 10, 0, 0, 0)
+        buffer = RankVoteBuffer(self.db_conn)
+        buffer.add_vote(t_unit, 'meh')
+        with mock.patch.object(self.db_conn, 'increment_tunit_ranks', side_effect=sqlite3.OperationalError):
+            with self.assertRaises(sqlite3.OperationalError):
+                buffer.flush()
+        buffer.add_vote(t_unit, 'meh')
+        self.assertEqual({t_unit.t_unit_id: (0, 2, 0)}, buffer.pending())
+
+    def test_failed_insert_keeps_votes(self):
+        t_unit = TUnit('sentence_u', 1, 'url', 1234, None, 10, 10, 0, 0, 0)
+        buffer = RankVoteBuffer(self.db_conn)
+        buffer.add_vote(t_unit, 'dislike')
+        with mock.patch.object(self.db_conn, 'insert_tunits', side_effect=sqlite3.OperationalError):
+            with self.assertRaises(sqlite3.OperationalError):
+                buffer.flush()
+        self.assertIsNone(t_unit.t_unit_id)
+        buffer.add_vote(t_unit, 'dislike')
+        buffer.flush()
+        self.assertEqual((0, 0, 2), self.select_ranks(t_unit.t_unit_id))
+
+    def test_stop_flushes_pending_votes(self):
+        t_unit = TUnit('sentence_y', 1, 'url', 1234, None, 10, 10, 0, 0, 0)
+        buffer = RankVoteBuffer(self.db_conn, flush_interval=60)
+        buffer.start()
+        buffer.add_vote(t_unit, 'like')
+        buffer.stop()
+        self.assertEqual((1, 0, 0), self.select_ranks(t_unit.t_unit_id))
+
+    def test_background_flush_failure_is_logged(self):
+        buffer = RankVoteBuffer(self.db_conn, flush_interval=0.01)
+        buffer.add_vote(TUnit('sentence_t', 1, 'url', 1234, 1, 10, 10, 0, 0, 0), 'like')
+        with mock.patch.object(self.db_conn, 'increment_tunit_ranks', side_effect=sqlite3.OperationalError), \
+                self.assertLogs('database_connection.vote_buffer', level='ERROR') as logs:
+            buffer.start()
+            time.sleep(0.1)
+        buffer.stop()
+        self.assertIn('Traceback', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
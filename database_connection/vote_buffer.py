@@ -0,0 +1,148 @@
+"""
+Vote Buffer
+===========
+
+Write-behind aggregation of the like/meh/dislike votes cast on TUnits.
+"""
+import atexit
+import logging
+import threading
+
+from database_connection.dbconn import DBConn, get_db_conn
+from trivia_generator.TUnit import TUnit
+
+logger = logging.getLogger(__name__)
+
+RANKS = ('like', 'meh', 'dislike')
+
+
+class RankVoteBuffer:
+    """Collects TUnit rank votes in memory and periodically writes them to the database as relative increments.
+
+    Concurrent voters only add to per-TUnit counters, so no vote is lost, and a flush costs a single transaction
+    however many votes it carries, plus one more if it also inserts TUnits that were not in the database yet.
+
+    :param db_conn: the DBConn to write votes to (default: the process-wide DBConn).
+    :type db_conn: DBConn
+    :param flush_interval: the number of seconds between flushes once started.
+    :type flush_interval: float
+    """
+
+    def __init__(self, db_conn: DBConn = None, flush_interval: float = 5.0):
+        self.db_conn = get_db_conn() if db_conn is None else db_conn
+        self.flush_interval = flush_interval
+        self._deltas = dict()
+        # votes on TUnits without a t_unit_id, keyed by id() of the TUnit object: (TUnit, [likes, mehs, dislikes])
+        self._unsaved = dict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_vote(self, t_unit: TUnit, rank: str) -> bool:
+        """Records a vote on a TUnit, to be written at the next flush.
+
+        A TUnit that is not in the database yet is inserted at the next flush, which sets its t_unit_id.
+
+        :param t_unit: the TUnit that was ranked.
+        :type t_unit: TUnit
+        :param rank: one of 'like', 'meh' or 'dislike'.
+        :type rank: str
+        :returns: True if the vote was recorded, False if the rank is not valid.
+        """
+        if rank not in RANKS:
+            return False
+        with self._lock:
+            if t_unit.t_unit_id is None:
+                delta = self._unsaved.setdefault(id(t_unit), (t_unit, [0, 0, 0]))[1]
+            else:
+                delta = self._deltas.setdefault(t_unit.t_unit_id, [0, 0, 0])
+            delta[RANKS.index(rank)] += 1
+        return True
+
+    def pending(self) -> dict:
+        """Gets a copy of the votes that have not been written yet, on TUnits that are already in the database.
+
+        :returns: a mapping from t_unit_Id to its (likes, mehs, dislikes) increments.
+        """
+        with self._lock:
+            return {t_unit_id: tuple(delta) for t_unit_id, delta in self._deltas.items()}
+
+    def flush(self) -> int:
+        """Inserts the voted TUnits that are not in the database yet, then writes every pending vote in one
+        transaction.
+
+        If a write fails, the votes are kept for the next flush.
+
+        :returns: the number of TUnits updated.
+        """
+        with self._lock:
+            deltas, self._deltas = self._deltas, dict()
+            unsaved, self._unsaved = self._unsaved, dict()
+        # A TUnit voted on again while an earlier flush was inserting it has a t_unit_id by now.
+        for t_unit, delta in list(unsaved.values()):
+            if t_unit.t_unit_id is not None:
+                self._merge(deltas.setdefault(t_unit.t_unit_id, [0, 0, 0]), delta)
+                del unsaved[id(t_unit)]
+        if not deltas and not unsaved:
+            return 0
+        try:
+            if unsaved:
+                self.db_conn.insert_tunits([t_unit for t_unit, _ in unsaved.values()])
+                for t_unit, delta in unsaved.values():
+                    self._merge(deltas.setdefault(t_unit.t_unit_id, [0, 0, 0]), delta)
+                unsaved = dict()
+            self.db_conn.increment_tunit_ranks(deltas)
+        except Exception:
+            with self._lock:
+                for t_unit_id, delta in deltas.items():
+                    self._merge(self._deltas.setdefault(t_unit_id, [0, 0, 0]), delta)
+                for key, (t_unit, delta) in unsaved.items():
+                    self._merge(self._unsaved.setdefault(key, (t_unit, [0, 0, 0]))[1], delta)
+            raise
+        return len(deltas)
+
+    @staticmethod
+    def _merge(pending: list, delta: list):
+        """Adds the (likes, mehs, dislikes) of *delta* to *pending* in place."""
+        for i in range(len(RANKS)):
+            pending[i] += delta[i]
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('could not flush rank votes')
+
+    def start(self):
+        """Starts flushing in the background every *flush_interval* seconds."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rank-vote-flush', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background flushes and writes the votes still pending."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+rank_vote_buffer = None
+_rank_vote_buffer_lock = threading.Lock()
+
+
+def get_rank_vote_buffer() -> RankVoteBuffer:
+    """Gets the process-wide vote buffer, started and flushed at exit.
+
+    :returns: the shared RankVoteBuffer.
+    :rtype: RankVoteBuffer
+    """
+    global rank_vote_buffer
+    with _rank_vote_buffer_lock:
+        if rank_vote_buffer is None:
+            rank_vote_buffer = RankVoteBuffer()
+            rank_vote_buffer.start()
+            atexit.register(rank_vote_buffer.stop)
+        return rank_vote_buffer
@@ -10,7 +10,7 @@ sys.path.append(top_level_dir)
 
 from trivia_generator.web_scraper.WebScraper import get_page_by_random
 from trivia_generator.NLPPreProcessor import create_TUnits
-from database_connection.dbconn import DBConn
+from database_connection.vote_buffer import get_rank_vote_buffer
 
 
 app = Flask(__name__)
@@ -18,8 +18,6 @@ socketio = SocketIO(app)
 
 tunit_dictionary = dict()
 
-dbconn = DBConn()
-
 
 @app.route('/')
 @app.route('/index')
@@ -31,16 +29,9 @@ def index():
 def update_rank(rank):
     try:
         tunit = tunit_dictionary[request.sid]
-        if rank == 'like':
-            tunit.num_likes += 1
-        elif rank == 'dislike':
-            tunit.num_dislikes += 1
-        elif rank == 'meh':
-            tunit.num_mehs += 1
-        else:
+        # votes are aggregated in memory and written to the database in batches
+        if not get_rank_vote_buffer().add_vote(tunit, rank):
             print("invalid rank submitted")
-        # update tunit in database
-        dbconn.update_tunit(tunit)
     except KeyError:
         print("could not find SID")
 
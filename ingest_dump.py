@@ -0,0 +1,178 @@
+"""
+Ingest Dump
+===========
+
+Fills the ``t_unit`` table from a Wikipedia ``pages-articles`` XML dump, instead of scraping the pages one at a time.
+
+The dump is streamed and decompressed on the fly, keeping only the page being read in memory. Pages whose titles
+match an ``article`` row that has no TUnits yet are sent in batches to a pool of worker processes. The workers clean
+the wikitext and run ``create_TUnits``, and the TUnits are written with ``insert_tunits`` as batches complete. Only a
+bounded number of batches is in flight at once, so memory use does not grow with the size of the dump. Articles that
+already have TUnits are skipped, so an interrupted run picks up where it stopped when run again.
+
+Usage: ``python ingest_dump.py enwiki-latest-pages-articles.xml.bz2 [--db FILE] [--workers N]``
+"""
+import argparse
+import bz2
+import json
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Iterator
+
+from database_connection.dbconn import DBConn
+from database_connection.migrations import migrate
+from trivia_generator.web_scraper.WikitextExtractor import extract_coordinates, extract_paragraphs
+
+BATCH_SIZE = 50
+PROGRESS_INTERVAL = 10.0
+BASE_URL = 'https://en.wikipedia.org/wiki/'
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_dump_pages(filename: str) -> Iterator[tuple]:
+    """Streams the articles of a ``pages-articles`` XML dump, skipping redirects and pages outside the main namespace.
+
+    :param filename: the path of the dump, compressed with bzip2 if it ends in ``.bz2``.
+    :returns: an iterator over the title, revision Unix timestamp and wikitext of each article.
+    """
+    opener = bz2.open if filename.endswith('.bz2') else open
+    with opener(filename, 'rb') as f:
+        root = None
+        for event, element in ElementTree.iterparse(f, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event != 'end' or _local_name(element.tag) != 'page':
+                continue
+            fields = {_local_name(child.tag): child for child in element.iter()}
+            if fields.get('ns') is not None and fields['ns'].text == '0' and 'redirect' not in fields \
+                    and fields.get('text') is not None and fields['text'].text:
+                timestamp = fields.get('timestamp')
+                access_timestamp = int(datetime.strptime(timestamp.text, '%Y-%m-%dT%H:%M:%SZ')
+                                       .replace(tzinfo=timezone.utc).timestamp()) \
+                    if timestamp is not None else int(time.time())
+                yield fields['title'].text, access_timestamp, fields['text'].text
+            # Drop the pages read so far, so that the tree never holds more than one.
+            root.clear()
+
+
+def match_articles(db: sqlite3.Connection, pages: list) -> list:
+    """Finds the article rows of a batch of dump pages, leaving out the articles that already have TUnits.
+
+    Titles are matched whether the article table spells them with spaces or underscores.
+
+    :param db: a connection to the trivia database.
+    :param pages: the title, timestamp and wikitext of each page.
+    :returns: the article id, title, timestamp and wikitext of each matched page.
+    """
+    by_title = {title: (access_timestamp, wikitext) for title, access_timestamp, wikitext in pages}
+    spellings = {spelling: title for title in by_title for spelling in (title, title.replace(' ', '_'))}
+    rows = db.execute('''
+                      SELECT article_id, title
+                      FROM article
+                      WHERE title IN (SELECT value FROM json_each(?))
+                          AND NOT EXISTS (SELECT 1 FROM t_unit WHERE t_unit.article_id = article.article_id);
+                      ''', (json.dumps(list(spellings)),)).fetchall()
+    matched = []
+    for article_id, spelling in rows:
+        title = spellings[spelling]
+        access_timestamp, wikitext = by_title[title]
+        matched.append((article_id, title, access_timestamp, wikitext))
+    return matched
+
+
+def _create_tunits(batch: list) -> list:
+    """Runs in a worker process: cleans the wikitext of each page of a batch and creates its TUnits."""
+    # Imported here so that only the worker processes load the NLP models.
+    from nlp_helpers import features
+    from trivia_generator.NLPPreProcessor import create_TUnits
+    from trivia_generator.web_scraper.Article import Article
+    from trivia_generator.web_scraper.HTMLExtractor import preprocess_text
+
+    t_units = []
+    for article_id, title, access_timestamp, wikitext in batch:
+        content = preprocess_text(extract_paragraphs(wikitext))
+        if not content:
+            continue
+        content = features.resolve_coreferences(content)
+        latitude, longitude = extract_coordinates(wikitext)
+        article = Article(content, BASE_URL + title.replace(' ', '_'), article_id, [], -1, access_timestamp,
+                          latitude, longitude)
+        t_units.extend(create_TUnits(article))
+    return t_units
+
+
+def _batches(pages: Iterator[tuple], db: sqlite3.Connection, batch_size: int) -> Iterator[list]:
+    """Groups dump pages into batches of up to *batch_size* pages that match articles without TUnits."""
+    pages_read = []
+    matched = []
+    for page in pages:
+        pages_read.append(page)
+        if len(pages_read) >= 10 * batch_size:
+            matched += match_articles(db, pages_read)
+            pages_read = []
+        while len(matched) >= batch_size:
+            yield matched[:batch_size]
+            matched = matched[batch_size:]
+    matched += match_articles(db, pages_read)
+    for start in range(0, len(matched), batch_size):
+        yield matched[start:start + batch_size]
+
+
+def ingest_dump(dump_filename: str, db_filename: str = None, workers: int = None,
+                batch_size: int = BATCH_SIZE, max_in_flight: int = None) -> int:
+    """Creates the TUnits of every article of the database that is in a dump and has no TUnits yet.
+
+    :param dump_filename: the path of the ``pages-articles`` XML dump.
+    :param db_filename: the database to write into (default: the one in ``db.ini``).
+    :param workers: the number of worker processes (default: one per CPU).
+    :param batch_size: the number of pages sent to a worker at a time.
+    :param max_in_flight: the largest number of batches queued or running at once (default: twice the workers).
+    :returns: the number of TUnits written.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    db_conn = DBConn(os.path.abspath(db_filename) if db_filename is not None else None)
+    db = sqlite3.connect(db_conn.db_filename)
+    migrate(db)
+    written = 0
+    articles = 0
+    start_time = last_report = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            batches = _batches(iter_dump_pages(dump_filename), db, batch_size)
+            for batch in batches:
+                pending.add(executor.submit(_create_tunits, batch))
+                articles += len(batch)
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written += sum(len(db_conn.insert_tunits(future.result())) for future in done)
+                now = time.time()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    print(f'[{dump_filename}] {articles} articles queued, {written} TUnits written '
+                          f'({articles / (now - start_time):.1f} articles/s)')
+                    last_report = now
+            for future in pending:
+                written += len(db_conn.insert_tunits(future.result()))
+    finally:
+        db.close()
+    print(f'[{dump_filename}] {articles} articles, {written} TUnits written in {time.time() - start_time:.0f} s')
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dump', help='the pages-articles XML dump, optionally compressed with bzip2')
+    parser.add_argument('--db', default=None, help='the database file to write into (default: the one in db.ini)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='pages sent to a worker at a time')
+    args = parser.parse_args()
+
+    ingest_dump(args.dump, args.db, args.workers, args.batch_size)
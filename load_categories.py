@@ -1,68 +1,212 @@
+"""
+Load Categories
+===============
+
+Bulk loads ``ranked-categories.tsv`` and ``page2cat.tsv`` into the trivia database.
+
+Both files are streamed and written in large transactions. Each transaction also records how far into the file it
+got, so an interrupted load picks up where it stopped when run again. Secondary indexes on the loaded tables are
+dropped for the duration of the load and rebuilt once at the end.
+
+Usage: ``python load_categories.py [--categories] [--articles] [--db itdb.db]``
+"""
+import argparse
 import sqlite3
+import time
 
-def insert_categories():
-    db = sqlite3.connect('itdb.db')
+from database_connection.category_index import drop_category_index, ensure_category_index
 
-    i = 0
-    with open('ranked-categories.tsv', 'r') as f:
-        for line in f.read().splitlines():
-            i += 1
-            try:
-                category_name, importance = line.split('\t')
-                if importance == '-Infinity':
-                    importance = -1.0
-                else:
-                    importance = float(importance)
-            except Exception as e:
-                print(e)
-                continue
+BATCH_SIZE = 50000
+PROGRESS_INTERVAL = 10.0
+LOADED_TABLES = ('article', 'category', 'article_category')
+
+PROGRESS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS load_progress (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL,
+    line_number INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS load_deferred_index (
+    name TEXT PRIMARY KEY,
+    sql TEXT NOT NULL
+);
+"""
+
+
+def _read_progress(db: sqlite3.Connection, source: str) -> tuple:
+    row = db.execute('SELECT byte_offset, line_number FROM load_progress WHERE source = ?;', [source]).fetchone()
+    return row if row is not None else (0, 0)
+
+
+def _save_progress(db: sqlite3.Connection, source: str, byte_offset: int, line_number: int):
+    db.execute('REPLACE INTO load_progress (source, byte_offset, line_number) VALUES (?, ?, ?);',
+               [source, byte_offset, line_number])
+
+
+def _defer_indexes(db: sqlite3.Connection):
+    """Drops the secondary indexes of the loaded tables, remembering them in the database so that they are rebuilt
+    even if the load is interrupted and resumed."""
+    placeholders = ','.join('?' * len(LOADED_TABLES))
+    rows = db.execute(f"""SELECT name, sql FROM sqlite_master
+                          WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders});""",
+                      LOADED_TABLES).fetchall()
+    db.executemany('INSERT OR IGNORE INTO load_deferred_index (name, sql) VALUES (?, ?);', rows)
+    for name, sql in rows:
+        db.execute(f'DROP INDEX IF EXISTS "{name}";')
+    db.commit()
+    drop_category_index(db)
+
+
+def _restore_indexes(db: sqlite3.Connection):
+    """Rebuilds the indexes dropped by ``_defer_indexes``."""
+    print('Rebuilding indexes...')
+    for name, sql in db.execute('SELECT name, sql FROM load_deferred_index;').fetchall():
+        if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?;", [name]).fetchone() is None:
+            db.execute(sql)
+        db.execute('DELETE FROM load_deferred_index WHERE name = ?;', [name])
+    db.commit()
+    ensure_category_index(db)
+
+
+def _stream_lines(filename: str, byte_offset: int):
+    """Yields each line of a file after *byte_offset*, along with the byte offset just past it."""
+    with open(filename, 'rb') as f:
+        f.seek(byte_offset)
+        for raw_line in f:
+            byte_offset += len(raw_line)
+            yield raw_line.decode('utf-8').rstrip('\r\n'), byte_offset
 
-            try:
-                print(f'[Row {i}] Inserting {category_name}...')
-                cursor = db.cursor()
-                cursor.execute('''INSERT INTO category(name, importance) VALUES (?, ?);''', [category_name, importance])
-                # Commit the change
-                db.commit()
-            # Catch the exception
-            except Exception as e:
-                # Roll back any change if something goes wrong
-                db.rollback()
-                print(e)
-    db.close()
-
-def insert_articles():
-    db = sqlite3.connect('itdb.db')
-    i = 0
-    
-    with open('page2cat.tsv', 'r') as f:
-        for line in f.read().splitlines():
-            i += 1
-            try:
-                line_split = line.split('\t')
-                article_name, article_categories = line_split[0], line_split[1:]
-            except Exception as e:
-                print(e)
-                continue
 
+class _Progress:
+    """Prints how far a load has got, at most once every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, source: str, line_number: int):
+        self.source = source
+        self.start_line = line_number
+        self.start_time = time.time()
+        self.last_report = self.start_time
+
+    def report(self, line_number: int, force: bool = False):
+        now = time.time()
+        if force or now - self.last_report >= PROGRESS_INTERVAL:
+            rate = (line_number - self.start_line) / max(now - self.start_time, 1e-9)
+            print(f'[{self.source}] {line_number} rows loaded ({rate:.0f} rows/s)')
+            self.last_report = now
+
+
+def _parse_category(line: str):
+    category_name, importance = line.split('\t')
+    importance = -1.0 if importance == '-Infinity' else float(importance)
+    return category_name, importance
+
+
+def insert_categories(db_filename: str = 'itdb.db', filename: str = 'ranked-categories.tsv',
+                      batch_size: int = BATCH_SIZE):
+    """Loads category names and importance scores from a TSV file.
+
+    :param db_filename: the database to load into.
+    :param filename: a TSV file of category names and importance scores.
+    :param batch_size: the number of rows written per transaction.
+    """
+    db = sqlite3.connect(db_filename)
+    try:
+        db.executescript(PROGRESS_SCHEMA)
+        _defer_indexes(db)
+        byte_offset, line_number = _read_progress(db, filename)
+        progress = _Progress(filename, line_number)
+
+        batch = []
+        for line, next_offset in _stream_lines(filename, byte_offset):
+            line_number += 1
             try:
-                print(f'[Row {i}] Inserting {article_name}...')
-                cursor = db.cursor()
-                cursor.execute('''INSERT INTO article(title) VALUES (?);''', [article_name])
-                cursor.execute('''SELECT article_id FROM article WHERE title = ?;''', [article_name])
-                article_id = cursor.fetchone()[0]
-                for category in article_categories:
-                    cursor.execute('''SELECT category_id FROM category WHERE name = ?;''', [category])
-                    category_id = cursor.fetchone()
-                    if category_id is not None:
-                        cursor.execute('''INSERT INTO article_category(article_id, category_id) VALUES (?, ?);''', [article_id, category_id[0]])
+                batch.append(_parse_category(line))
+            except ValueError as e:
+                print(f'[Row {line_number}] {e}')
+            if len(batch) >= batch_size:
+                db.executemany('INSERT INTO category (name, importance) VALUES (?, ?);', batch)
+                _save_progress(db, filename, next_offset, line_number)
                 db.commit()
-            # Catch the exception
-            except Exception as e:
-                # Roll back any change if something goes wrong
-                db.rollback()
-                print(e)
-    
-    db.close()
+                batch = []
+                progress.report(line_number)
+            byte_offset = next_offset
+        db.executemany('INSERT INTO category (name, importance) VALUES (?, ?);', batch)
+        _save_progress(db, filename, byte_offset, line_number)
+        db.commit()
+        progress.report(line_number, force=True)
+
+        _restore_indexes(db)
+    finally:
+        db.close()
+
+
+def insert_articles(db_filename: str = 'itdb.db', filename: str = 'page2cat.tsv', batch_size: int = BATCH_SIZE):
+    """Loads article titles and their categories from a TSV file.
+
+    Category names are resolved through an in-memory map of the category table, so categories must be loaded first.
+    Names that are not in the category table are skipped.
+
+    :param db_filename: the database to load into.
+    :param filename: a TSV file with an article title followed by its category names on each line.
+    :param batch_size: the number of articles written per transaction.
+    """
+    db = sqlite3.connect(db_filename)
+    try:
+        db.executescript(PROGRESS_SCHEMA)
+        _defer_indexes(db)
+        byte_offset, line_number = _read_progress(db, filename)
+        progress = _Progress(filename, line_number)
+        # A name that appears more than once maps to its first category, as it did when each name was looked up.
+        category_ids = dict()
+        for name, category_id in db.execute('SELECT name, category_id FROM category ORDER BY category_id;'):
+            category_ids.setdefault(name, category_id)
+
+        def write_batch(titles: list, categories: list, end_offset: int):
+            db.execute('BEGIN IMMEDIATE;')
+            db.executemany('INSERT INTO article (title) VALUES (?);', [[title] for title in titles])
+            # The write lock is held, so the new article ids are consecutive and end at last_insert_rowid().
+            last_id = db.execute('SELECT last_insert_rowid();').fetchone()[0]
+            first_id = last_id - len(titles) + 1
+            db.executemany('INSERT OR IGNORE INTO article_category (article_id, category_id) VALUES (?, ?);',
+                           [(first_id + i, category_id)
+                            for i, article_categories in enumerate(categories)
+                            for category_id in article_categories])
+            _save_progress(db, filename, end_offset, line_number)
+            db.commit()
+
+        titles = []
+        categories = []
+        for line, next_offset in _stream_lines(filename, byte_offset):
+            line_number += 1
+            line_split = line.split('\t')
+            if line_split[0] == '':
+                print(f'[Row {line_number}] missing article title')
+            else:
+                titles.append(line_split[0])
+                categories.append({category_ids[category] for category in line_split[1:] if category in category_ids})
+            if len(titles) >= batch_size:
+                write_batch(titles, categories, next_offset)
+                titles = []
+                categories = []
+                progress.report(line_number)
+            byte_offset = next_offset
+        write_batch(titles, categories, byte_offset)
+        progress.report(line_number, force=True)
+
+        _restore_indexes(db)
+    finally:
+        db.close()
+
 
 if __name__ == '__main__':
-    insert_articles()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='itdb.db', help='the database file to load into')
+    parser.add_argument('--categories', action='store_true', help='load ranked-categories.tsv')
+    parser.add_argument('--articles', action='store_true', help='load page2cat.tsv (default)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows written per transaction')
+    args = parser.parse_args()
+
+    if args.categories:
+        insert_categories(args.db, batch_size=args.batch_size)
+    if args.articles or not args.categories:
+        insert_articles(args.db, batch_size=args.batch_size)
@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from trivia_generator.web_scraper.GeoSearchCache import GeoSearchCache, MAX_RADIUS, distance
+from trivia_generator.web_scraper.HTTPClient import HTTPClient
+
+# A stand-in for the geosearch API over a few places in Philadelphia.
+PLACES = [
+    ('Liberty Bell', 39.9496, -75.1503),
+    ('Independence Hall', 39.9489, -75.1500),
+    ('Temple University', 39.9812, -75.1554),
+    ('Philadelphia Museum of Art', 39.9656, -75.1810),
+]
+queries = []
+failing = threading.Event()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        queries.append(params)
+        if failing.is_set():
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        lat, lon = map(float, params['gscoord'].split('|'))
+        radius = int(params['gsradius'])
+        results = sorted((distance(lat, lon, place_lat, place_lon), title, place_lat, place_lon)
+                         for title, place_lat, place_lon in PLACES)
+        body = json.dumps({'query': {'geosearch': [{'title': title, 'lat': place_lat, 'lon': place_lon,
+                                                    'dist': dist}
+                                                   for dist, title, place_lat, place_lon in results
+                                                   if dist <= radius]}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def api_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/w/api.php'
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def reset_server():
+    queries.clear()
+    failing.clear()
+
+
+def test_nearby_points_share_a_search(api_url):
+    cache = GeoSearchCache(api_url=api_url)
+    client = HTTPClient()
+    assert cache.search(39.9491, -75.1502, 500, client=client) == ['Independence_Hall', 'Liberty_Bell']
+    assert cache.search(39.9495, -75.1509, 500, client=client) == ['Liberty_Bell', 'Independence_Hall']
+    assert len(queries) == 1
+    assert cache.stats()['memory_hits'] == 1
+    # a different radius is a different search
+    assert cache.search(39.9495, -75.1509, 5000, client=client)[:2] == ['Liberty_Bell', 'Independence_Hall']
+    assert len(queries) == 2
+
+
+def test_results_are_limited_to_the_radius_of_the_point(api_url):
+    cache = GeoSearchCache(api_url=api_url, grid_degrees=0.1)
+    client = HTTPClient()
+    # Temple University is within 2 km of the second point but not the first, which share a cell.
+    assert cache.search(39.9496, -75.1503, 2000, client=client) == ['Liberty_Bell', 'Independence_Hall']
+    assert cache.search(39.9800, -75.1600, 2000, client=client) == ['Temple_University']
+    assert len(queries) == 1
+    centre_lat, centre_long, radius = cache.cell_search_area(cache.cell(39.9496, -75.1503), 2000)
+    assert int(queries[0]['gsradius']) == radius > 2000 + distance(centre_lat, centre_long, 39.9, -75.2)
+
+
+def test_search_radius_is_capped(api_url):
+    cache = GeoSearchCache(api_url=api_url)
+    assert cache.cell_search_area(cache.cell(39.98, -75.16), MAX_RADIUS)[2] == MAX_RADIUS
+
+
+def test_results_persist_on_disk(api_url, tmp_path):
+    client = HTTPClient()
+    cache = GeoSearchCache(str(tmp_path / 'geosearch.db'), api_url=api_url)
+    titles = cache.search(39.9496, -75.1503, 1000, client=client)
+    cache.close()
+
+    cache = GeoSearchCache(str(tmp_path / 'geosearch.db'), api_url=api_url)
+    assert cache.search(39.9496, -75.1503, 1000, client=client) == titles
+    assert len(queries) == 1
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_stale_results_are_searched_again_or_served_on_failure(api_url, tmp_path):
+    client = HTTPClient()
+    cache = GeoSearchCache(str(tmp_path / 'geosearch.db'), ttl=0, api_url=api_url)
+    titles = cache.search(39.9496, -75.1503, 1000, client=client)
+    assert cache.search(39.9496, -75.1503, 1000, client=client) == titles
+    assert len(queries) == 2
+
+    failing.set()
+    assert cache.search(39.9496, -75.1503, 1000, client=client) == titles
+    assert cache.stats()['stale_served'] == 1
+    assert cache.search(10.0, 10.0, 1000, client=client) is None
+
+
+def test_disk_entries_are_bounded(api_url, tmp_path):
+    cache = GeoSearchCache(str(tmp_path / 'geosearch.db'), max_entries=1, max_disk_entries=2, api_url=api_url)
+    client = HTTPClient()
+    for i in range(4):
+        cache.search(39.9496 + i * 0.1, -75.1503, 1000, client=client)
+    stats = cache.stats()
+    assert stats['memory_entries'] == 1
+    assert stats['disk_entries'] == 2
+
+
+def test_invalid_coordinates(api_url):
+    cache = GeoSearchCache(api_url=api_url)
+    assert cache.search(43927, 69420, 10000) is None
+    assert not queries
@@ -0,0 +1,45 @@
+from trivia_generator.web_scraper.HTMLExtractor import *
+
+PAGE_HTML = """<html><head><title>Liberty Bell - Wikipedia</title></head><body>
+<div id="mw-navigation"><p>Navigation that is not part of the article.</p></div>
+<div id="mw-content-text" class="mw-body-content"><div class="mw-parser-output">
+<span class="geo-dms"><span class="latitude">39&#176;56&#8242;58&#8243;N</span>
+<span class="longitude">75°09′01″W</span></span>
+<p>The <b>Liberty Bell</b> is in <a href="/wiki/Philadelphia">Philadelphia</a>.</p>
+<div class="navbox"><ul><li>Not a paragraph</li></ul></div>
+<p>Its formula is <span class="mwe-math-element" mwe-math-element="">x</span>.</p>
+<p>It was cast in London.</p>
+</div></div>
+<div class="printfooter"><p>Retrieved from Wikipedia</p></div>
+<div id="catlinks"><ul><li>Category</li></ul></div>
+</body></html>"""
+
+
+def test_extract_paragraphs():
+    assert extract_paragraphs(PAGE_HTML) == 'The Liberty Bell is in Philadelphia.\nIt was cast in London.\n'
+
+
+def test_extract_paragraphs_without_content_div():
+    assert extract_paragraphs('<p>One.</p><p>Two <i>and</i> three.</p>') == 'One.\nTwo and three.\n'
+    assert extract_paragraphs('<p>Unclosed.') == 'Unclosed.\n'
+
+
+def test_extract_coordinates():
+    assert extract_coordinates(PAGE_HTML) == ('39°56′58″N', '75°09′01″W')
+    assert extract_coordinates('<p>No coordinates.</p>') == (None, None)
+
+
+def test_preprocess_text():
+    original_expected_texts = [
+        (
+            'It was cast in 1752. It was recast in 1753.[citation needed] It cracked.[citation needed] It rang.[1]',
+            'It was cast in 1752. It rang.'
+        ),
+        (
+            '[citation needed] at the start. The bell (1752) rang.[note 1]',
+            ' at the start. The bell rang.'
+        )
+    ]
+
+    for original, expected in original_expected_texts:
+        assert preprocess_text(original) == expected
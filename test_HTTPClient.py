@@ -0,0 +1,83 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from trivia_generator.web_scraper.HTTPClient import HTTPClient, ResponseTooLarge
+from trivia_generator.web_scraper.RequestScheduler import RequestScheduler
+
+PAGE = b'<html><body>' + b'<p>Some trivia.</p>' * 100 + b'</body></html>'
+connections = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        connections.append(self.client_address)
+        super().setup()
+
+    def do_GET(self):
+        status = 404 if self.path == '/missing' else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_get(server_url):
+    response = HTTPClient().get(server_url + '/wiki/Trivia')
+    assert response.status_code == 200
+    assert response.content == PAGE
+    assert response.text == PAGE.decode('utf-8')
+
+
+def test_get_reuses_connection(server_url):
+    client = HTTPClient()
+    connections.clear()
+    for _ in range(5):
+        client.get(server_url + '/wiki/Trivia')
+    assert len(connections) == 1
+
+
+def test_get_http_error(server_url):
+    with pytest.raises(requests.HTTPError):
+        HTTPClient().get(server_url + '/missing')
+
+
+def test_get_too_large(server_url):
+    with pytest.raises(ResponseTooLarge):
+        HTTPClient(max_response_bytes=len(PAGE) - 1).get(server_url + '/wiki/Trivia')
+
+
+def test_get_too_large_is_not_overload(server_url):
+    scheduler = RequestScheduler(rate=1000, initial_concurrency=4)
+    with pytest.raises(ResponseTooLarge):
+        HTTPClient(max_response_bytes=len(PAGE) - 1, scheduler=scheduler).get(server_url + '/wiki/Trivia')
+    assert scheduler.limiter.limit >= 4
+    assert scheduler.stats()['retries'] == 0
+
+
+def test_scheduler_does_not_stack_on_adapter_retries():
+    assert HTTPClient().adapter.max_retries.connect == 2
+    assert HTTPClient(scheduler=RequestScheduler()).adapter.max_retries.connect == 0
+
+
+def test_from_config():
+    client = HTTPClient.from_config()
+    assert client.timeout == (3.05, 10.0)
+    assert client.max_response_bytes == 5242880
@@ -0,0 +1,126 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from trivia_generator.web_scraper.HTTPClient import HTTPClient
+from trivia_generator.web_scraper.PageCache import PageCache
+
+PAGE = '<html><body>' + '<p>Some trivia.</p>' * 100 + '</body></html>'
+ETAG = '"trivia-1"'
+requests_seen = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        requests_seen.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = PAGE.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.db'))
+    yield cache
+    cache.close()
+
+
+def test_put_get(cache):
+    cache.put('Temple University', PAGE, etag=ETAG)
+    page = cache.get('Temple_University')
+    assert page.html == PAGE
+    assert page.etag == ETAG
+    assert page.raw_size == len(PAGE)
+    assert cache.get('Drexel University') is None
+
+
+def test_put_shares_identical_pages(cache):
+    cache.put('Temple University', PAGE)
+    cache.put('Temple', PAGE)
+    stats = cache.stats()
+    assert stats['pages'] == 2
+    assert stats['size'] < len(PAGE)
+
+    cache.put('Temple', '<html></html>')
+    cache.put('Temple University', '<html></html>')
+    assert cache.stats()['size'] == cache._db.execute('SELECT SUM(size) FROM blob;').fetchone()[0]
+    assert cache._db.execute('SELECT COUNT(*) FROM blob;').fetchone()[0] == 1
+
+
+def test_put_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.db'), max_bytes=70)
+    cache.put('Temple University', '<p>Temple University</p>')
+    cache.put('Drexel University', '<p>Drexel University</p>')
+    cache.get('Temple University')
+    cache.put('Villanova University', '<p>Villanova University</p>')
+    assert cache.get('Temple University') is not None
+    assert cache.get('Drexel University') is None
+    assert cache.stats()['size'] <= 70
+    cache.close()
+
+
+def test_reopen(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.db'))
+    cache.put('Temple University', PAGE)
+    size = cache.stats()['size']
+    cache.close()
+
+    cache = PageCache(str(tmp_path / 'pages.db'))
+    assert cache.get('Temple University').html == PAGE
+    assert cache.stats()['size'] == size
+    cache.close()
+
+
+def test_fetch(cache, server_url):
+    client = HTTPClient()
+    url = server_url + '/wiki/Temple_University'
+    requests_seen.clear()
+
+    assert cache.fetch('Temple University', url, client) == PAGE
+    assert cache.fetch('Temple University', url, client) == PAGE
+    assert requests_seen == [None]
+
+    cache.ttl = 0
+    assert cache.fetch('Temple University', url, client) == PAGE
+    assert requests_seen == [None, ETAG]
+
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+    assert stats['revalidations'] == 1
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+    assert stats['bytes_saved'] == 2 * len(PAGE)
+
+
+def test_fetch_serves_stale_page_on_error(cache):
+    cache.put('Temple University', PAGE)
+    cache.ttl = 0
+    assert cache.fetch('Temple University', 'http://127.0.0.1:1/wiki/Temple_University', HTTPClient(max_retries=0)) \
+        == PAGE
+    assert cache.fetch('Drexel University', 'http://127.0.0.1:1/wiki/Drexel_University', HTTPClient(max_retries=0)) \
+        is None
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+import requests
+
+from trivia_generator.web_scraper.RequestScheduler import *
+
+
+def http_error(status: int, retry_after: str = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.HTTPError(response=response)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=5)
+    start = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+    # the burst is free, the other 20 tokens come at the rate
+    assert 0.15 < time.monotonic() - start < 0.5
+
+
+def test_token_bucket_adjusts_rate():
+    bucket = TokenBucket(rate=40, burst=5)
+    bucket.decrease()
+    bucket.decrease()
+    assert bucket.rate == 20
+    for _ in range(1000):
+        bucket.increase()
+    assert bucket.rate == 40
+
+
+def test_aimd_limiter():
+    limiter = AIMDLimiter(initial=4, minimum=1, maximum=8, latency_target=1.0)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.01, overloaded=False)
+    assert 4 < limiter.limit < 5
+
+    limiter.acquire()
+    limiter.release(0.01, overloaded=True)
+    limit = limiter.limit
+    assert 2 < limit < 2.5
+    # in-flight requests failing from the same overload do not lower it again
+    limiter.acquire()
+    limiter.release(0.01, overloaded=True)
+    assert limiter.limit == limit
+    assert limiter.in_flight == 0
+
+
+def test_run_retries():
+    scheduler = RequestScheduler(rate=1000, backoff_base=0.001)
+    errors = [http_error(503, retry_after='0'), requests.ConnectionError()]
+
+    def request():
+        if errors:
+            raise errors.pop(0)
+        return 'page'
+
+    assert scheduler.run(request) == 'page'
+    stats = scheduler.stats()
+    assert stats['retries'] == 2
+    assert stats['requests'] == 3
+
+
+def test_run_gives_up():
+    scheduler = RequestScheduler(rate=1000, max_attempts=3, backoff_base=0.001)
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise http_error(429)
+
+    with pytest.raises(requests.HTTPError):
+        scheduler.run(request)
+    assert len(attempts) == 3
+    assert scheduler.stats()['throttled'] == 3
+    assert scheduler.stats()['failures'] == 1
+    assert scheduler.bucket.rate == 500
+
+
+def test_run_does_not_retry_client_errors():
+    scheduler = RequestScheduler(rate=1000)
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise http_error(404)
+
+    with pytest.raises(requests.HTTPError):
+        scheduler.run(request)
+    assert len(attempts) == 1
+    assert scheduler.limiter.in_flight == 0
+
+
+def test_run_client_errors_are_not_overload():
+    scheduler = RequestScheduler(rate=1000, initial_concurrency=4)
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise ClientError('too large')
+
+    for _ in range(3):
+        with pytest.raises(ClientError):
+            scheduler.run(request)
+    assert len(attempts) == 3
+    assert scheduler.limiter.limit > 4
+    assert scheduler.stats()['failures'] == 0
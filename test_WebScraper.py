@@ -1,6 +1,13 @@
 import math
+import threading
+import time
 
+import pytest
+
+from database_connection.async_dbconn import AsyncDBConn
+from trivia_generator.web_scraper import WebScraper
 from trivia_generator.web_scraper.WebScraper import *
+from trivia_generator.web_scraper.WikipediaAPI import ArticleContent, FetchSettings
 
 def test_get_page_by_location():
     # Search 10km around Temple University, Philadelphia, PA.
@@ -26,6 +33,29 @@ def test_get_page_by_random():
     article = get_page_by_random()
     assert article is not None
 
+class EmptyDBConn:
+    def select_weighted_random_article(self):
+        return None
+
+    def select_random_articles(self, k):
+        return []
+
+def test_get_page_by_random_with_empty_article_table(monkeypatch):
+    monkeypatch.setattr(WebScraper, 'get_db_conn', EmptyDBConn)
+    assert get_page_by_random() is None
+    assert list(iter_pages_by_random(4)) == []
+
+def test_get_page_by_random_without_importances(monkeypatch):
+    class UnweightedDBConn(EmptyDBConn):
+        def select_random_articles(self, k):
+            return [(7, 'Liberty_Bell')]
+
+    fetched = []
+    monkeypatch.setattr(WebScraper, 'get_db_conn', UnweightedDBConn)
+    monkeypatch.setattr(WebScraper, '_fetch_article', lambda *drawn: fetched.append(drawn) or drawn)
+    assert get_page_by_random() == (7, 'Liberty_Bell', -1)
+    assert fetched == [(7, 'Liberty_Bell', -1)]
+
 def test_get_page_by_category():
     category_name = "People by status"
     article = get_page_by_category(category_name)
@@ -36,6 +66,117 @@ def test_get_page_by_category_with_invalid_category():
     article = get_page_by_category(category_name)
     assert article is None
 
+def test_iter_pages_by_random():
+    articles = list(iter_pages_by_random(4, max_workers=2))
+    assert len(articles) == 4
+    assert all(article is not None for article in articles)
+
+def test_iter_pages_by_category_with_invalid_category():
+    category_name = "gaeigjeklgj"
+    articles = list(iter_pages_by_category(category_name, 4))
+    assert articles == []
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    """Replaces the article fetches with a stand-in that fails for odd article ids and records its concurrency."""
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0, 'fetched': []}
+
+    def fetch_article(article_id, title, importance):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            state['fetched'].append(article_id)
+        time.sleep(0.01)
+        with lock:
+            state['in_flight'] -= 1
+        return None if article_id % 2 else (article_id, title)
+
+    monkeypatch.setattr(WebScraper, '_fetch_article', fetch_article)
+    monkeypatch.setattr(WebScraper, 'get_fetch_settings', lambda: FetchSettings(mode='html'))
+    return state
+
+def test_iter_articles_bounds_concurrency(fake_fetch):
+    candidates = ((i, str(i), -1) for i in range(0, 40, 2))
+    articles = list(WebScraper._iter_articles(candidates, 12, max_workers=3))
+    assert len(articles) == 12
+    assert fake_fetch['max_in_flight'] <= 3
+
+def test_iter_articles_replaces_failed_fetches(fake_fetch):
+    candidates = ((i, str(i), -1) for i in range(20))
+    articles = list(WebScraper._iter_articles(candidates, 5, max_workers=2))
+    assert len(articles) == 5
+    assert all(article_id % 2 == 0 for article_id, _ in articles)
+    assert len(fake_fetch['fetched']) < 20
+
+def test_iter_articles_runs_out_of_candidates(fake_fetch):
+    candidates = iter([(1, '1', -1), (2, '2', -1), (4, '4', -1)])
+    assert sorted(WebScraper._iter_articles(candidates, 5, max_workers=2)) == [(2, '2'), (4, '4')]
+
+def test_iter_articles_skips_repeated_candidates(fake_fetch):
+    candidates = iter([(2, '2', -1), (2, '2', -1), (4, '4', -1), (2, '2', -1), (6, '6', -1)])
+    articles = list(WebScraper._iter_articles(candidates, 3, max_workers=1))
+    assert sorted(articles) == [(2, '2'), (4, '4'), (6, '6')]
+    assert fake_fetch['fetched'] == [2, 4, 6]
+
+def test_iter_pages_by_category_draws_on_query_threads(fake_fetch, monkeypatch):
+    class CategoryDBConn:
+        def __init__(self):
+            self.draws = iter([(2, '2'), (4, '4'), None])
+            self.threads = set()
+
+        def select_random_category_article(self, category):
+            self.threads.add(threading.current_thread().name)
+            return next(self.draws)
+
+    db_conn = CategoryDBConn()
+    async_db_conn = AsyncDBConn(db_conn, max_workers=1)
+    monkeypatch.setattr(WebScraper, 'get_async_db_conn', lambda: async_db_conn)
+    assert sorted(iter_pages_by_category('People', 4)) == [(2, '2'), (4, '4')]
+    assert all(name.startswith('dbconn') for name in db_conn.threads)
+    async_db_conn.shutdown()
+
+def test_build_article_keeps_whole_category_names(monkeypatch):
+    class CategoriesDBConn:
+        def select_article_categories(self, article_id):
+            return ['Bells', 'Liberty Bell']
+
+    class Features:
+        @staticmethod
+        def resolve_coreferences(content):
+            return content
+
+    async_db_conn = AsyncDBConn(CategoriesDBConn(), max_workers=1)
+    monkeypatch.setattr(WebScraper, 'get_async_db_conn', lambda: async_db_conn)
+    monkeypatch.setattr(WebScraper, 'features', Features)
+    article = WebScraper._build_article('The Liberty Bell rang.', 'url', 0, 7, -1, None, None)
+    assert article.categories == ['Bells', 'Liberty Bell']
+    async_db_conn.shutdown()
+
+def test_iter_articles_from_api_yields_batches_as_they_arrive(monkeypatch):
+    released = threading.Event()
+    queried = []
+
+    def fetch_article_contents(titles, api_url, batch_size):
+        queried.append(titles)
+        if 'Slow' in titles:
+            released.wait(5)
+        return {title: ArticleContent(title, '') for title in titles if title != 'Missing'}
+
+    monkeypatch.setattr(WebScraper, 'fetch_article_contents', fetch_article_contents)
+    monkeypatch.setattr(WebScraper, '_get_article_from_content',
+                        lambda content, article_id, importance: (article_id, content.title))
+    monkeypatch.setattr(WebScraper, 'get_fetch_settings', lambda: FetchSettings(mode='api', batch_size=2))
+    candidates = iter([(1, 'Slow', -1), (2, 'A', -1), (3, 'Missing', -1), (4, 'B', -1), (5, 'C', -1)])
+    articles = WebScraper._iter_articles(candidates, 4, max_workers=4)
+
+    # the second batch is parsed while the first is still in flight
+    assert next(articles) == (4, 'B')
+    released.set()
+    assert sorted(articles) == [(1, 'Slow'), (2, 'A'), (5, 'C')]
+    # the missing article was replaced by the next candidate
+    assert queried == [['Slow', 'A'], ['Missing', 'B'], ['C']]
+
 def test_convert_dms_to_decimal():
     dms_test_suite = [
         ("38°43′31″N", 38.725),
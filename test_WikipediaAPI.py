@@ -0,0 +1,107 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from trivia_generator.web_scraper.HTTPClient import HTTPClient
+from trivia_generator.web_scraper.WikipediaAPI import *
+
+# A stand-in for the Action API, which returns the wikitext of at most two pages per response, continuing the rest.
+WIKITEXT = {
+    'Liberty Bell': "The '''Liberty Bell''' is in [[Philadelphia]].",
+    'Temple University': "'''Temple University''' is in [[Philadelphia]].",
+    'Drexel University': "'''Drexel University''' is in [[Philadelphia]].",
+}
+COORDINATES = {
+    'Liberty Bell': (39.9496, -75.1503),
+}
+REDIRECTS = {
+    'Temple': 'Temple University',
+}
+PAGES_PER_RESPONSE = 2
+queries = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        queries.append(params)
+        titles = params['titles'].split('|')
+        query = {'normalized': [], 'redirects': [], 'pages': []}
+        resolved = []
+        for title in titles:
+            if title[0].islower():
+                query['normalized'].append({'from': title, 'to': title[0].upper() + title[1:]})
+                title = title[0].upper() + title[1:]
+            if title in REDIRECTS:
+                query['redirects'].append({'from': title, 'to': REDIRECTS[title]})
+                title = REDIRECTS[title]
+            resolved.append(title)
+
+        offset = int(params.get('rvcontinue', 0))
+        for i, title in enumerate(resolved):
+            if title not in WIKITEXT:
+                query['pages'].append({'title': title, 'missing': True})
+                continue
+            page = {'title': title}
+            if offset <= i < offset + PAGES_PER_RESPONSE:
+                page['revisions'] = [{'slots': {'main': {'contentmodel': 'wikitext', 'content': WIKITEXT[title]}}}]
+            if title in COORDINATES:
+                lat, lon = COORDINATES[title]
+                page['coordinates'] = [{'lat': lat, 'lon': lon, 'primary': True}]
+            query['pages'].append(page)
+        response = {'batchcomplete': True, 'query': query}
+        if offset + PAGES_PER_RESPONSE < len(resolved):
+            response['continue'] = {'rvcontinue': offset + PAGES_PER_RESPONSE, 'continue': '||'}
+
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def api_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/w/api.php'
+    server.shutdown()
+
+
+def test_fetch_article_contents(api_url):
+    queries.clear()
+    titles = ['Liberty_Bell', 'temple', 'Drexel University', 'Gaeigjeklgj']
+    contents = fetch_article_contents(titles, api_url, batch_size=20, client=HTTPClient())
+
+    assert set(contents) == {'Liberty_Bell', 'temple', 'Drexel University'}
+    assert contents['Liberty_Bell'] == ArticleContent('Liberty Bell', WIKITEXT['Liberty Bell'], 39.9496, -75.1503)
+    assert contents['temple'] == ArticleContent('Temple University', WIKITEXT['Temple University'])
+    assert contents['Drexel University'].latitude is None
+    # one batch, continued once because the first response only had room for two pages
+    assert len(queries) == 2
+    assert {query['titles'] for query in queries} == {'Liberty Bell|temple|Drexel University|Gaeigjeklgj'}
+
+
+def test_fetch_article_contents_batches(api_url):
+    queries.clear()
+    contents = fetch_article_contents(['Liberty Bell', 'Temple University', 'Drexel University'], api_url,
+                                      batch_size=2, client=HTTPClient())
+    assert len(contents) == 3
+    # one request per batch
+    assert [query['titles'] for query in queries] == ['Liberty Bell|Temple University', 'Drexel University']
+
+
+def test_fetch_settings_from_config():
+    settings = FetchSettings.from_config()
+    assert settings.mode in ('html', 'api')
+    assert settings.batch_size <= MAX_BATCH_SIZE
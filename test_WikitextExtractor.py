@@ -0,0 +1,35 @@
+from trivia_generator.web_scraper.WikitextExtractor import *
+
+WIKITEXT = """{{Short description|Symbol of American independence}}
+{{Infobox monument
+| name = Liberty Bell
+| coordinates = {{coord|39|56|58|N|75|09|01|W|display=inline,title}}
+}}
+[[File:Liberty Bell 2008.jpg|thumb|The bell in [[2008]]]]
+The '''Liberty Bell''' is a symbol of [[American Revolution|American independence]] in [[Philadelphia]].<ref name="a">A</ref>
+It was cast in [[London]].<ref>{{cite web|url=https://example.org}}</ref>
+
+== History ==
+{| class="wikitable"
+| cell || cell
+|}
+* A list item.
+It rang in [https://example.org 1776] &amp; cracked.<!-- a comment -->
+[[Category:Bells]]
+"""
+
+
+def test_extract_paragraphs():
+    assert extract_paragraphs(WIKITEXT) == ('The Liberty Bell is a symbol of American independence in Philadelphia. '
+                                            'It was cast in London.\n'
+                                            'It rang in 1776 & cracked.\n')
+
+
+def test_extract_coordinates():
+    latitude, longitude = extract_coordinates(WIKITEXT)
+    assert round(latitude, 3) == 39.949
+    assert round(longitude, 3) == -75.150
+    assert extract_coordinates('{{coord|39.95|-75.15}} {{coord|1|2|display=title}}') == (1.0, 2.0)
+    assert extract_coordinates('{{coord|39.95|-75.15}}') == (39.95, -75.15)
+    assert extract_coordinates('{{coord|139|0|N|75|0|W}}') == (None, None)
+    assert extract_coordinates('No coordinates.') == (None, None)
@@ -0,0 +1,65 @@
+import bz2
+import sqlite3
+
+import pytest
+
+from ingest_dump import iter_dump_pages, match_articles, _batches
+
+DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">
+  <siteinfo><sitename>Wikipedia</sitename></siteinfo>
+  <page>
+    <title>Liberty Bell</title><ns>0</ns><id>1</id>
+    <revision><id>10</id><timestamp>2020-01-01T00:00:00Z</timestamp><text>The '''Liberty Bell''' rang.</text></revision>
+  </page>
+  <page>
+    <title>Liberty bell</title><ns>0</ns><id>2</id><redirect title="Liberty Bell" />
+    <revision><id>11</id><timestamp>2020-01-01T00:00:00Z</timestamp><text>#REDIRECT [[Liberty Bell]]</text></revision>
+  </page>
+  <page>
+    <title>Talk:Liberty Bell</title><ns>1</ns><id>3</id>
+    <revision><id>12</id><timestamp>2020-01-01T00:00:00Z</timestamp><text>Discussion.</text></revision>
+  </page>
+  <page>
+    <title>Temple University</title><ns>0</ns><id>4</id>
+    <revision><id>13</id><timestamp>2020-01-02T00:00:00Z</timestamp><text>Temple is in Philadelphia.</text></revision>
+  </page>
+</mediawiki>
+"""
+
+
+@pytest.fixture
+def dump_filename(tmp_path):
+    filename = str(tmp_path / 'pages-articles.xml.bz2')
+    with bz2.open(filename, 'wt', encoding='utf-8') as f:
+        f.write(DUMP)
+    return filename
+
+
+@pytest.fixture
+def db():
+    db = sqlite3.connect(':memory:')
+    with open('database_connection/test_sql/test_schema.sql', 'r') as f:
+        db.executescript(f.read())
+    db.executemany('INSERT INTO article (article_id, title) VALUES (?, ?);',
+                   [(1, 'Liberty_Bell'), (2, 'Temple University'), (3, 'Drexel University')])
+    db.execute("INSERT INTO t_unit (article_id, sentence) VALUES (2, 'Temple is in Philadelphia.');")
+    yield db
+    db.close()
+
+
+def test_iter_dump_pages(dump_filename):
+    pages = list(iter_dump_pages(dump_filename))
+    assert pages == [('Liberty Bell', 1577836800, "The '''Liberty Bell''' rang."),
+                     ('Temple University', 1577923200, 'Temple is in Philadelphia.')]
+
+
+def test_match_articles(dump_filename, db):
+    matched = match_articles(db, list(iter_dump_pages(dump_filename)))
+    # Temple University already has TUnits
+    assert matched == [(1, 'Liberty Bell', 1577836800, "The '''Liberty Bell''' rang.")]
+
+
+def test_batches(dump_filename, db):
+    db.execute('DELETE FROM t_unit;')
+    batches = list(_batches(iter_dump_pages(dump_filename), db, 1))
+    assert [[article[0] for article in batch] for batch in batches] == [[1], [2]]
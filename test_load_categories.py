@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+import load_categories
+from load_categories import insert_articles, insert_categories
+
+CATEGORIES = ['People\t2.5', 'Places\t-Infinity', 'Broken line', 'People\t1.0', 'Bells\t0.5']
+ARTICLES = ['Liberty_Bell\tBells\tPlaces', 'Jill\tPeople\tUnknown', '\tPeople', 'Philadelphia\tPlaces',
+            'Temple_University\tPlaces\tPeople', 'Drexel_University\tPlaces']
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def db_filename(tmp_path):
+    db_filename = str(tmp_path / 'load.db')
+    db = sqlite3.connect(db_filename)
+    with open('database_connection/test_sql/test_schema.sql', 'r') as f:
+        db.executescript(f.read())
+    db.execute('CREATE INDEX article_title_index ON article (title);')
+    db.commit()
+    db.close()
+    return db_filename
+
+
+def write_lines(filename: str, lines: list) -> str:
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    return filename
+
+
+def interrupt_after_batches(monkeypatch, batches: int):
+    """Makes the load stop with an exception after it has committed *batches* transactions."""
+    committed = []
+
+    def report(self, line_number, force=False):
+        committed.append(line_number)
+        if len(committed) >= batches:
+            raise Interrupted()
+
+    monkeypatch.setattr(load_categories._Progress, 'report', report)
+
+
+def select_all(db_filename: str, query: str) -> list:
+    db = sqlite3.connect(db_filename)
+    try:
+        return db.execute(query).fetchall()
+    finally:
+        db.close()
+
+
+def select_articles(db_filename: str) -> list:
+    return select_all(db_filename, '''
+                                   SELECT title, category.name, category.category_id
+                                   FROM article
+                                       LEFT JOIN article_category ON article.article_id = article_category.article_id
+                                       LEFT JOIN category ON article_category.category_id = category.category_id
+                                   ORDER BY article.article_id, category.category_id;
+                                   ''')
+
+
+def test_insert_categories(db_filename, tmp_path):
+    insert_categories(db_filename, write_lines(str(tmp_path / 'categories.tsv'), CATEGORIES), batch_size=2)
+    assert select_all(db_filename, 'SELECT category_id, name, importance FROM category;') == \
+        [(1, 'People', 2.5), (2, 'Places', -1.0), (3, 'People', 1.0), (4, 'Bells', 0.5)]
+
+
+def test_insert_articles(db_filename, tmp_path):
+    insert_categories(db_filename, write_lines(str(tmp_path / 'categories.tsv'), CATEGORIES))
+    insert_articles(db_filename, write_lines(str(tmp_path / 'articles.tsv'), ARTICLES), batch_size=2)
+    # duplicate category names resolve to the first category, unknown names and untitled lines are skipped
+    assert select_articles(db_filename) == [
+        ('Liberty_Bell', 'Places', 2), ('Liberty_Bell', 'Bells', 4),
+        ('Jill', 'People', 1),
+        ('Philadelphia', 'Places', 2),
+        ('Temple_University', 'People', 1), ('Temple_University', 'Places', 2),
+        ('Drexel_University', 'Places', 2),
+    ]
+
+
+def test_interrupted_load_resumes(db_filename, tmp_path, monkeypatch):
+    insert_categories(db_filename, write_lines(str(tmp_path / 'categories.tsv'), CATEGORIES))
+    articles_filename = write_lines(str(tmp_path / 'articles.tsv'), ARTICLES)
+
+    with monkeypatch.context() as patch:
+        interrupt_after_batches(patch, 1)
+        with pytest.raises(Interrupted):
+            insert_articles(db_filename, articles_filename, batch_size=2)
+    # the first batch of two articles was committed along with the line it reached
+    assert [title for title, in select_all(db_filename, 'SELECT title FROM article ORDER BY article_id;')] == \
+        ['Liberty_Bell', 'Jill']
+    byte_offset, line_number = select_all(db_filename, f"""SELECT byte_offset, line_number FROM load_progress
+                                                           WHERE source = '{articles_filename}';""")[0]
+    assert line_number == 2
+    assert byte_offset == len(''.join(line + '\n' for line in ARTICLES[:2]).encode('utf-8'))
+    # the indexes stay dropped until the load completes, but are remembered
+    assert select_all(db_filename, "SELECT name FROM sqlite_master WHERE name = 'article_title_index';") == []
+    assert ('article_title_index',) in select_all(db_filename, 'SELECT name FROM load_deferred_index;')
+
+    insert_articles(db_filename, articles_filename, batch_size=2)
+    assert [title for title, in select_all(db_filename, 'SELECT title FROM article ORDER BY article_id;')] == \
+        ['Liberty_Bell', 'Jill', 'Philadelphia', 'Temple_University', 'Drexel_University']
+    assert len(select_articles(db_filename)) == 7
+    assert select_all(db_filename, "SELECT name FROM sqlite_master WHERE name = 'article_title_index';") == \
+        [('article_title_index',)]
+    assert select_all(db_filename, 'SELECT name FROM load_deferred_index;') == []
+
+
+def test_completed_load_is_not_repeated(db_filename, tmp_path):
+    categories_filename = write_lines(str(tmp_path / 'categories.tsv'), CATEGORIES)
+    insert_categories(db_filename, categories_filename)
+    insert_categories(db_filename, categories_filename)
+    assert len(select_all(db_filename, 'SELECT category_id FROM category;')) == 4
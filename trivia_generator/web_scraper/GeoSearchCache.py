@@ -0,0 +1,293 @@
+"""
+GeoSearchCache
+==============
+
+A cache of the Wikipedia geosearch results used by ``get_page_by_location``, configured by the ``[GEOSEARCH_CACHE]``
+section of ``scraper.ini``.
+
+Coordinates are snapped to a grid of ``GridDegrees`` cells, and each cell and radius is searched once, from the
+centre of the cell, with the radius widened by half the cell's diagonal so that the results cover every point of the
+cell. The results for a point are then the ones within the requested radius of that point, nearest first, so nearby
+points share one search without getting results from outside their own radius.
+
+Results are kept in memory, in front of a SQLite file that keeps them across restarts. Both tiers are bounded in
+size and evict the least recently used cells first; results older than the TTL are searched again, but are still
+served if the search fails.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from math import asin, cos, floor, radians, sin, sqrt
+from os import path
+from typing import List, Optional
+
+import requests
+
+from .HTTPClient import CONFIG_FILE, HTTPClient, _read_config, get_http_client
+
+API_URL = 'https://en.wikipedia.org/w/api.php'
+EARTH_RADIUS_METERS = 6371008.8
+# The largest radius and number of results the geosearch API allows.
+MAX_RADIUS = 10000
+MAX_LIMIT = 500
+# The number of results the geosearch API returns by default.
+DEFAULT_LIMIT = 10
+
+SCHEMA = """
+         CREATE TABLE IF NOT EXISTS geosearch (
+             cell TEXT PRIMARY KEY,
+             results TEXT NOT NULL,
+             fetched_at REAL NOT NULL,
+             accessed_at REAL NOT NULL
+         );
+         CREATE INDEX IF NOT EXISTS geosearch_accessed_at_index ON geosearch (accessed_at);
+         """
+
+
+def distance(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Gets the great-circle distance between two points, in meters."""
+    lat1, long1, lat2, long2 = map(radians, (lat1, long1, lat2, long2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((long2 - long1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * asin(min(1.0, sqrt(a)))
+
+
+class GeoSearchCache:
+    """Thread-safe, two-tier cache of geosearch results keyed by grid cell and radius.
+
+    :param filename: the path of the SQLite file holding the results, or None to keep them in memory only. Its
+        folder is created if needed.
+    :type filename: str
+    :param grid_degrees: the width and height of a grid cell, in degrees.
+    :type grid_degrees: float
+    :param ttl: the number of seconds results are served without searching again.
+    :type ttl: float
+    :param max_entries: the most cells kept in memory.
+    :type max_entries: int
+    :param max_disk_entries: the most cells kept in the file.
+    :type max_disk_entries: int
+    :param api_url: the endpoint of the MediaWiki Action API.
+    :type api_url: str
+    """
+
+    def __init__(self, filename: str = None, grid_degrees: float = 0.01, ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 4096, max_disk_entries: int = 100000, api_url: str = API_URL):
+        self.filename = filename
+        self.grid_degrees = grid_degrees
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.api_url = api_url
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        # cell key -> (fetched_at, results), least recently used first
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if filename is not None:
+            os.makedirs(path.dirname(path.abspath(filename)), exist_ok=True)
+            self._db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode = WAL;')
+            self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def from_config(config_filename: str = None):
+        """Creates a cache from the ``[GEOSEARCH_CACHE]`` section of a config file.
+
+        :param config_filename: the path of the config file (default: ``scraper.ini`` next to this module).
+        :returns: the geosearch cache, or None if it is disabled.
+        :rtype: GeoSearchCache
+        """
+        module_dir = path.dirname(path.abspath(__file__))
+        if config_filename is None:
+            config_filename = path.join(module_dir, CONFIG_FILE)
+        config = _read_config(config_filename)
+        if not config.getboolean('GEOSEARCH_CACHE', 'Enabled', fallback=False):
+            return None
+        filename = config.get('GEOSEARCH_CACHE', 'Filename', fallback='page_cache/geosearch.db')
+        return GeoSearchCache(path.join(module_dir, filename) if filename else None,
+                              grid_degrees=config.getfloat('GEOSEARCH_CACHE', 'GridDegrees', fallback=0.01),
+                              ttl=config.getfloat('GEOSEARCH_CACHE', 'TTL', fallback=7 * 24 * 3600),
+                              max_entries=config.getint('GEOSEARCH_CACHE', 'MaxEntries', fallback=4096),
+                              max_disk_entries=config.getint('GEOSEARCH_CACHE', 'MaxDiskEntries', fallback=100000),
+                              api_url=config.get('FETCH', 'ApiUrl', fallback=API_URL))
+
+    def cell(self, latitude: float, longitude: float) -> tuple:
+        """Gets the grid cell holding a point, as its row and column."""
+        return floor(latitude / self.grid_degrees), floor(longitude / self.grid_degrees)
+
+    def cell_search_area(self, cell: tuple, radius: int) -> tuple:
+        """Gets the centre and radius that one search of a cell covers, so that the results include everything within
+        *radius* of any point of the cell.
+
+        :returns: the latitude and longitude of the centre of the cell, and the search radius in meters.
+        """
+        row, column = cell
+        centre_lat, centre_long = (row + 0.5) * self.grid_degrees, (column + 0.5) * self.grid_degrees
+        # The corners nearer the equator are the furthest from the centre.
+        half_diagonal = max(distance(centre_lat, centre_long, row * self.grid_degrees, column * self.grid_degrees),
+                            distance(centre_lat, centre_long, (row + 1) * self.grid_degrees,
+                                     column * self.grid_degrees))
+        return centre_lat, centre_long, min(MAX_RADIUS, int(radius + half_diagonal) + 1)
+
+    def search(self, latitude: float, longitude: float, radius: int, limit: int = DEFAULT_LIMIT,
+               client: HTTPClient = None) -> Optional[List[str]]:
+        """Gets the titles of the articles within a radius of a point, from the cache or else from the geosearch API.
+
+        A radius close to ``MAX_RADIUS`` cannot be widened to cover the whole cell, so its results may miss a few
+        articles near the edge of the search area.
+
+        :param latitude: the latitude of the point, in decimal degrees.
+        :param longitude: the longitude of the point, in decimal degrees.
+        :param radius: the radius to search, in meters.
+        :param limit: the most titles returned.
+        :param client: the HTTP client to search with (default: the shared client).
+        :returns: the titles, with underscores for spaces, nearest first; or None if the coordinates are invalid or the
+            search failed with nothing cached.
+        """
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            return None
+        key = self.cell(latitude, longitude) + (radius,)
+        results = self._lookup(key, client)
+        if results is None:
+            return None
+        nearby = sorted((distance(latitude, longitude, lat, long), title) for title, lat, long in results)
+        return [title.replace(' ', '_') for dist, title in nearby if dist <= radius][:limit]
+
+    def _lookup(self, key: tuple, client: HTTPClient) -> Optional[list]:
+        """Gets the results of a cell and radius from memory, from the file, or from the API, in that order."""
+        cell_key = '%d:%d:%d' % key
+        now = time.time()
+        entry = self._memory_get(cell_key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self._count('memory_hits')
+            return entry[1]
+        if entry is None:
+            entry = self._load(cell_key, now)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._memory_put(cell_key, entry)
+                self._count('disk_hits')
+                return entry[1]
+
+        self._count('misses')
+        results = self._fetch(key, client)
+        if results is None:
+            if entry is None:
+                return None
+            self._count('stale_served')
+            return entry[1]
+        entry = (now, results)
+        self._memory_put(cell_key, entry)
+        self._store(cell_key, entry)
+        return results
+
+    def _fetch(self, key: tuple, client: HTTPClient) -> Optional[list]:
+        """Searches the area of a cell, returning the title and coordinates of each result."""
+        row, column, radius = key
+        centre_lat, centre_long, search_radius = self.cell_search_area((row, column), radius)
+        params = {
+            'action': 'query',
+            'list': 'geosearch',
+            'gscoord': f'{centre_lat:.6f}|{centre_long:.6f}',
+            'gsradius': search_radius,
+            'gslimit': MAX_LIMIT,
+            'format': 'json',
+        }
+        try:
+            res = (client or get_http_client()).get(self.api_url, params=params).json()
+        except (requests.RequestException, ValueError):
+            return None
+        if 'query' not in res:
+            return None
+        return [(page['title'], page['lat'], page['lon']) for page in res['query']['geosearch']]
+
+    def _memory_get(self, cell_key: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._memory.get(cell_key)
+            if entry is not None:
+                self._memory.move_to_end(cell_key)
+            return entry
+
+    def _memory_put(self, cell_key: str, entry: tuple):
+        with self._lock:
+            self._memory[cell_key] = entry
+            self._memory.move_to_end(cell_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load(self, cell_key: str, now: float) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT fetched_at, results FROM geosearch WHERE cell = ?;',
+                                   (cell_key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE geosearch SET accessed_at = ? WHERE cell = ?;', (now, cell_key))
+        fetched_at, results = row
+        return fetched_at, [tuple(result) for result in json.loads(results)]
+
+    def _store(self, cell_key: str, entry: tuple):
+        if self._db is None:
+            return
+        fetched_at, results = entry
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO geosearch (cell, results, fetched_at, accessed_at) '
+                             'VALUES (?, ?, ?, ?);', (cell_key, json.dumps(results), fetched_at, fetched_at))
+            self._db.execute('''
+                             DELETE FROM geosearch
+                             WHERE cell IN (SELECT cell FROM geosearch ORDER BY accessed_at DESC LIMIT -1 OFFSET ?);
+                             ''', (self.max_disk_entries,))
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        """Gets the usage statistics of the cache since it was opened.
+
+        :returns: the searches served from memory, from the file and from the API, the stale results served after a
+            failed search, the hit rate, and the number of cells kept in memory and in the file.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries = 0 if self._db is None else \
+                self._db.execute('SELECT COUNT(*) FROM geosearch;').fetchone()[0]
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stale_served': self.stale_served,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+            }
+
+    def close(self):
+        """Closes the cache file."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+
+
+geosearch_cache = None
+_geosearch_cache_created = False
+_geosearch_cache_lock = threading.Lock()
+
+
+def get_geosearch_cache() -> Optional[GeoSearchCache]:
+    """Gets the process-wide geosearch cache configured by ``scraper.ini``, opening it on first use.
+
+    :returns: the shared GeoSearchCache, or None if it is disabled.
+    :rtype: GeoSearchCache
+    """
+    global geosearch_cache, _geosearch_cache_created
+    with _geosearch_cache_lock:
+        if not _geosearch_cache_created:
+            geosearch_cache = GeoSearchCache.from_config()
+            _geosearch_cache_created = True
+        return geosearch_cache
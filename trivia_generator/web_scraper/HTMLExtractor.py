@@ -0,0 +1,97 @@
+"""
+HTMLExtractor
+=============
+
+Pulls the article text and coordinates out of the HTML of a Wikipedia page.
+
+Only the ``<p>`` tags of the ``mw-content-text`` part of the page are parsed, so the skin, infobox, navigation boxes,
+references and category links cost a regular expression scan instead of a parse. The coordinates are read from the
+page with a regular expression too.
+"""
+import html
+import re
+from typing import Optional, Tuple
+
+import bs4
+
+CONTENT_START_RE = re.compile(r'<div\b[^>]*\bid="mw-content-text"')
+# Wikipedia puts these right after the article body.
+CONTENT_END_MARKERS = ('<div id="catlinks"', '<div class="printfooter"')
+# The parser output of MediaWiki always closes its paragraphs, and paragraphs cannot nest.
+PARAGRAPH_RE = re.compile(r'<p\b[^>]*>.*?</p>', re.DOTALL | re.IGNORECASE)
+PARAGRAPHS = bs4.SoupStrainer('p')
+COORDINATE_RE_FORMAT = r'<span\b[^>]*\bclass="(?:[^"]*\s)?%s(?:\s[^"]*)?"[^>]*>(.*?)</span>'
+LATITUDE_RE = re.compile(COORDINATE_RE_FORMAT % 'latitude', re.DOTALL)
+LONGITUDE_RE = re.compile(COORDINATE_RE_FORMAT % 'longitude', re.DOTALL)
+TAG_RE = re.compile(r'<[^>]*>')
+
+# A run of sentences ending in [citation needed], along with the period before the first of them.
+CITATION_NEEDED_RE = re.compile(r'\.(?:[^.]*\.\[citation needed\])+')
+CITATION_RE = re.compile(r' ?\[.*?\]')
+PARENTHESES_RE = re.compile(r' ?\(.*?\)')
+
+
+def content_html(page_html: str) -> str:
+    """Cuts the article body out of the HTML of a Wikipedia page.
+
+    :param page_html: the HTML of the page.
+    :returns: the HTML from the start of the ``mw-content-text`` div to the category links, or the whole page if it
+        has no ``mw-content-text`` div.
+    """
+    start = CONTENT_START_RE.search(page_html)
+    if start is None:
+        return page_html
+    end = len(page_html)
+    for marker in CONTENT_END_MARKERS:
+        position = page_html.find(marker, start.start())
+        if position != -1:
+            end = min(end, position)
+    return page_html[start.start():end]
+
+
+def extract_paragraphs(page_html: str) -> str:
+    """Gets the text of the paragraphs of a Wikipedia page, skipping paragraphs with math in them.
+
+    :param page_html: the HTML of the page.
+    :returns: the text of each paragraph, followed by a newline.
+    """
+    body = content_html(page_html)
+    paragraph_html = PARAGRAPH_RE.findall(body)
+    if paragraph_html:
+        soup = bs4.BeautifulSoup(''.join(paragraph_html), features='html.parser')
+    else:
+        # Unclosed paragraphs, if any, are left to the parser.
+        soup = bs4.BeautifulSoup(body, features='html.parser', parse_only=PARAGRAPHS)
+    paragraphs = []
+    for tag in soup.find_all('p'):
+        # Check if there is LaTeX in the paragraph tag.
+        if tag.find('span', attrs={'mwe-math-element': True}) is None:
+            paragraphs.append(''.join(tag.strings))
+            paragraphs.append('\n')
+    return ''.join(paragraphs)
+
+
+def extract_coordinates(page_html: str) -> Tuple[Optional[str], Optional[str]]:
+    """Gets the DMS coordinates shown on a Wikipedia page.
+
+    :param page_html: the HTML of the page.
+    :returns: the text of the latitude and longitude, or (None, None) if the page has no coordinates.
+    """
+    latitude = LATITUDE_RE.search(page_html)
+    longitude = LONGITUDE_RE.search(page_html)
+    if latitude is None or longitude is None:
+        return None, None
+    return (html.unescape(TAG_RE.sub('', latitude.group(1))),
+            html.unescape(TAG_RE.sub('', longitude.group(1))))
+
+
+def preprocess_text(content: str) -> str:
+    """Removes the sentences marked [citation needed], citation and note markers, and parenthesized text.
+
+    :param content: the text of an article.
+    :returns: the cleaned text.
+    """
+    content = CITATION_NEEDED_RE.sub('.', content)
+    content = CITATION_RE.sub('', content)
+    content = PARENTHESES_RE.sub('', content)
+    return content
@@ -0,0 +1,186 @@
+"""
+HTTPClient
+==========
+
+A shared HTTP client for the web scraper, configured by ``scraper.ini``.
+
+Every thread gets its own ``requests.Session``, but all of them are mounted on one connection-pooling adapter, so
+keep-alive connections to Wikipedia are reused across requests and threads instead of paying a new TCP and TLS
+handshake for every article. Every request has a connect and read timeout, and responses are capped in size. The
+client made from ``scraper.ini`` also paces its requests with a shared ``RequestScheduler``.
+"""
+import json
+import threading
+from configparser import ConfigParser
+from dataclasses import dataclass, field
+from typing import Mapping
+from functools import lru_cache
+from os import path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .RequestScheduler import ClientError, RequestScheduler
+
+CONFIG_FILE = 'scraper.ini'
+
+
+class ResponseTooLarge(ClientError):
+    """Raised when a response body is larger than the configured maximum."""
+
+
+@dataclass
+class HTTPResponse:
+    """
+    Class representing a fully read HTTP response. Its headers are matched case-insensitively.
+    """
+
+    url: str
+    status_code: int
+    headers: Mapping = field(default_factory=dict)
+    content: bytes = b''
+    encoding: str = 'utf-8'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@lru_cache(maxsize=None)
+def _read_config(config_filename: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(config_filename)
+    return config
+
+
+class HTTPClient:
+    """Thread-safe HTTP client with keep-alive connection pooling, timeouts and a response size cap.
+
+    :param connect_timeout: the number of seconds to wait for a connection to be established.
+    :type connect_timeout: float
+    :param read_timeout: the number of seconds to wait between bytes of the response.
+    :type read_timeout: float
+    :param max_response_bytes: the largest response body accepted, after gzip decoding.
+    :type max_response_bytes: int
+    :param pool_connections: the number of hosts to keep connection pools for.
+    :type pool_connections: int
+    :param pool_maxsize: the number of keep-alive connections kept per host.
+    :type pool_maxsize: int
+    :param max_retries: the number of times a failed connection attempt is retried. Ignored with a scheduler, which
+        retries failed requests itself.
+    :type max_retries: int
+    :param user_agent: the User-Agent header sent with every request.
+    :type user_agent: str
+    :param scheduler: the scheduler that paces and retries the requests, or None to send them straight away.
+    :type scheduler: RequestScheduler
+    """
+
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_response_bytes: int = 5 * 1024 * 1024, pool_connections: int = 4, pool_maxsize: int = 16,
+                 max_retries: int = 2, user_agent: str = 'InfiniteTrivia/1.0', scheduler: RequestScheduler = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_response_bytes = max_response_bytes
+        self.user_agent = user_agent
+        self.scheduler = scheduler
+        if scheduler is not None:
+            max_retries = 0
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   max_retries=Retry(connect=max_retries, read=0, redirect=5, status=0,
+                                                     backoff_factor=0.2, respect_retry_after_header=False))
+        self._local = threading.local()
+
+    @staticmethod
+    def from_config(config_filename: str = None):
+        """Creates a client from the ``[HTTP]`` section of a config file, using the defaults for missing options.
+
+        :param config_filename: the path of the config file (default: ``scraper.ini`` next to this module).
+        :returns: the HTTP client.
+        :rtype: HTTPClient
+        """
+        if config_filename is None:
+            config_filename = path.join(path.dirname(path.abspath(__file__)), CONFIG_FILE)
+        config = _read_config(config_filename)
+        section = config['HTTP'] if config.has_section('HTTP') else {}
+        kwargs = {'scheduler': RequestScheduler.from_config(config)}
+        for option, key, convert in [('ConnectTimeout', 'connect_timeout', float),
+                                     ('ReadTimeout', 'read_timeout', float),
+                                     ('MaxResponseBytes', 'max_response_bytes', int),
+                                     ('PoolConnections', 'pool_connections', int),
+                                     ('PoolMaxSize', 'pool_maxsize', int),
+                                     ('MaxRetries', 'max_retries', int),
+                                     ('UserAgent', 'user_agent', str)]:
+            if option in section:
+                kwargs[key] = convert(section[option])
+        return HTTPClient(**kwargs)
+
+    @property
+    def session(self) -> requests.Session:
+        """The calling thread's session, mounted on the shared adapter."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = self.user_agent
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, params: dict = None, headers: dict = None) -> HTTPResponse:
+        """Gets a URL, reading the whole response body.
+
+        gzip-encoded responses are requested and decoded transparently.
+
+        :param url: the URL to get.
+        :param params: query string parameters to add to the URL.
+        :param headers: extra request headers.
+        :raises requests.RequestException: if the request fails or times out, the response is an HTTP error, or the
+            body is larger than the maximum.
+        :returns: the response.
+        :rtype: HTTPResponse
+        """
+        if self.scheduler is not None:
+            return self.scheduler.run(lambda: self._get(url, params, headers))
+        return self._get(url, params, headers)
+
+    def _get(self, url: str, params: dict, headers: dict) -> HTTPResponse:
+        with self.session.get(url, params=params, headers=headers, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            content_length = response.headers.get('Content-Length')
+            if content_length is not None and content_length.isdigit() \
+                    and response.headers.get('Content-Encoding') is None \
+                    and int(content_length) > self.max_response_bytes:
+                raise ResponseTooLarge(f'{url} is {content_length} bytes')
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > self.max_response_bytes:
+                    raise ResponseTooLarge(f'{url} is over {self.max_response_bytes} bytes')
+                chunks.append(chunk)
+            return HTTPResponse(response.url, response.status_code, response.headers, b''.join(chunks),
+                                response.encoding or 'utf-8')
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.adapter.close()
+
+
+http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Gets the process-wide HTTP client configured by ``scraper.ini``, creating it on first use.
+
+    :returns: the shared HTTPClient.
+    :rtype: HTTPClient
+    """
+    global http_client
+    with _http_client_lock:
+        if http_client is None:
+            http_client = HTTPClient.from_config()
+        return http_client
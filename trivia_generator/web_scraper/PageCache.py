@@ -0,0 +1,277 @@
+"""
+PageCache
+=========
+
+A persistent on-disk cache of the Wikipedia pages fetched by the web scraper, configured by ``scraper.ini``.
+
+Pages are kept zlib-compressed in a SQLite file. Each page body is stored once under the SHA-1 digest of its content,
+and titles point at digests, so titles that redirect to the same article share one copy. A page is served straight
+from the cache until it is older than the TTL; after that it is revalidated with a conditional request
+(``If-None-Match``/``If-Modified-Since``), so an unchanged page costs a 304 response instead of a full download. When
+the compressed pages outgrow the size budget, the least recently used titles are evicted.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from os import path
+from typing import Optional
+
+import requests
+
+from .HTTPClient import CONFIG_FILE, HTTPClient, _read_config, get_http_client
+
+SCHEMA = """
+         CREATE TABLE IF NOT EXISTS page (
+             title TEXT PRIMARY KEY,
+             digest TEXT NOT NULL,
+             etag TEXT,
+             last_modified TEXT,
+             fetched_at REAL NOT NULL,
+             accessed_at REAL NOT NULL
+         );
+         CREATE INDEX IF NOT EXISTS page_accessed_at_index ON page (accessed_at);
+         CREATE INDEX IF NOT EXISTS page_digest_index ON page (digest);
+         CREATE TABLE IF NOT EXISTS blob (
+             digest TEXT PRIMARY KEY,
+             data BLOB NOT NULL,
+             size INTEGER NOT NULL,
+             raw_size INTEGER NOT NULL
+         );
+         """
+
+
+@dataclass
+class CachedPage:
+    """
+    Class representing a page stored in the cache.
+    """
+
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    raw_size: int
+
+
+class PageCache:
+    """Thread-safe, size-bounded on-disk cache of page HTML keyed by article title.
+
+    :param filename: the path of the SQLite file holding the cache. Its folder is created if needed.
+    :type filename: str
+    :param max_bytes: the budget for the compressed pages, in bytes.
+    :type max_bytes: int
+    :param ttl: the number of seconds a page is served without revalidating it.
+    :type ttl: float
+    :param compression_level: the zlib compression level.
+    :type compression_level: int
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 512 * 1024 * 1024, ttl: float = 7 * 24 * 3600,
+                 compression_level: int = 6):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compression_level = compression_level
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        directory = path.dirname(path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode = WAL;')
+        self._db.executescript(SCHEMA)
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blob;').fetchone()[0]
+
+    @staticmethod
+    def from_config(config_filename: str = None):
+        """Creates a cache from the ``[PAGE_CACHE]`` section of a config file.
+
+        :param config_filename: the path of the config file (default: ``scraper.ini`` next to this module).
+        :returns: the page cache, or None if it is disabled.
+        :rtype: PageCache
+        """
+        module_dir = path.dirname(path.abspath(__file__))
+        if config_filename is None:
+            config_filename = path.join(module_dir, CONFIG_FILE)
+        config = _read_config(config_filename)
+        if not config.getboolean('PAGE_CACHE', 'Enabled', fallback=False):
+            return None
+        filename = path.join(module_dir, config.get('PAGE_CACHE', 'Filename', fallback='page_cache/pages.db'))
+        return PageCache(filename,
+                         max_bytes=config.getint('PAGE_CACHE', 'MaxBytes', fallback=512 * 1024 * 1024),
+                         ttl=config.getfloat('PAGE_CACHE', 'TTL', fallback=7 * 24 * 3600))
+
+    @staticmethod
+    def _key(title: str) -> str:
+        return title.replace(' ', '_')
+
+    def get(self, title: str) -> Optional[CachedPage]:
+        """Gets the cached page of a title, marking it as recently used. The page may be stale.
+
+        :param title: the title of the article.
+        :returns: the cached page, or None if the title is not cached.
+        :rtype: CachedPage
+        """
+        with self._lock:
+            row = self._db.execute('''
+                                   SELECT data, etag, last_modified, fetched_at, raw_size
+                                   FROM page JOIN blob ON page.digest = blob.digest
+                                   WHERE title = ?;
+                                   ''', (self._key(title),)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE page SET accessed_at = ? WHERE title = ?;', (time.time(), self._key(title)))
+        data, etag, last_modified, fetched_at, raw_size = row
+        return CachedPage(zlib.decompress(data).decode('utf-8'), etag, last_modified, fetched_at, raw_size)
+
+    def put(self, title: str, html: str, etag: str = None, last_modified: str = None):
+        """Caches the page of a title, evicting the least recently used titles if the cache is over budget.
+
+        :param title: the title of the article.
+        :param html: the HTML of the page.
+        :param etag: the ETag header of the response, if any.
+        :param last_modified: the Last-Modified header of the response, if any.
+        """
+        raw = html.encode('utf-8')
+        digest = hashlib.sha1(raw).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE;')
+            try:
+                previous = self._db.execute('SELECT digest FROM page WHERE title = ?;', (self._key(title),)).fetchone()
+                if self._db.execute('SELECT 1 FROM blob WHERE digest = ?;', (digest,)).fetchone() is None:
+                    data = zlib.compress(raw, self.compression_level)
+                    self._db.execute('INSERT INTO blob (digest, data, size, raw_size) VALUES (?, ?, ?, ?);',
+                                     (digest, data, len(data), len(raw)))
+                    self._size += len(data)
+                self._db.execute('''
+                                 INSERT OR REPLACE INTO page (title, digest, etag, last_modified, fetched_at,
+                                     accessed_at)
+                                 VALUES (?, ?, ?, ?, ?, ?);
+                                 ''', (self._key(title), digest, etag, last_modified, now, now))
+                if previous is not None and previous[0] != digest:
+                    self._delete_if_orphaned(previous[0])
+                self._evict()
+                self._db.execute('COMMIT;')
+            except BaseException:
+                self._db.execute('ROLLBACK;')
+                self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blob;').fetchone()[0]
+                raise
+
+    def refresh(self, title: str):
+        """Marks the cached page of a title as fresh again, after the server confirmed it is unchanged."""
+        with self._lock:
+            self._db.execute('UPDATE page SET fetched_at = ? WHERE title = ?;', (time.time(), self._key(title)))
+
+    def _delete_if_orphaned(self, digest: str):
+        if self._db.execute('SELECT 1 FROM page WHERE digest = ?;', (digest,)).fetchone() is None:
+            row = self._db.execute('SELECT size FROM blob WHERE digest = ?;', (digest,)).fetchone()
+            if row is not None:
+                self._db.execute('DELETE FROM blob WHERE digest = ?;', (digest,))
+                self._size -= row[0]
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            oldest = self._db.execute('SELECT title, digest FROM page ORDER BY accessed_at LIMIT 64;').fetchall()
+            if not oldest:
+                break
+            for title, digest in oldest:
+                self._db.execute('DELETE FROM page WHERE title = ?;', (title,))
+                self._delete_if_orphaned(digest)
+                if self._size <= self.max_bytes:
+                    break
+
+    def fetch(self, title: str, url: str, client: HTTPClient = None) -> Optional[str]:
+        """Gets the HTML of a page, from the cache if it is fresh and from the network otherwise.
+
+        A stale page is revalidated with a conditional request. If the request fails, the stale page is served.
+
+        :param title: the title of the article.
+        :param url: the URL of the page.
+        :param client: the HTTP client to use (default: the shared client).
+        :returns: the HTML of the page, or None if it is not cached and the request fails.
+        """
+        cached = self.get(title)
+        if cached is not None and time.time() - cached.fetched_at < self.ttl:
+            self._count(hit=True, bytes_saved=cached.raw_size)
+            return cached.html
+
+        headers = dict()
+        if cached is not None:
+            if cached.etag is not None:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified is not None:
+                headers['If-Modified-Since'] = cached.last_modified
+        try:
+            response = (client or get_http_client()).get(url, headers=headers)
+        except requests.RequestException:
+            return None if cached is None else cached.html
+
+        if response.status_code == 304 and cached is not None:
+            self.refresh(title)
+            self._count(revalidated=True, bytes_saved=cached.raw_size)
+            return cached.html
+        self._count()
+        if not response.content:
+            return None
+        html = response.text
+        self.put(title, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return html
+
+    def _count(self, hit: bool = False, revalidated: bool = False, bytes_saved: int = 0):
+        with self._lock:
+            self.hits += hit
+            self.revalidations += revalidated
+            self.misses += not hit and not revalidated
+            self.bytes_saved += bytes_saved
+
+    def stats(self) -> dict:
+        """Gets the usage statistics of the cache since it was opened.
+
+        :returns: the fresh hits, the pages revalidated with a 304, the misses, the hit rate (counting
+            revalidations), the uncompressed bytes not downloaded, and the number and compressed size of the pages
+            stored.
+        """
+        with self._lock:
+            pages = self._db.execute('SELECT COUNT(*) FROM page;').fetchone()[0]
+            requests_served = self.hits + self.revalidations + self.misses
+            return {
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.revalidations) / requests_served if requests_served else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'pages': pages,
+                'size': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def close(self):
+        """Closes the cache file."""
+        with self._lock:
+            self._db.close()
+
+
+page_cache = None
+_page_cache_created = False
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Gets the process-wide page cache configured by ``scraper.ini``, opening it on first use.
+
+    :returns: the shared PageCache, or None if it is disabled.
+    :rtype: PageCache
+    """
+    global page_cache, _page_cache_created
+    with _page_cache_lock:
+        if not _page_cache_created:
+            page_cache = PageCache.from_config()
+            _page_cache_created = True
+        return page_cache
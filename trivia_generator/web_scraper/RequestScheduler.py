@@ -0,0 +1,268 @@
+"""
+RequestScheduler
+================
+
+Shared pacing of the scraper's outbound requests, configured by the ``[SCHEDULER]`` section of ``scraper.ini``.
+
+Every request waits for a token from a token bucket, which caps the request rate while allowing short bursts, and
+for a slot under an AIMD concurrency limit: the limit grows by about one request per round trip while responses are
+fast and successful, and halves when they are slow, throttled or failing. The rate is adjusted the same way when the
+server throttles: it halves on a 429 response and climbs back by about one request per second every second, up to
+the configured rate.
+
+Throttled and failed requests are retried after an exponential backoff with full jitter, or after the server's
+``Retry-After``, whichever is longer; a ``Retry-After`` also holds back every other request, since they all go to the
+same server.
+"""
+import random
+import threading
+import time
+from configparser import ConfigParser
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# Responses with these statuses mean the server is overloaded or briefly unavailable, so they are retried.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class ClientError(requests.RequestException):
+    """Base class of request errors that are down to the request or its response rather than the server's load, e.g.
+    a response that is too large. They are not retried and do not lower the scheduler's limits."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    :param rate: the number of tokens added per second.
+    :type rate: float
+    :param burst: the most tokens the bucket holds.
+    :type burst: float
+    :param min_rate: the lowest ``decrease`` takes the rate (default: 1/32 of *rate*).
+    :type min_rate: float
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float = None):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 32
+        self.burst = burst
+        self._last_decrease = 0.0
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """Takes a token, sleeping until one is available. Tokens are handed out in the order they were asked for.
+
+        :returns: the number of seconds waited.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def increase(self):
+        """Raises the rate a little after a request succeeds: by one request per second over a second's requests."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def decrease(self, factor: float = 0.5):
+        """Lowers the rate after the server throttled a request, at most once a second."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease > 1.0:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * factor)
+                self._last_decrease = now
+
+    def hold(self, seconds: float):
+        """Hands out no new tokens for *seconds*, e.g. after the server asked to retry later."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class AIMDLimiter:
+    """Concurrency limit adjusted by additive increase and multiplicative decrease.
+
+    :param initial: the starting limit.
+    :param minimum: the lowest the limit goes.
+    :param maximum: the highest the limit goes.
+    :param latency_target: requests slower than this many seconds count as a sign of overload.
+    :param decrease_factor: the factor the limit is multiplied by on overload.
+    """
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 32, latency_target: float = 2.0,
+                 decrease_factor: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits for the number of requests in flight to drop below the limit, then counts one more."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, overloaded: bool):
+        """Counts a finished request and adjusts the limit.
+
+        :param latency: the number of seconds the request took.
+        :param overloaded: whether the request failed or was throttled.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded or latency > self.latency_target:
+                # Requests that were already in flight report the same overload; only the first one counts.
+                if now - self._last_decrease > max(latency, self.latency_target):
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class RequestScheduler:
+    """Runs requests under a shared rate limit and adaptive concurrency limit, retrying the ones that can be.
+
+    :param rate: the most requests started per second. The scheduler starts at this rate and only goes lower while
+        the server throttles.
+    :type rate: float
+    :param burst: the most requests started at once after a quiet period.
+    :type burst: int
+    :param initial_concurrency: the starting concurrency limit.
+    :param min_concurrency: the lowest the concurrency limit goes.
+    :param max_concurrency: the highest the concurrency limit goes.
+    :param latency_target: requests slower than this many seconds lower the concurrency limit.
+    :param max_attempts: the most times a request is tried.
+    :param backoff_base: the backoff before the first retry, in seconds; it doubles on every retry.
+    :param backoff_cap: the longest backoff, in seconds.
+    """
+
+    def __init__(self, rate: float = 20.0, burst: int = 10, initial_concurrency: int = 4, min_concurrency: int = 1,
+                 max_concurrency: int = 32, latency_target: float = 2.0, max_attempts: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(initial_concurrency, min_concurrency, max_concurrency, latency_target)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config: ConfigParser):
+        """Reads the ``[SCHEDULER]`` section of the scraper config, using the defaults for missing options.
+
+        :returns: the scheduler, or None if it is disabled.
+        :rtype: RequestScheduler
+        """
+        if not config.getboolean('SCHEDULER', 'Enabled', fallback=False):
+            return None
+        return RequestScheduler(rate=config.getfloat('SCHEDULER', 'Rate', fallback=20.0),
+                                burst=config.getint('SCHEDULER', 'Burst', fallback=10),
+                                initial_concurrency=config.getint('SCHEDULER', 'InitialConcurrency', fallback=4),
+                                min_concurrency=config.getint('SCHEDULER', 'MinConcurrency', fallback=1),
+                                max_concurrency=config.getint('SCHEDULER', 'MaxConcurrency', fallback=32),
+                                latency_target=config.getfloat('SCHEDULER', 'LatencyTarget', fallback=2.0),
+                                max_attempts=config.getint('SCHEDULER', 'MaxAttempts', fallback=4),
+                                backoff_base=config.getfloat('SCHEDULER', 'BackoffBase', fallback=0.5),
+                                backoff_cap=config.getfloat('SCHEDULER', 'BackoffCap', fallback=30.0))
+
+    def run(self, request):
+        """Runs a request once a token and a concurrency slot are free, retrying it if it fails in a way that may
+        pass.
+
+        Connection errors, timeouts and HTTP errors with a status in ``RETRY_STATUSES`` are retried; any other
+        exception is raised straight away. A ``ClientError`` or another HTTP error does not count as overload.
+
+        :param request: a function that makes the request and returns its result.
+        :raises requests.RequestException: the error of the last attempt, if every attempt failed.
+        :returns: what *request* returned.
+        """
+        for attempt in range(self.max_attempts):
+            self.bucket.acquire()
+            self.limiter.acquire()
+            start = time.monotonic()
+            overloaded = True
+            try:
+                result = request()
+                overloaded = False
+                self.bucket.increase()
+                with self._lock:
+                    self.requests += 1
+                return result
+            except ClientError:
+                overloaded = False
+                with self._lock:
+                    self.requests += 1
+                raise
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(e.response, 'status_code', None)
+                with self._lock:
+                    self.requests += 1
+                    self.throttled += status == 429
+                if status == 429:
+                    self.bucket.decrease()
+                if isinstance(e, requests.HTTPError) and status not in RETRY_STATUSES:
+                    overloaded = False
+                    raise
+                if attempt + 1 == self.max_attempts:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                retry_after = _retry_after(e.response)
+                if retry_after is not None:
+                    self.bucket.hold(retry_after)
+            finally:
+                self.limiter.release(time.monotonic() - start, overloaded)
+            with self._lock:
+                self.retries += 1
+            backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            time.sleep(max(backoff, retry_after or 0))
+
+    def stats(self) -> dict:
+        """Gets the counts of requests, retries, throttled responses and failures, and the current limits."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'failures': self.failures,
+                'concurrency_limit': self.limiter.limit,
+                'in_flight': self.limiter.in_flight,
+                'rate': self.bucket.rate,
+            }
+
+
+def _retry_after(response) -> float:
+    """Reads the Retry-After header of a response, in seconds, or returns None if there is none."""
+    value = None if response is None else response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
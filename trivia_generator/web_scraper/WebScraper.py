@@ -4,22 +4,35 @@ WebScraper
 
 Gets contents and metadata from Wikipedia articles.
 """
-import json
+import itertools
 import random
-import re
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator
 
 import requests
-import bs4
 
-from database_connection.dbconn import DBConn
+from database_connection.async_dbconn import get_async_db_conn
+from database_connection.dbconn import get_db_conn
 from nlp_helpers import features
 
 from .Article import Article
+from .GeoSearchCache import get_geosearch_cache
+from .HTMLExtractor import extract_coordinates, extract_paragraphs, preprocess_text
+from .HTTPClient import get_http_client
+from .PageCache import get_page_cache
+from .WikipediaAPI import ArticleContent, fetch_article_contents, get_fetch_settings
+from .WikitextExtractor import extract_coordinates as extract_wikitext_coordinates
+from .WikitextExtractor import extract_paragraphs as extract_wikitext_paragraphs
 
 BASE_URL = 'https://en.wikipedia.org/wiki/'
 RANDOM_URL = 'https://en.wikipedia.org/wiki/Special:Random'
 LOCATION_URL_FORMAT = 'https://en.wikipedia.org/w/api.php?action=query&list=geosearch&gsradius=%d&gscoord=%lf|%lf&format=json'
+NEAREST_ARTICLE_COUNT = 10
+# The number of articles fetched at once by the iter_pages_by_* functions.
+PREFETCH_WORKERS = 8
+# The number of candidate titles tried per requested article before an iter_pages_by_* function gives up.
+PREFETCH_ATTEMPTS_PER_ARTICLE = 3
 
 
 def get_page_by_category(category: str) -> Article:
@@ -30,34 +43,40 @@ def get_page_by_category(category: str) -> Article:
     :returns: the Article obj ect representing the Wikipedia article.
 
     """
-    articles_with_category = DBConn().select_category_articles(category)
-    print("articles by category:", articles_with_category)
-    if not articles_with_category:
+    article_with_category = get_db_conn().select_random_category_article(category)
+    print("article by category:", article_with_category)
+    if article_with_category is None:
         return None
 
-    article_id, title = random.choice(articles_with_category)
-    url = BASE_URL + title.replace(' ', '_')
-    page_html = _get_page_from_title(title)
-    access_timestamp = int(time.time())
+    article_id, title = article_with_category
+    return _fetch_article(article_id, title, -1)
 
-    article = _get_article_features(page_html, url, access_timestamp, article_id)
-    return article
+def _draw_random_article() -> tuple:
+    """Draws a random article from the database, weighted by importance, or uniformly if no article has an
+    importance.
+
+    :returns: the article id, title and importance of the article, or None if the database has no articles.
+    """
+    drawn = get_db_conn().select_weighted_random_article()
+    if drawn is not None:
+        return drawn
+    articles = get_db_conn().select_random_articles(1)
+    if not articles:
+        return None
+    article_id, title = articles[0]
+    return article_id, title, -1
 
 def get_page_by_random() -> Article:
     """Gets the contents and metadata of a random Wikipedia article.
     
-    :returns: the Article object representing the Wikipedia article.
+    :returns: the Article object representing the Wikipedia article, or None if the database has no articles.
     """
-    article_id, title = None, None
-    page_html = None
-    url = None
-    while page_html is None:
-        article_id, title, importance = DBConn().select_weighted_random_article()
-        url = BASE_URL + title.replace(' ', '_')
-        page_html = _get_page_from_title(title)
-    access_timestamp = int(time.time())
-
-    article = _get_article_features(page_html, url, access_timestamp, article_id, importance)
+    article = None
+    while article is None:
+        drawn = _draw_random_article()
+        if drawn is None:
+            return None
+        article = _fetch_article(*drawn)
     return article
 
 # TODO change to make sure articles are in database.
@@ -94,23 +113,213 @@ def get_page_by_location_zip(zip_code: str):
     :param zip_code: the zipcode of the desired location, as a string
     :returns: the Article object representing the Wikipedia article
     """
-    article_id, title = None, None
-    page_html = None
-    url = None
-    while page_html is None:
-        article_list = DBConn().select_articles_location(zip_code)
+    article = None
+    while article is None:
+        article_list = get_db_conn().select_articles_location(zip_code)
+        if not article_list:
+            # Nothing within the search radius, so widen it to the closest articles.
+            article_list = [row[:2] for row in get_db_conn().select_nearest_articles(zip_code, NEAREST_ARTICLE_COUNT)]
         print("location article list: ", article_list)
         if article_list is None or len(article_list) == 0:
             print("didn't find anything at zip", zip_code)
             return None
         article_id, title = random.choice(article_list)
-        url = BASE_URL + title.replace(' ', '_')
-        page_html = _get_page_from_title(title)
-    access_timestamp = int(time.time())
-    article = _get_article_features(page_html, url, access_timestamp, article_id)
+        article = _fetch_article(article_id, title, -1)
     return article
 
 
+def iter_pages_by_random(count: int, max_workers: int = PREFETCH_WORKERS) -> Iterator[Article]:
+    """Fetches several random Wikipedia articles concurrently, weighted by importance as in ``get_page_by_random``.
+
+    :param count: the number of articles to fetch.
+    :type count: int
+    :param max_workers: the largest number of articles fetched at once.
+    :type max_workers: int
+    :returns: an iterator over the Article objects, in the order their fetches complete. Pages that fail to load are
+        replaced by other articles, up to a bounded number of attempts.
+    """
+    def candidates():
+        for _ in range(count * PREFETCH_ATTEMPTS_PER_ARTICLE):
+            drawn = _draw_random_article()
+            if drawn is None:
+                return
+            yield drawn
+
+    return _iter_articles(candidates(), count, max_workers)
+
+
+def iter_pages_by_category(category: str, count: int, max_workers: int = PREFETCH_WORKERS) -> Iterator[Article]:
+    """Fetches several Wikipedia articles with a given category concurrently.
+
+    :param category: the category with which to search.
+    :type category: str
+    :param count: the number of articles to fetch.
+    :type count: int
+    :param max_workers: the largest number of articles fetched at once.
+    :type max_workers: int
+    :returns: an iterator over the Article objects, in the order their fetches complete. It yields nothing if no
+        article has the category.
+    """
+    def candidates():
+        async_db_conn = get_async_db_conn()
+        # The next draw runs on the database query threads while the current candidate's page is fetched.
+        draw = async_db_conn.select_random_category_article(category)
+        for _ in range(count * PREFETCH_ATTEMPTS_PER_ARTICLE):
+            article_with_category = draw.result()
+            if article_with_category is None:
+                return
+            draw = async_db_conn.select_random_category_article(category)
+            article_id, title = article_with_category
+            yield article_id, title, -1
+
+    return _iter_articles(candidates(), count, max_workers)
+
+
+def iter_pages_by_location_zip(zip_code: str, count: int, max_workers: int = PREFETCH_WORKERS) -> Iterator[Article]:
+    """Fetches several distinct Wikipedia articles close to the given zip code concurrently.
+
+    :param zip_code: the zipcode of the desired location, as a string
+    :param count: the number of articles to fetch.
+    :type count: int
+    :param max_workers: the largest number of articles fetched at once.
+    :type max_workers: int
+    :returns: an iterator over the Article objects, in the order their fetches complete. It yields fewer than
+        *count* articles if fewer are located near the zip code.
+    """
+    article_list = get_db_conn().select_articles_location(zip_code)
+    if not article_list:
+        article_list = [row[:2] for row in get_db_conn().select_nearest_articles(zip_code, NEAREST_ARTICLE_COUNT)]
+    article_list = list(article_list)
+    random.shuffle(article_list)
+    return _iter_articles(((article_id, title, -1) for article_id, title in article_list), count, max_workers)
+
+
+def _unique_candidates(candidates: Iterator[tuple]) -> Iterator[tuple]:
+    """Leaves out the candidates whose article id came up before, as random draws can repeat."""
+    seen = set()
+    for candidate in candidates:
+        if candidate[0] not in seen:
+            seen.add(candidate[0])
+            yield candidate
+
+
+def _iter_articles(candidates: Iterator[tuple], count: int, max_workers: int) -> Iterator[Article]:
+    """Fetches and parses candidate articles on a thread pool until *count* of them succeed.
+
+    At most *max_workers* fetches are in flight; a new candidate is started each time one completes. In the ``api``
+    fetch mode, candidates are queried in batches instead.
+
+    :param candidates: the article id, title and importance of each candidate, in the order to try them. Candidates
+        whose article was already tried are skipped, so the same article is never yielded twice.
+    :param count: the number of articles to yield.
+    :param max_workers: the largest number of articles fetched at once.
+    :returns: an iterator over the Article objects, in the order their fetches complete.
+    """
+    candidates = _unique_candidates(candidates)
+    if get_fetch_settings().mode == 'api':
+        yield from _iter_articles_from_api(candidates, count, max_workers)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+    pending = set()
+    produced = 0
+    try:
+        while produced < count:
+            while len(pending) < max_workers and produced + len(pending) < count:
+                candidate = next(candidates, None)
+                if candidate is None:
+                    break
+                pending.add(executor.submit(_fetch_article, *candidate))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                article = future.result()
+                if article is not None:
+                    produced += 1
+                    yield article
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _iter_articles_from_api(candidates: Iterator[tuple], count: int, max_workers: int) -> Iterator[Article]:
+    """Queries the wikitext and coordinates of candidate articles in batches until *count* of them succeed.
+
+    Several batch queries are in flight at once on a thread pool, and the articles of each batch are parsed on the
+    same pool as soon as its response arrives, so articles are yielded as they are ready rather than after every
+    batch has been fetched.
+
+    :param candidates: the article id, title and importance of each candidate, in the order to try them.
+    :param count: the number of articles to yield.
+    :param max_workers: the largest number of queries and parses running at once.
+    :returns: an iterator over the Article objects, in the order their parses complete.
+    """
+    settings = get_fetch_settings()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+    queries = dict()
+    parses = set()
+    produced = 0
+    try:
+        while produced < count:
+            # Keep just enough titles in flight to make up the articles still needed.
+            in_flight = sum(len(batch) for batch in queries.values()) + len(parses)
+            while produced + in_flight < count and len(queries) < max_workers:
+                batch = list(itertools.islice(candidates, min(count - produced - in_flight, settings.batch_size)))
+                if not batch:
+                    break
+                future = executor.submit(fetch_article_contents, [title for _, title, _ in batch], settings.api_url,
+                                         settings.batch_size)
+                queries[future] = batch
+                in_flight += len(batch)
+            if not queries and not parses:
+                return
+            done, _ = wait(set(queries) | parses, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in queries:
+                    batch = queries.pop(future)
+                    try:
+                        contents = future.result()
+                    except (requests.RequestException, ValueError):
+                        continue
+                    for article_id, title, importance in batch:
+                        if title in contents:
+                            parses.add(executor.submit(_get_article_from_content, contents[title], article_id,
+                                                       importance))
+                else:
+                    parses.discard(future)
+                    produced += 1
+                    yield future.result()
+    finally:
+        for future in list(queries) + list(parses):
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _fetch_article(article_id: int, title: str, importance: float) -> Article:
+    """Gets and parses one article, using the configured fetch mode.
+
+    :returns: the Article, or None if its page fails to load.
+    """
+    settings = get_fetch_settings()
+    if settings.mode == 'api':
+        try:
+            contents = fetch_article_contents([title], settings.api_url)
+        except (requests.RequestException, ValueError):
+            return None
+        if title not in contents:
+            return None
+        return _get_article_from_content(contents[title], article_id, importance)
+
+    page_html = _get_page_from_title(title)
+    if page_html is None:
+        return None
+    access_timestamp = int(time.time())
+    return _get_article_features(page_html, BASE_URL + title.replace(' ', '_'), access_timestamp, article_id,
+                                 importance)
+
+
 def _get_nearby_articles(latitude: float, longitude: float, radius: int) -> list:
     """Gets a list of Wikipedia articles that are located close to the given coordinates:
     
@@ -122,18 +331,17 @@ def _get_nearby_articles(latitude: float, longitude: float, radius: int) -> list
     :type radius: int
     :returns: a list of Wikipedia page titles.
     """
-    req = None
+    geosearch_cache = get_geosearch_cache()
+    if geosearch_cache is not None:
+        return geosearch_cache.search(latitude, longitude, radius)
+
     res = None
     try:
         url = LOCATION_URL_FORMAT % (radius, latitude, longitude)
-        req = requests.get(url)
-        res = json.loads(req.text)
-        
-    except ConnectionError:
+        res = get_http_client().get(url).json()
+    except requests.RequestException:
         return None
-    except requests.HTTPError:
-        return None
-    except requests.Timeout:
+    except ValueError:
         return None
 
     if 'query' in res.keys():
@@ -144,22 +352,20 @@ def _get_nearby_articles(latitude: float, longitude: float, radius: int) -> list
     return article_titles
 
 def _get_page_from_title(title: str) -> str:
-    """Gets the HTML of a web page from an article title.
+    """Gets the HTML of a web page from an article title, from the page cache if it is enabled.
 
     :param title: the title of the article from which to get the HTML.
     :type title: str
-    :returns: the HTML and URL of the retrieved web page, or (None, None) if request fails.
+    :returns: the HTML of the retrieved web page, or None if the request fails or the page is empty.
     """
     url = BASE_URL + title.replace(' ', '_')
-    req = None
-    try:
-        req = requests.get(url)
+    page_cache = get_page_cache()
+    if page_cache is not None:
+        return page_cache.fetch(title, url) or None
 
-    except ConnectionError:
-        return None
-    except requests.HTTPError:
-        return None
-    except requests.Timeout:
+    try:
+        req = get_http_client().get(url)
+    except requests.RequestException:
         return None
 
     page_html = req.text
@@ -174,15 +380,9 @@ def _get_page_and_url(url: str) -> (str, str):
     :type url: str
     :returns: the HTML and URL of the retrieved web page, or (None, None) if request fails.
     """
-    req = None
     try:
-        req = requests.get(url)
-
-    except ConnectionError:
-        return None, None
-    except requests.HTTPError:
-        return None, None
-    except requests.Timeout:
+        req = get_http_client().get(url)
+    except requests.RequestException:
         return None, None
 
     page_html = req.text
@@ -203,41 +403,55 @@ def _get_article_features(page_html: str, url: str, access_timestamp: int, artic
     :type article_id: int.
     :returns: the Article object representing the Wikipedia page.
     """
-    soup = bs4.BeautifulSoup(page_html, features="html.parser")
-    content = ''
-    for tag in soup.findAll('p'):
-        span_tags = tag.findAll('span')
-        # Check if there is LaTeX in the paragraph tag.
-        for span in span_tags:
-            if span.has_attr('mwe-math-element'):
-                break
-        else:
-            content += ''.join(tag.strings) + '\n'
-
-    content = preprocess_text(content)
-    content = features.resolve_coreferences(content)
+    lat_text, long_text = extract_coordinates(page_html)
+    if lat_text is not None and long_text is not None:
+        longitude = convert_dms_to_decimal(long_text)
+        latitude = convert_dms_to_decimal(lat_text)
+    else:
+        longitude = None
+        latitude = None
 
-    # Get categories from original Wikipedia article.
-    categories = DBConn().select_article_categories(article_id)
+    return _build_article(extract_paragraphs(page_html), url, access_timestamp, article_id, importance, latitude,
+                          longitude)
 
-    # Convert list of tuples to list of strings.
-    categories = [category[0] for category in categories]
+
+def _get_article_from_content(content: ArticleContent, article_id: int = 1, importance: float = -1) -> Article:
+    """Builds an Article from the wikitext and coordinates returned by the Wikipedia API.
+
+    :param content: the wikitext and coordinates of the article.
+    :type content: ArticleContent
+    :param article_id: the ID of the article in the database.
+    :type article_id: int
+    :returns: the Article object representing the Wikipedia page.
+    """
+    latitude, longitude = content.latitude, content.longitude
+    if latitude is None or longitude is None:
+        latitude, longitude = extract_wikitext_coordinates(content.wikitext)
+    return _build_article(extract_wikitext_paragraphs(content.wikitext), BASE_URL + content.title.replace(' ', '_'),
+                          int(time.time()), article_id, importance, latitude, longitude)
+
+
+def _build_article(paragraphs: str, url: str, access_timestamp: int, article_id: int, importance: float,
+                   latitude: float, longitude: float) -> Article:
+    """Cleans the text of an article and looks up its categories.
+
+    :param paragraphs: the text of the paragraphs of the article, one per line.
+    :returns: the Article object representing the Wikipedia page.
+    """
+    # Start the category query now so it runs while the text is cleaned and its coreferences are resolved.
+    categories_future = get_async_db_conn().select_article_categories(article_id)
+
+    content = preprocess_text(paragraphs)
+    content = features.resolve_coreferences(content)
+
+    # Get categories from original Wikipedia article. These are the category names themselves, not rows.
+    categories = categories_future.result()
 
     # categories_div = soup.find('div', {'id': 'mw-normal-catlinks'})
     # if categories_div.ul.children:
     #     for li in categories_div.ul.children:
     #         categories.append(li.text)
 
-    long_span = soup.find('span', {'class': 'longitude'})
-    lat_span = soup.find('span', {'class': 'latitude'})
-
-    if long_span and lat_span:
-        longitude = convert_dms_to_decimal(long_span.text)
-        latitude = convert_dms_to_decimal(lat_span.text)
-    else:
-        longitude = None
-        latitude = None
-    
     article = Article(content, url, article_id, categories, importance, access_timestamp, latitude, longitude)
     return article
 
@@ -270,16 +484,3 @@ def convert_dms_to_decimal(dms_coord: str) -> float:
     except Exception as e:
         print(e, dms_coord)
         return None
-
-def preprocess_text(content: str) -> str:
-    # Remove sentences that end with [citation needed].
-    while '[citation needed]' in content:
-        content = re.sub(r'\.([^.]*?\.)\[citation needed\]', '.', content)
-
-    # Remove citations and notes.
-    content = re.sub(r' ?\[.*?\]', '', content)
-
-    # Remove content in parentheses.
-    content = re.sub(r' ?\(.*?\)', '', content)
-
-    return content
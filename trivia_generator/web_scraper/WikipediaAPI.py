@@ -0,0 +1,149 @@
+"""
+WikipediaAPI
+============
+
+Content-only article fetches through the MediaWiki Action API, configured by the ``[FETCH]`` section of
+``scraper.ini``.
+
+Instead of the full skinned page, one query asks for the wikitext of the latest revision (``prop=revisions``) and the
+primary coordinates (``prop=coordinates``) of a whole batch of titles, so a batch of article bodies costs one round
+trip. The wikitext is turned into paragraphs by ``WikitextExtractor``, the same way as the pages of the XML dumps.
+"""
+from dataclasses import dataclass
+from os import path
+from typing import Iterable, Optional
+
+from .HTTPClient import CONFIG_FILE, HTTPClient, _read_config, get_http_client
+
+API_URL = 'https://en.wikipedia.org/w/api.php'
+# The most titles the API accepts in one query.
+MAX_BATCH_SIZE = 50
+
+
+@dataclass
+class ArticleContent:
+    """
+    Class representing the wikitext and coordinates of an article, as returned by the API.
+    """
+
+    title: str
+    wikitext: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+@dataclass
+class FetchSettings:
+    """How the scraper gets the articles it parses.
+
+    :param mode: ``html`` to download the full page from ``BASE_URL``, or ``api`` to query only the article body and
+        coordinates from the Action API.
+    :type mode: str
+    :param api_url: the URL of the Action API.
+    :type api_url: str
+    :param batch_size: the number of titles queried together in ``api`` mode.
+    :type batch_size: int
+    """
+    mode: str = 'html'
+    api_url: str = API_URL
+    batch_size: int = 10
+
+    @staticmethod
+    def from_config(config_filename: str = None):
+        """Reads the ``[FETCH]`` section of a config file, using the defaults for missing options.
+
+        :param config_filename: the path of the config file (default: ``scraper.ini`` next to this module).
+        :raises ValueError: if the mode is neither ``html`` nor ``api``.
+        :rtype: FetchSettings
+        """
+        if config_filename is None:
+            config_filename = path.join(path.dirname(path.abspath(__file__)), CONFIG_FILE)
+        config = _read_config(config_filename)
+        settings = FetchSettings(mode=config.get('FETCH', 'Mode', fallback='html').lower(),
+                                 api_url=config.get('FETCH', 'ApiUrl', fallback=API_URL),
+                                 batch_size=min(config.getint('FETCH', 'ApiBatchSize', fallback=10), MAX_BATCH_SIZE))
+        if settings.mode not in ('html', 'api'):
+            raise ValueError(f'unknown fetch mode {settings.mode!r}')
+        return settings
+
+
+fetch_settings = None
+
+
+def get_fetch_settings() -> FetchSettings:
+    """Gets the fetch settings configured by ``scraper.ini``.
+
+    :rtype: FetchSettings
+    """
+    global fetch_settings
+    if fetch_settings is None:
+        fetch_settings = FetchSettings.from_config()
+    return fetch_settings
+
+
+def fetch_article_contents(titles: Iterable[str], api_url: str = API_URL, batch_size: int = 10,
+                           client: HTTPClient = None) -> dict:
+    """Gets the wikitext and coordinates of several articles, a batch of titles per query.
+
+    Titles are normalized and redirects are followed, but the result is keyed by the titles as given.
+
+    :param titles: the titles of the articles.
+    :param api_url: the URL of the Action API.
+    :param batch_size: the number of titles per query, at most ``MAX_BATCH_SIZE``.
+    :param client: the HTTP client to use (default: the shared client).
+    :raises requests.RequestException: if a request fails.
+    :raises ValueError: if a response is not valid JSON.
+    :returns: the ArticleContent of each title that exists and has a body.
+    :rtype: {str: ArticleContent}
+    """
+    if client is None:
+        client = get_http_client()
+    titles = list(dict.fromkeys(titles))
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    contents = dict()
+    for start in range(0, len(titles), batch_size):
+        batch = titles[start:start + batch_size]
+        pages = dict()
+        aliases = dict()
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': '2',
+            'prop': 'revisions|coordinates',
+            'rvprop': 'content',
+            'rvslots': 'main',
+            'titles': '|'.join(title.replace('_', ' ') for title in batch),
+            'redirects': '1',
+            'colimit': 'max',
+        }
+        # The API only continues a query when the batch's wikitext is too large for one response.
+        while True:
+            response = client.get(api_url, params=params).json()
+            query = response.get('query', {})
+            for alias in query.get('normalized', []) + query.get('redirects', []):
+                aliases[alias['from']] = alias['to']
+            for page in query.get('pages', []):
+                merged = pages.setdefault(page['title'], dict())
+                for revision in page.get('revisions', []):
+                    content = revision.get('slots', {}).get('main', {}).get('content')
+                    if content:
+                        merged['wikitext'] = content
+                for coordinates in page.get('coordinates', []):
+                    if coordinates.get('primary', True) and 'lat' in coordinates:
+                        merged['coordinates'] = (coordinates['lat'], coordinates['lon'])
+            if 'continue' not in response:
+                break
+            params.update(response['continue'])
+
+        for title in batch:
+            resolved = title.replace('_', ' ')
+            seen = set()
+            while resolved in aliases and resolved not in seen:
+                seen.add(resolved)
+                resolved = aliases[resolved]
+            page = pages.get(resolved)
+            if page is None or 'wikitext' not in page:
+                continue
+            latitude, longitude = page.get('coordinates', (None, None))
+            contents[title] = ArticleContent(resolved, page['wikitext'], latitude, longitude)
+    return contents
@@ -0,0 +1,161 @@
+"""
+WikitextExtractor
+=================
+
+Pulls the article text and coordinates out of the wikitext of a Wikipedia page, as found in the XML dumps.
+
+The text comes out in the same shape as ``HTMLExtractor.extract_paragraphs``: the prose paragraphs of the article, one
+per line, with templates, tables, references, files, headings and lists left out and links replaced by their labels.
+"""
+import html
+import re
+from typing import Optional, Tuple
+
+COMMENT_RE = re.compile(r'<!--.*?(?:-->|$)', re.DOTALL)
+REF_RE = re.compile(r'<ref\b[^>]*/>|<ref\b[^>]*>.*?</ref\s*>', re.DOTALL | re.IGNORECASE)
+BLOCK_TAG_RE = re.compile(r'<(math|chem|ce|gallery|timeline|syntaxhighlight|source|score|graph|mapframe|imagemap)\b'
+                          r'[^>]*>.*?</\1\s*>', re.DOTALL | re.IGNORECASE)
+HTML_TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+TEMPLATE_TOKEN_RE = re.compile(r'\{\{|\}\}')
+LINK_TOKEN_RE = re.compile(r'\[\[|\]\]')
+EXTERNAL_LINK_RE = re.compile(r'\[(?:https?:)?//[^\s\]]+(?: ([^\]]*))?\]')
+BOLD_ITALIC_RE = re.compile(r"'{2,5}")
+MAGIC_WORD_RE = re.compile(r'__[A-Z]+__')
+HEADING_RE = re.compile(r'^=+.*=+\s*$')
+SPACES_RE = re.compile(r'[ \t\xa0]+')
+COORD_RE = re.compile(r'\{\{\s*[Cc]oord\s*\|([^{}]*)\}\}')
+
+# Links into these namespaces are not part of the text.
+DROPPED_NAMESPACES = {'file', 'image', 'media', 'category'}
+# Lines starting with these are lists, indents, tables or leftovers of them, not prose.
+NON_PROSE_PREFIXES = ('*', '#', ':', ';', '|', '!', '{', '}')
+
+
+def _strip_nested(text: str, token_re, replace) -> str:
+    """Replaces every outermost bracketed span (e.g. ``{{...}}``) with ``replace(inner_text)``, handling nesting.
+    Unbalanced openings run to the end of the text."""
+    pieces = []
+    depth = 0
+    start = 0
+    inner_start = 0
+    for token in token_re.finditer(text):
+        if token.group() in ('{{', '[['):
+            if depth == 0:
+                pieces.append(text[start:token.start()])
+                inner_start = token.end()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                pieces.append(replace(text[inner_start:token.start()]))
+                start = token.end()
+    if depth == 0:
+        pieces.append(text[start:])
+    return ''.join(pieces)
+
+
+def _link_label(link: str) -> str:
+    target, _, label = link.partition('|')
+    namespace, colon, _ = target.partition(':')
+    if colon and namespace.strip().lower() in DROPPED_NAMESPACES:
+        return ''
+    if '[[' in label:
+        label = _strip_nested(label, LINK_TOKEN_RE, _link_label)
+    # [[Target|label]] shows the label; [[Target]] shows the target, without any section anchor
+    return label.split('|')[-1] if label else target.split('#')[0]
+
+
+def _strip_tables(text: str) -> str:
+    lines = []
+    depth = 0
+    for line in text.split('\n'):
+        stripped = line.lstrip()
+        if stripped.startswith('{|'):
+            depth += 1
+        elif stripped.startswith('|}') and depth > 0:
+            depth -= 1
+        elif depth == 0:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def extract_paragraphs(wikitext: str) -> str:
+    """Gets the text of the prose paragraphs of a page's wikitext.
+
+    :param wikitext: the wikitext of the page.
+    :returns: the text of each paragraph, followed by a newline.
+    """
+    text = COMMENT_RE.sub('', wikitext)
+    text = REF_RE.sub('', text)
+    text = BLOCK_TAG_RE.sub('', text)
+    text = _strip_nested(text, TEMPLATE_TOKEN_RE, lambda template: '')
+    text = _strip_tables(text)
+    text = _strip_nested(text, LINK_TOKEN_RE, _link_label)
+    text = EXTERNAL_LINK_RE.sub(lambda link: link.group(1) or '', text)
+    text = HTML_TAG_RE.sub('', text)
+    text = BOLD_ITALIC_RE.sub('', text)
+    text = MAGIC_WORD_RE.sub('', text)
+    text = html.unescape(text)
+
+    paragraphs = []
+    lines = []
+    for line in text.split('\n') + ['']:
+        line = line.strip()
+        if not line or HEADING_RE.match(line) or line.startswith(NON_PROSE_PREFIXES):
+            if lines:
+                paragraphs.append(SPACES_RE.sub(' ', ' '.join(lines)) + '\n')
+                lines = []
+        else:
+            lines.append(line)
+    return ''.join(paragraphs)
+
+
+def _parse_coord(arguments: str) -> Optional[Tuple[float, float]]:
+    positional = [argument.strip() for argument in arguments.split('|') if '=' not in argument]
+    try:
+        for i, argument in enumerate(positional):
+            if argument.upper() in ('N', 'S'):
+                latitude = _dms(positional[:i], argument.upper() == 'S')
+                rest = positional[i + 1:]
+                for j, long_argument in enumerate(rest):
+                    if long_argument.upper() in ('E', 'W'):
+                        longitude = _dms(rest[:j], long_argument.upper() == 'W')
+                        break
+                else:
+                    return None
+                break
+        else:
+            latitude, longitude = float(positional[0]), float(positional[1])
+    except (ValueError, IndexError):
+        return None
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return None
+    return latitude, longitude
+
+
+def _dms(parts: list, negative: bool) -> float:
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f'bad DMS coordinate {parts}')
+    value = sum(float(part) / 60 ** i for i, part in enumerate(parts) if part != '')
+    return -value if negative else value
+
+
+def extract_coordinates(wikitext: str) -> Tuple[Optional[float], Optional[float]]:
+    """Gets the coordinates of the subject of a page from its ``{{coord}}`` templates.
+
+    The template displayed next to the page title is preferred; otherwise the first one that parses is used.
+
+    :param wikitext: the wikitext of the page.
+    :returns: the latitude and longitude in decimal degrees, or (None, None) if the page has no coordinates.
+    """
+    first = None
+    for match in COORD_RE.finditer(COMMENT_RE.sub('', wikitext)):
+        coordinates = _parse_coord(match.group(1))
+        if coordinates is None:
+            continue
+        display = re.search(r'\|\s*display\s*=([^|]*)', match.group(1))
+        if display is not None and 't' in display.group(1).replace('inline', '').lower():
+            return coordinates
+        if first is None:
+            first = coordinates
+    return first if first is not None else (None, None)
@@ -3,14 +3,20 @@ Game
 ====
 """
 import random
+from concurrent.futures import Future
 
 from .Player import Player
 from .GameSettings import GameSettings
-from trivia_generator.web_scraper.WebScraper import get_page_by_random
-from trivia_generator.web_scraper.WebScraper import get_page_by_category
-from trivia_generator.web_scraper.WebScraper import get_page_by_location_zip
+from trivia_generator.web_scraper.WebScraper import iter_pages_by_random
+from trivia_generator.web_scraper.WebScraper import iter_pages_by_category
+from trivia_generator.web_scraper.WebScraper import iter_pages_by_location_zip
 from trivia_generator.NLPPreProcessor import create_TUnits
 from question_generator.NLPQuestionGeneratorSpacy import nlp_question_generation
+from database_connection.async_dbconn import get_async_db_conn
+from database_connection.vote_buffer import get_rank_vote_buffer
+
+# The number of articles fetched together whenever a game runs out of prefetched articles.
+ARTICLE_PREFETCH_COUNT = 4
 
 
 class Game:
@@ -39,9 +45,11 @@ class Game:
         self.current_state = "LOBBY"
         self.game_started = False
         self.current_trivia = ""
+        self.current_tunit = None
         self.number_of_responses = 0
         self.number_of_lies = 0
         self.current_answer = ""
+        self.prefetched_articles = []
 
     def add_player_to_lobby(self, player: Player) -> bool:
         """Adds a player to the current game lobby.
@@ -84,6 +92,13 @@ class Game:
         """
         return self.round_number
 
+    def is_game_over(self) -> bool:
+        """Returns whether every round of the game has been played.
+
+        :returns: True if the last round has been played, False otherwise
+        """
+        return self.round_number > self.game_settings.number_of_rounds
+
     def get_score(self) -> dict:
         """creates and returns dictionary with the name and score of each player in game 
 
@@ -102,29 +117,45 @@ class Game:
     def get_next_trivia(self) -> str:
         """Fetches a trivia question for the upcoming round from the trivia database, based on the current GameSettings.
 
-        :returns: a trivia question
+        :returns: a trivia question, or None if no article could be fetched
         """
         quest_ans_pairs = []
         while not quest_ans_pairs:
-            if self.game_settings.game_mode == 'category':
-                print("getting article by category")
-                trivia_article = get_page_by_category(self.game_settings.category)
-            elif self.game_settings.game_mode == 'location':
-                print("getting article by location")
-                trivia_article = get_page_by_location_zip(self.game_settings.zip_code)
-            else:
-                print("getting article by random")
-                trivia_article = get_page_by_random()
+            trivia_article = self._next_article()
+            if trivia_article is None:
+                print("could not fetch an article for the game settings")
+                return None
             tunit_list = create_TUnits(trivia_article)
             if len(tunit_list) > 0:
                 tunit = random.choice(tunit_list)
                 quest_ans_pairs = nlp_question_generation(tunit.sentence)
         trivia_question, trivia_answer = random.choice(quest_ans_pairs)
         print('found trivia!')
+        self.current_tunit = tunit
         self.current_trivia = trivia_question
         self.current_answer = trivia_answer
         return trivia_question
 
+    def _next_article(self):
+        """Takes the next prefetched article, fetching a batch of articles concurrently if none are left.
+
+        :returns: an Article matching the current GameSettings, or None if none could be fetched.
+        """
+        if not self.prefetched_articles:
+            if self.game_settings.game_mode == 'category':
+                print("getting articles by category")
+                articles = iter_pages_by_category(self.game_settings.category, ARTICLE_PREFETCH_COUNT)
+            elif self.game_settings.game_mode == 'location':
+                print("getting articles by location")
+                articles = iter_pages_by_location_zip(self.game_settings.zip_code, ARTICLE_PREFETCH_COUNT)
+            else:
+                print("getting articles by random")
+                articles = iter_pages_by_random(ARTICLE_PREFETCH_COUNT)
+            self.prefetched_articles = list(articles)
+        if not self.prefetched_articles:
+            return None
+        return self.prefetched_articles.pop()
+
     def submit_answer(self, data: dict) -> list:
         """Retrives an answer the current trivia question from a given player.
 
@@ -169,7 +200,7 @@ class Game:
 
         """Returns the answer to the current trivia, and the responses of each player
 
-        :returns: a dictionary containing the trivia answer, and player answers
+        :returns: a dictionary containing the trivia answer, player answers, and whether that was the last round
         """
         data = dict()
         data['answer'] = self.current_answer
@@ -180,16 +211,20 @@ class Game:
             data['player_answers'][player.name]['answer'] = player.current_answer
             is_correct = (player.current_answer == self.current_answer)
             data['player_answers'][player.name]['correct'] = is_correct
+            if player.current_answer != "":
+                player.record_answer(is_correct)
             player.current_answer = ""
         self.round_number += 1
         self.update_scores(data)
         self.number_of_responses = 0
+        data['game_over'] = self.is_game_over()
         return data
 
     def get_fibbage_answer_and_responses(self) -> dict:
         """Returns the answer to the current trivia, and the lies+answers of each player
 
-        :returns: a dictionary containing the trivia answer, and the lie and answer of each player
+        :returns: a dictionary containing the trivia answer, the lie and answer of each player, and whether that was
+            the last round
         """
         data = dict()
         data['answer'] = self.current_answer
@@ -200,6 +235,8 @@ class Game:
             player_info['answer'] = player.current_answer
             is_correct = (player.current_answer == self.current_answer)
             player_info['correct'] = is_correct
+            if player.current_answer != "":
+                player.record_answer(is_correct)
             player_info['lie'] = player.current_lie
             num_fooled = len([p.current_answer
                               for p in self.players
@@ -211,6 +248,7 @@ class Game:
         # self.update_fibbage_scores(data) TODO
         self.number_of_responses = 0
         self.update_fibbage_scores(data)
+        data['game_over'] = self.is_game_over()
         return data
 
     def get_fibbage_lies_and_answer(self) -> dict:
@@ -248,11 +286,16 @@ class Game:
                 # TODO determine how many points they should get
                 player.update_score(1)
 
-    def submit_trivia_rank(self, rank):
-        # TODO
-        # 1. find current trivia TUnit
-        # 2. update TUnit in DB based on rank
+    def submit_trivia_rank(self, rank: str) -> bool:
+        """Records a player's rank of the current trivia. Votes are aggregated and written to the database in batches.
+
+        :param rank: one of 'like', 'meh' or 'dislike'
+        :returns: True if the rank was recorded, False if there is no current trivia or the rank is not valid
+        """
         print("trivia recieved rank", rank)
+        if self.current_tunit is None:
+            return False
+        return get_rank_vote_buffer().add_vote(self.current_tunit, rank)
 
     def display_category_options(self) -> bool:
         """If applicable (depending on game mode), send a list of possible categories that a player can choose from to the front end, which will be displayed to the selected user.
@@ -273,12 +316,31 @@ class Game:
         """
         pass
 
-    def finish_game(self) -> bool:
-        """After all rounds have been completed, sents "credits" information to front-end and updates statistics for all registered users.
-        
-        :returns: True if info was successfully sent to front-end and user statistics were updated, false otherwise
+    def finish_game(self) -> Future:
+        """After all rounds have been completed, updates statistics for all registered users.
+
+        The players with the highest score win. Every registered player's results are written in one transaction, on
+        the database query threads, so the caller can show the final scores without waiting for the write.
+
+        :returns: a future that resolves to True if user statistics were updated, False otherwise
         """
-        pass
+        self.current_state = "FINISHED"
+        finished = Future()
+        if not self.players:
+            finished.set_result(True)
+            return finished
+        high_score = max(player.current_score for player in self.players)
+        statistics = dict()
+        for player in self.players:
+            player.update_statistics(player.current_score == high_score, statistics)
+
+        def record_result(update: Future):
+            if update.exception() is not None:
+                print("could not update user statistics:", update.exception())
+            finished.set_result(update.exception() is None)
+
+        get_async_db_conn().increment_user_statistics(statistics).add_done_callback(record_result)
+        return finished
 
     def get_player_by_sid(self, sid: str) -> Player:
         """Returns the given player in game based off of their SID, or None if not found.
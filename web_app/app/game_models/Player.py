@@ -4,6 +4,7 @@ Player
 """
 
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -16,6 +17,9 @@ class Player:
     :param connected: a boolean signifying whether the player is currently connected to a game.
     :param current_score: an integer representing the current score of the player.
     :param is_registered: a boolean which tells if the player is a registered user.
+    :param username: the account username of a registered player, which their statistics are recorded under.
+    :param num_answered: the number of questions the player has answered this game.
+    :param num_answered_correct: the number of questions the player has answered correctly this game.
     """
 
     name: str
@@ -26,6 +30,9 @@ class Player:
     current_score: int
     number_fooled: int
     is_registered: bool
+    username: Optional[str] = None
+    num_answered: int = 0
+    num_answered_correct: int = 0
 
     def get_name(self) -> str:
         """Returns the name of the player. The name of the user is the currently registered name in the game session.
@@ -63,14 +70,27 @@ class Player:
         """
         return self.current_score
 
-    def update_statistics(self, game_settings, player_db_handle) -> bool:
-        """Updates the Player's statistics stored in *player_db_handle* based off of *game_settings*.
+    def record_answer(self, correct: bool):
+        """Counts an answer the player gave this game.
 
-        :param game_settings: the game settings of the current game.
-        :param player_db_handle: a handle to the database storing registered Player statistics.
-        :returns: True if the player database entry was sucessfully updated, False otherwise
+        :param correct: whether the answer was correct.
         """
-        pass
+        self.num_answered += 1
+        self.num_answered_correct += correct
+
+    def update_statistics(self, won: bool, statistics: dict) -> bool:
+        """Adds the Player's results for the finished game to *statistics*, so that the statistics of every player
+        can be written to the database in one transaction.
+
+        :param won: whether the player won the game.
+        :param statistics: a mapping from username to the (wins, losses, num_answered, num_answered_correct) to be
+            added to each registered player's statistics.
+        :returns: True if the player is registered and its results were added, False otherwise
+        """
+        if not self.is_registered or not self.username:
+            return False
+        statistics[self.username] = (int(won), int(not won), self.num_answered, self.num_answered_correct)
+        return True
 
     def is_registered(self) -> bool:
         """Returns a boolean indicating if the player is a registered user or not.
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, session
 #from . import db
-from database_connection.dbconn import DBConn, DBUser
+from database_connection.async_dbconn import get_async_db_conn
+from database_connection.dbconn import get_db_conn, DBUser
 from app import app as auth
 
 #auth_blueprint = Blueprint('auth', __name__)
@@ -42,7 +43,7 @@ def signup_post():
 
     print("Signup for: ", request.form.get("email"), request.form.get('username'), request.form.get('password'))
 
-    user = DBConn().select_user(username) # if this returns a user, then the email already exists in database
+    user = get_db_conn().select_user(username) # if this returns a user, then the email already exists in database
 
     # TODO login vs signup pages
     if user: # if a user is found, we want to redirect back to signup page so user can try again
@@ -54,7 +55,7 @@ def signup_post():
     new_user = DBUser(username=username, email=email)
 
     # add the new user to the database
-    DBConn().insert_user(new_user, hash_pass)
+    get_db_conn().insert_user(new_user, hash_pass)
 
     return redirect(url_for('login_page'))
 
@@ -67,9 +68,13 @@ def login_post():
     #remember = True if request.form.get('remember') else False
     remember = False
 
-    user = DBConn().select_user(username)
+    # Look up the user and their password hash at the same time.
+    user = get_async_db_conn().select_user(username)
+    password_hash = get_async_db_conn().select_password(username)
+    user = user.result()
+    password_hash = password_hash.result()
 
-    if user is not None and check_password_hash(DBConn().select_password(user.username), password):
+    if user is not None and password_hash is not None and check_password_hash(password_hash, password):
         print("Logging user", username, "in")
         session.permanent = True
         session['username'] = user.username
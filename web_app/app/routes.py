@@ -1,7 +1,9 @@
-from flask import render_template
+from flask import abort, jsonify, render_template
 from flask_login import login_required, current_user
 
 from app import app
+from database_connection.instrumentation import get_instrumentation
+from trivia_generator.web_scraper.PageCache import get_page_cache
 
 
 @app.route('/')
@@ -24,3 +26,23 @@ def login_page():
 @login_required
 def statistics_page():
     return render_template("statistics.html", name=current_user.name)
+
+
+@app.route('/debug/db_stats')
+@login_required
+def db_stats():
+    """Reports the DBConn statistics collected by the instrumentation, if it is enabled in db.ini."""
+    instrumentation = get_instrumentation()
+    if not instrumentation.enabled:
+        abort(404)
+    return jsonify(instrumentation.report())
+
+
+@app.route('/debug/page_cache_stats')
+@login_required
+def page_cache_stats():
+    """Reports the hit rate and bytes saved by the scraper's page cache, if it is enabled in scraper.ini."""
+    page_cache = get_page_cache()
+    if page_cache is None:
+        abort(404)
+    return jsonify(page_cache.stats())
@@ -6,7 +6,7 @@ from app.game_models.Player import Player
 from app.game_models.GameSettings import GameSettings
 from app.validations import is_game_code_valid
 from app.validations import is_game_name_valid
-from flask import request
+from flask import request, session
 from flask_socketio import join_room
 
 
@@ -33,12 +33,15 @@ def join_game(data):
     if not is_game_name_valid(code, name):
         print("error: ", name, " is an invalid name")
         return "ERR_INVALID_NAME"
+    # players who are logged in have their statistics recorded under their username when the game finishes
+    username = session.get('username')
     player = Player(name=name,
                     ID=request.sid,
                     connected=True,
                     current_score=0,
                     number_fooled=0,
-                    is_registered=False,  # TODO
+                    is_registered=username is not None,
+                    username=username,
                     current_answer="",
                     current_lie="")
     game = games[code]
@@ -167,5 +170,17 @@ def get_lies_and_answer(code):
 def submit_trivia_rank(data):
     code = data['code']
     game = games[code]
-    game.submit_trivia_rank(data['rank'])
-    return True
+    return game.submit_trivia_rank(data['rank'])
+
+
+@socketio.on('finish_game')
+def finish_game(code):
+    game = games.pop(code, None)
+    if game is None:
+        print("error: ", code, " is bad code")
+        return "ERR_INVALID_CODE"
+    data = game.get_score()
+    # the statistics are written on the database query threads while the final scores are shown
+    game.finish_game()
+    socketio.emit('display_final_scores', data, room=code)
+    return data
@@ -10,6 +10,7 @@ socket.on('display_text_response_prompt', display_text_response_prompt);
 socket.on('display_fibbage_response_prompt', display_fibbage_response_prompt);
 socket.on('answer_timeout', display_timeout_message);
 socket.on('prompt_trivia_rank', display_trivia_rank_prompt);
+socket.on('display_final_scores', display_final_scores);
 
 var code = undefined;
 
@@ -92,6 +93,16 @@ function display_splash_screen(round_number){
 }
 
 
+function display_final_scores(data){
+    $('#game_container').empty();
+    $('#game_container').append('<h3>Game over!</h3>');
+    $('#game_container').append('<ul id="final_scores"></ul>');
+    for (const player of data['players']){
+	$('#final_scores').append('<li>' + player['name'] + ' ' + player['score'] + '</li>');
+    }
+}
+
+
 function display_text_response_prompt(mode){
     console.log("displaying text response");
     const html = '<form class="form-wrapper"><input type="text" id="answer" placeholder="Type answer here" required><input type="button" id="submit" value="submit"></form>';
@@ -263,6 +263,10 @@ function display_answer(data){
         $('#answer_list').append(li);
     }
     countdown(round_wait).then( function(){
+        if (data['game_over']){
+            finish_game();
+            return;
+        }
         socket.emit('request_scores', get_code(), function(data){
             display_score(data);
 	});
@@ -302,6 +306,10 @@ function display_fibbage_answer(data){
       				       + '</li>');
 	}
 	countdown(7).then( function(){
+	    if (data['game_over']){
+		finish_game();
+		return;
+	    }
             socket.emit('request_scores', get_code(), function(scores){
 		display_score(scores);
 	    });
@@ -310,6 +318,22 @@ function display_fibbage_answer(data){
     console.log(data);
 }
 
+function finish_game(){
+    // ends the game on the server, which records the statistics of logged in players
+    socket.emit('finish_game', get_code(), data => display_final_score(data));
+}
+
+function display_final_score(data){
+    const title = "<h3>Final Score:</h3>";
+    const score_board = "<ul id=score_board/>";
+    $('#room_container').empty();
+    $('#room_container').append(title);
+    $('#room_container').append(score_board);
+    for (player of data['players']){
+        $('#score_board').append('<li>' + player['name'] + " " +  player['score'] + '</li>');
+    }
+}
+
 async function countdown(seconds){
     while (seconds-- > 0){
 	await pause(1000);
@@ -0,0 +1,103 @@
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+from app.game_models.Game import Game
+from app.game_models.GameSettings import GameSettings
+from app.game_models.Player import Player
+
+
+def make_player(name: str, username: str = None, score: int = 0) -> Player:
+    return Player(name=name,
+                  ID=name + '_sid',
+                  connected=True,
+                  current_score=score,
+                  number_fooled=0,
+                  is_registered=username is not None,
+                  username=username,
+                  current_answer="",
+                  current_lie="")
+
+
+def done_future(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TestPlayer(unittest.TestCase):
+
+    def test_update_statistics(self):
+        player = make_player('Jill the Great', username='Jill')
+        player.record_answer(True)
+        player.record_answer(False)
+        statistics = dict()
+        self.assertTrue(player.update_statistics(True, statistics))
+        # keyed by the account username, not the display name
+        self.assertEqual({'Jill': (1, 0, 2, 1)}, statistics)
+
+    def test_update_statistics_loss(self):
+        player = make_player('Jill', username='Jill')
+        player.record_answer(False)
+        statistics = dict()
+        self.assertTrue(player.update_statistics(False, statistics))
+        self.assertEqual({'Jill': (0, 1, 1, 0)}, statistics)
+
+    def test_update_statistics_unregistered(self):
+        player = make_player('guest')
+        statistics = dict()
+        self.assertFalse(player.update_statistics(True, statistics))
+        self.assertEqual({}, statistics)
+
+
+class TestGame(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs before each test method
+        """
+        self.game = Game('ABCD', GameSettings({'mode': 'random'}), 'host_sid')
+
+    @mock.patch('app.game_models.Game.get_async_db_conn')
+    def test_finish_game(self, get_async_db_conn):
+        get_async_db_conn().increment_user_statistics.return_value = done_future(2)
+        winner = make_player('Jill the Great', username='Jill', score=3)
+        loser = make_player('Bum', username='bum', score=1)
+        guest = make_player('guest', score=3)
+        for player in [winner, loser, guest]:
+            self.game.add_player_to_lobby(player)
+        winner.record_answer(True)
+
+        self.assertTrue(self.game.finish_game().result())
+        self.assertEqual('FINISHED', self.game.current_state)
+        get_async_db_conn().increment_user_statistics.assert_called_once_with({'Jill': (1, 0, 1, 1),
+                                                                               'bum': (0, 1, 0, 0)})
+
+    @mock.patch('app.game_models.Game.get_async_db_conn')
+    def test_finish_game_database_error(self, get_async_db_conn):
+        failed = Future()
+        failed.set_exception(Exception('database is locked'))
+        get_async_db_conn().increment_user_statistics.return_value = failed
+        self.game.add_player_to_lobby(make_player('Jill', username='Jill'))
+        self.assertFalse(self.game.finish_game().result())
+
+    @mock.patch('app.game_models.Game.get_async_db_conn')
+    def test_finish_game_without_players(self, get_async_db_conn):
+        self.assertTrue(self.game.finish_game().result())
+        get_async_db_conn().increment_user_statistics.assert_not_called()
+
+    @mock.patch('app.game_models.Game.create_TUnits')
+    @mock.patch('app.game_models.Game.iter_pages_by_random', return_value=iter([]))
+    def test_get_next_trivia_without_articles(self, iter_pages_by_random, create_TUnits):
+        self.assertIsNone(self.game.get_next_trivia())
+        create_TUnits.assert_not_called()
+
+    def test_is_game_over(self):
+        self.game.start_game()
+        self.assertFalse(self.game.is_game_over())
+        self.game.round_number = self.game.game_settings.number_of_rounds + 1
+        self.assertTrue(self.game.is_game_over())
+
+
+if __name__ == '__main__':
+    unittest.main()